@@ -43,11 +43,13 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'library.middleware.ViewMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'library.middleware.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -142,3 +144,142 @@ AUTHENTICATION_BACKENDS = [
     'accounts.backends.EmailBackend',
     'django.contrib.auth.backends.ModelBackend',
 ]
+
+# Antrean pemrosesan PDF, dikerjakan oleh `python manage.py process_books`
+LIBRARY_WORKER_CONCURRENCY = 1  # jumlah proses worker
+LIBRARY_JOB_MAX_ATTEMPTS = 3  # percobaan sebelum job dianggap gagal
+LIBRARY_JOB_RETRY_DELAY = 30  # detik, berlipat dua tiap percobaan
+LIBRARY_JOB_STALE_TIMEOUT = 60 * 30  # job running tanpa heartbeat selama ini diambil ulang
+LIBRARY_JOB_WAIT_DELAY = 15  # detik, jeda cek ulang job yang menunggu isi PDF sama diproses job lain
+
+# Render halaman PDF paralel (0 = sesuai jumlah core CPU)
+LIBRARY_RENDER_WORKERS = 1
+LIBRARY_RENDER_PARALLEL_MIN_PAGES = 16  # dokumen lebih kecil tetap dirender serial
+
+# Hanya N halaman pertama yang dirender saat upload (None = semua halaman).
+# Halaman lain dirender saat pertama kali dibaca dan disimpan di cache disk.
+LIBRARY_PRERENDER_PAGES = 5
+LIBRARY_PAGE_CACHE_ROOT = os.path.join(MEDIA_ROOT, 'page_cache')
+LIBRARY_PAGE_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+# Format gambar halaman: 'png', 'jpeg', atau 'webp'
+LIBRARY_PAGE_FORMAT = 'webp'
+LIBRARY_PAGE_QUALITY = 80  # kualitas kompresi JPEG/WebP (1-100)
+LIBRARY_PAGE_WIDTHS = [480, 960]  # varian lebar untuk srcset, selain ukuran penuh
+
+# Teks per halaman hasil ekstraksi PDF (gzip JSON-lines, satu file per buku).
+# Sengaja di luar MEDIA_ROOT agar tidak ikut dilayani sebagai file publik.
+LIBRARY_TEXT_ROOT = os.path.join(BASE_DIR, 'library_data', 'text')
+LIBRARY_SEARCH_BODY_MAX_WORDS = 200000  # kata isi buku pertama yang masuk indeks pencarian
+LIBRARY_SEARCH_MAX_RESULTS = 500  # hasil pencarian paling relevan yang ditampilkan katalog
+
+# Statistik kata seluruh koleksi untuk kata kunci TF-IDF
+# (diperbarui per buku, `python manage.py rerank_keywords` meranking ulang semua buku)
+LIBRARY_KEYWORD_MODEL_PATH = os.path.join(BASE_DIR, 'library_data', 'keywords.npz')
+LIBRARY_KEYWORD_MAX_TERMS = 1000  # kata terbanyak per buku yang disimpan di model
+LIBRARY_KEYWORD_JOURNAL_BATCH = 50  # perubahan di journal sebelum file model ditulis ulang
+
+# Buku serupa di halaman detail (dihitung di background, lihat library.similarity)
+LIBRARY_RELATED_BOOKS = 6  # jumlah tetangga yang disimpan per buku
+LIBRARY_RELATED_MIN_SCORE = 0.05  # cosine similarity minimal
+
+# Muat PyMuPDF, numpy, scikit-learn, dll. saat WSGI dimulai (sebelum fork).
+# Aktifkan untuk server yang fork worker, misalnya `gunicorn --preload`.
+LIBRARY_PRELOAD = False
+
+# Bahasa stopword NLTK yang digabung dengan stopword bawaan (jika data NLTK terpasang)
+LIBRARY_STOPWORD_LANGUAGES = ['english', 'indonesian']
+
+# Metrik Prometheus di /library/metrics/ (staff atau header "Authorization: Bearer <token>")
+LIBRARY_METRICS_ENABLED = True
+LIBRARY_METRICS_TOKEN = os.environ.get('LIBRARY_METRICS_TOKEN', '')
+# Tiap proses (web dan worker) menulis metriknya ke sini untuk digabung endpoint
+LIBRARY_METRICS_DIR = os.path.join(BASE_DIR, 'library_data', 'metrics')
+LIBRARY_METRICS_FLUSH_INTERVAL = 10  # detik
+
+# Log aplikasi library ke console. Pesan DEBUG (detail tiap tahap) hanya
+# diformat jika level-nya aktif: LIBRARY_LOG_LEVEL=DEBUG python manage.py ...
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'library': {
+            'handlers': ['console'],
+            'level': os.environ.get('LIBRARY_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Instrumentasi per request: query SQL di header Server-Timing dan cProfile
+# (library.middleware.RequestProfilerMiddleware). Nonaktif kecuali diaktifkan.
+LIBRARY_PROFILER_ENABLED = os.environ.get('LIBRARY_PROFILER_ENABLED') == '1'
+LIBRARY_PROFILER_SLOW_QUERIES = 3  # query terlambat yang dicantumkan per request
+LIBRARY_PROFILER_SAMPLE_RATE = 0.0  # peluang request diprofile (0.01 = 1%), staff juga bisa kirim "X-Profile: 1"
+LIBRARY_PROFILER_DIR = os.path.join(BASE_DIR, 'library_data', 'profiles')
+LIBRARY_PROFILER_MAX_FILES = 200  # file profile terlama dihapus
+
+# Cache Django. Berbasis file agar dipakai bersama proses web dan worker
+# (versi katalog dinaikkan worker); untuk beberapa server gunakan Redis/Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'library_data', 'cache'),
+    },
+}
+
+# Halaman katalog (book_list) di-cache, diinvalidasi setiap kali data buku berubah
+LIBRARY_BOOK_LIST_CACHE_TIMEOUT = 60 * 10  # detik
+
+# Paginasi katalog tanpa pencarian: 'keyset' (cursor pada index created_at, id;
+# halaman jauh sama murahnya dengan halaman pertama) atau 'offset' (nomor halaman)
+LIBRARY_BOOK_LIST_PAGINATION = 'keyset'
+
+# File media (/media/...) dilayani library.media: cek akses per folder, ETag,
+# Range, dan Cache-Control. Folder yang tidak terdaftar dijawab 404.
+LIBRARY_MEDIA_ACCESS = {  # folder: 'public', 'login', atau 'staff'
+    'books/': 'public',
+    'book_images/': 'public',
+    'covers/': 'public',
+    'page_cache/': 'public',
+    'profiles/': 'public',
+}
+# Nama folder berubah setiap gambar yang sudah ada dirender ulang, aman di-cache selamanya
+LIBRARY_MEDIA_IMMUTABLE_PREFIXES = ['book_images/']
+LIBRARY_MEDIA_MAX_AGE = 60 * 60  # detik, untuk file lain (divalidasi ulang dengan ETag)
+# Serahkan pengiriman isi file ke web server: 'x-sendfile' (Apache mod_xsendfile)
+# atau 'x-accel-redirect' (nginx, location internal yang menunjuk ke folder di bawah)
+LIBRARY_MEDIA_SENDFILE = os.environ.get('LIBRARY_MEDIA_SENDFILE') or None
+LIBRARY_MEDIA_ACCEL_LOCATIONS = {MEDIA_ROOT: '/protected-media/'}
+
+# Pembaca (book_preview): manifest halaman di-cache per versi buku, dan
+# gambar N halaman sebelum/sesudah halaman aktif diunduh lebih dulu
+LIBRARY_PAGE_MANIFEST_CACHE_TIMEOUT = 60 * 60 * 24  # detik
+LIBRARY_PREVIEW_PREFETCH_PAGES = 2
+
+# Zoom halaman di pembaca: piramida tile DeepZoom, dirender per tile saat
+# diminta dan disimpan di page cache (format mengikuti LIBRARY_PAGE_FORMAT)
+LIBRARY_TILE_SIZE = 256  # piksel
+LIBRARY_TILE_OVERLAP = 1  # piksel tumpang tindih antar tile
+LIBRARY_TILE_ZOOM = 4.0  # zoom level tertinggi (gambar halaman biasa: 2.0)
+
+# Upload per potongan yang bisa dilanjutkan (library.chunked_uploads), dipakai
+# form upload untuk file sebesar LIBRARY_UPLOAD_CHUNKED_MIN_SIZE atau lebih.
+# Sesi yang tidak selesai dihapus `manage.py clear_upload_sessions` (cron).
+LIBRARY_UPLOAD_ROOT = os.path.join(BASE_DIR, 'library_data', 'uploads')
+LIBRARY_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # byte per potongan
+LIBRARY_UPLOAD_CHUNKED_MIN_SIZE = 16 * 1024 * 1024
+LIBRARY_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+LIBRARY_UPLOAD_SESSION_TTL = 60 * 60 * 24  # detik tanpa potongan baru
+LIBRARY_UPLOAD_MAX_OPEN_SESSIONS = 5  # sesi belum selesai per user (None: tanpa batas)
+
+# Konversi halaman mencatat progresnya di <folder gambar>/.progress.json
+# (library.checkpoint): konversi yang terhenti dilanjutkan, proses ulang
+# hanya merender halaman yang belum ada atau dirender dengan pengaturan lama
+LIBRARY_RENDER_CHECKPOINT_PAGES = 20  # halaman per penulisan manifest
@@ -14,10 +14,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from urllib.parse import urlsplit
+
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from library import views as library_views
 from . import views
 
 
@@ -26,8 +28,13 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('library/', include('library.urls')),
     path('accounts/', include('accounts.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# File media dilayani view dengan cek akses, cache header, Range, dan
+# X-Sendfile/X-Accel-Redirect (library.media), juga saat DEBUG = False.
+# MEDIA_URL berupa URL lengkap (CDN) berarti media dilayani di tempat lain.
+if not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns.append(
+        path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", library_views.serve_media, name='media')
+    )
 
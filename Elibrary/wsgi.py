@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Elibrary.settings')
 
 application = get_wsgi_application()
+
+# Server yang fork worker setelah memuat aplikasi (gunicorn --preload)
+# memuat dependensi berat sekali di proses induk, lihat library.warmup
+from django.conf import settings
+
+if getattr(settings, 'LIBRARY_PRELOAD', False):
+    from library.warmup import preload
+    preload()
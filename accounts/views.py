@@ -6,6 +6,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import update_session_auth_hash
 from .forms import UserProfileForm, CustomPasswordChangeForm, CustomRegistrationForm, CustomLoginForm
 from .models import UserProfile
+from library.stats import user_stats
 
 def register_view(request):
     if request.method == 'POST':
@@ -66,12 +67,14 @@ def profile_view(request):
     """Menampilkan profil user"""
     profile, created = UserProfile.objects.get_or_create(user=request.user)
 
-    # Hitung statistik untuk template
-    processed_books_count = request.user.book_set.filter(images_folder__isnull=False).count()
+    # Statistik untuk template, dibaca dari counter (library.stats)
+    stats = user_stats(request.user.pk)
 
     return render(request, 'accounts/profile.html', {
         'profile': profile,
-        'processed_books_count': processed_books_count
+        'books_count': stats['books'],
+        'processed_books_count': stats['processed_books'],
+        'favorites_count': stats['favorites']
     })
 
 @login_required
@@ -0,0 +1,4 @@
+"""
+Benchmark performa E-Library.
+Setiap modul bisa dijalankan langsung, misalnya `python -m benchmarks.import_time`.
+"""
@@ -0,0 +1,162 @@
+"""
+Benchmark paginasi katalog buku: OFFSET (Paginator) vs keyset (cursor).
+
+Tabel buku diisi sejumlah baris sintetis (default 500.000) di database
+uji SQLite di memori, jadi db.sqlite3 proyek tidak tersentuh. Halaman
+pertama, tengah, dan terakhir diambil dengan kedua cara, dengan dan
+tanpa filter genre. Paginator membayar COUNT(*) dan melewati semua
+baris sebelum OFFSET; keyset langsung mulai dari posisi cursor di index
+(created_at, id), sehingga halaman terakhir seharusnya semurah halaman
+pertama. Rencana query (EXPLAIN) keyset ikut dicetak.
+
+    python -m benchmarks.catalog_pagination
+    python -m benchmarks.catalog_pagination --rows 100000 --check
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import setup_django
+
+PER_PAGE = 5
+
+
+def fill_books(rows, seed_time, batch=20000):
+    """Isi tabel buku dengan INSERT langsung (bulk_create akan menimpa created_at)"""
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+
+    from library.models import Book
+
+    uploader = User.objects.create_user('benchmark')
+    genres = [value for value, _ in Book.GENRE_CHOICES]
+    table = connection.ops.quote_name(Book._meta.db_table)
+    sql = (f"INSERT INTO {table} (title, genre, processing_status, uploader_id, created_at) "
+           f"VALUES (%s, %s, %s, %s, %s)")
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, rows, batch):
+            cursor.executemany(sql, [
+                # Tiap tiga buku berbagi waktu agar urutan id ikut teruji
+                (f"Buku {i}", genres[i % len(genres)], Book.STATUS_READY, uploader.pk,
+                 connection.ops.adapt_datetimefield_value(seed_time - timedelta(seconds=i // 3)))
+                for i in range(start, min(start + batch, rows))
+            ])
+
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def measure(queryset, page_number, repeat):
+    """Waktu halaman ke-page_number dengan Paginator dan dengan keyset"""
+    from django.core.paginator import Paginator
+
+    from library.pagination import NEXT, ORDERING, keyset_page
+
+    def offset():
+        page = Paginator(queryset, PER_PAGE).page(page_number)
+        return [book.pk for book in page.object_list]
+
+    # Posisi cursor = buku terakhir halaman sebelumnya (tidak ikut diukur)
+    position = None
+    if page_number > 1:
+        before = queryset.order_by(*ORDERING)[(page_number - 1) * PER_PAGE - 1]
+        position = (before.created_at, before.pk, NEXT)
+
+    def keyset():
+        return [book.pk for book in keyset_page(queryset, position, PER_PAGE)]
+
+    offset_time, offset_ids = best_of(offset, repeat)
+    keyset_time, keyset_ids = best_of(keyset, repeat)
+    return {
+        'page': page_number,
+        'offset_ms': round(offset_time * 1000, 3),
+        'keyset_ms': round(keyset_time * 1000, 3),
+        'same_books': offset_ids == keyset_ids,
+    }, position
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark paginasi katalog buku")
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--check', action='store_true',
+                        help='Keluar dengan status 1 jika halaman terakhir keyset jauh lebih mahal')
+    parser.add_argument('--max-ratio', type=float, default=3.0,
+                        help='Batas waktu halaman terakhir / halaman pertama untuk keyset')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from library.models import Book
+    from library.pagination import ORDERING, keyset_page
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        started = time.perf_counter()
+        fill_books(args.rows, datetime(2026, 1, 1, tzinfo=timezone.utc))
+        fill_seconds = time.perf_counter() - started
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        report = {'rows': args.rows, 'fill_seconds': round(fill_seconds, 1), 'listings': {}}
+        listings = {
+            'semua': Book.objects.order_by(*ORDERING),
+            'genre': Book.objects.filter(genre='komik').order_by(*ORDERING),
+        }
+        for name, queryset in listings.items():
+            last_page = max(1, -(-queryset.count() // PER_PAGE))
+            results, deepest = [], None
+            for page_number in sorted({1, max(1, last_page // 2), last_page}):
+                result, position = measure(queryset, page_number, args.repeat)
+                results.append(result)
+                deepest = position
+            plan = ''
+            if deepest:
+                with CaptureQueriesContext(connection) as ctx:
+                    keyset_page(queryset, deepest, PER_PAGE)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {ctx.captured_queries[-1]['sql']}")
+                    plan = ' | '.join(row[-1] for row in cursor.fetchall())
+            report['listings'][name] = {'pages': last_page, 'results': results, 'keyset_plan': plan}
+    finally:
+        connection.creation.destroy_test_db(':memory:', verbosity=0)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.rows} buku diisi dalam {report['fill_seconds']} s")
+        for name, listing in report['listings'].items():
+            print(f"[{name}] {listing['pages']} halaman, rencana keyset: {listing['keyset_plan']}")
+            for row in listing['results']:
+                print(f"  halaman {row['page']:7d}: offset {row['offset_ms']:9.2f} ms  "
+                      f"keyset {row['keyset_ms']:7.2f} ms  sama: {row['same_books']}")
+
+    if args.check:
+        problems = []
+        for name, listing in report['listings'].items():
+            first, last = listing['results'][0], listing['results'][-1]
+            if not all(row['same_books'] for row in listing['results']):
+                problems.append(f"{name}: isi halaman keyset berbeda dari Paginator")
+            ratio = last['keyset_ms'] / first['keyset_ms'] if first['keyset_ms'] else 0
+            if ratio > args.max_ratio:
+                problems.append(f"{name}: halaman terakhir keyset {ratio:.1f}x halaman pertama "
+                                f"(batas {args.max_ratio}x)")
+        for problem in problems:
+            print(f"REGRESI: {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+Utilitas bersama untuk benchmark yang berjalan di dalam proses Django.
+"""
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(settings_module='Elibrary.settings'):
+    """Inisialisasi Django dan arahkan semua file hasil ke folder sementara"""
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+
+    work_dir = tempfile.mkdtemp(prefix='elibrary-bench-')
+    settings.MEDIA_ROOT = os.path.join(work_dir, 'media')
+    settings.LIBRARY_TEXT_ROOT = os.path.join(work_dir, 'text')
+    settings.LIBRARY_PAGE_CACHE_ROOT = os.path.join(work_dir, 'page_cache')
+    settings.LIBRARY_KEYWORD_MODEL_PATH = os.path.join(work_dir, 'keywords.npz')
+    settings.LIBRARY_METRICS_DIR = os.path.join(work_dir, 'metrics')
+    return work_dir
+
+
+def megabytes(size):
+    return size / (1024 * 1024)
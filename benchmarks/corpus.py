@@ -0,0 +1,149 @@
+"""
+PDF sintetis untuk benchmark.
+
+Semua dokumen dibuat offline dengan PyMuPDF dan deterministik (seed
+tetap), sehingga hasil benchmark antar commit bisa dibandingkan.
+"""
+import os
+import random
+
+WORDS = (
+    "perpustakaan digital membaca buku pengetahuan sejarah indonesia kemerdekaan "
+    "library science reading knowledge history research education literature "
+    "python django framework database algorithm network computer engineering "
+    "ekonomi politik budaya masyarakat pendidikan teknologi informasi komunikasi"
+).split()
+
+
+def paragraph(rng, words=400):
+    return " ".join(rng.choice(WORDS) + rng.choice(["", "s", "an", "kan"]) for _ in range(words))
+
+
+def _text_rect(page, margin=36):
+    import fitz  # PyMuPDF
+
+    return fitz.Rect(margin, margin, page.rect.width - margin, page.rect.height - margin)
+
+
+def _save(document, path):
+    # Tanggal dan ID dokumen tetap agar file identik setiap kali dibuat
+    document.set_metadata({'producer': 'E-Library benchmark', 'creationDate': '', 'modDate': ''})
+    document.save(path, garbage=3, deflate=True, no_new_id=True)
+    document.close()
+    return path
+
+
+def text_pdf(path, pages, words_per_page=400, seed=0):
+    """PDF berisi teks padat di setiap halaman"""
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page()
+        page.insert_textbox(
+            _text_rect(page),
+            f"Bab {page_num + 1}. " + paragraph(rng, words_per_page),
+            fontsize=7,
+        )
+    return _save(document, path)
+
+
+def _photo(rng, width, height):
+    """
+    Pixmap RGB mirip foto: gradasi warna dengan noise, sehingga tidak
+    bisa dikompres terlalu kecil seperti gambar satu warna
+    """
+    import fitz  # PyMuPDF
+
+    base = [rng.randrange(256) for _ in range(3)]
+    noise = rng.randbytes(width)
+    samples = bytearray(width * height * 3)
+    position = 0
+    for y in range(height):
+        for x in range(width):
+            shade = (x + y + noise[(x * 7 + y) % width]) & 0xff
+            samples[position] = (base[0] + shade) & 0xff
+            samples[position + 1] = (base[1] + y) & 0xff
+            samples[position + 2] = (base[2] + x) & 0xff
+            position += 3
+    return fitz.Pixmap(fitz.csRGB, width, height, bytes(samples), False)
+
+
+def image_pdf(path, pages, images_per_page=2, image_size=(480, 360), seed=0):
+    """PDF majalah/buku bergambar: beberapa gambar raster dan sedikit teks per halaman"""
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    photos = [_photo(rng, *image_size) for _ in range(4)]
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page()
+        area = _text_rect(page)
+        slot_height = (area.height - 80) / images_per_page
+        for slot in range(images_per_page):
+            top = area.y0 + slot * slot_height
+            page.insert_image(
+                fitz.Rect(area.x0, top, area.x1, top + slot_height - 8),
+                pixmap=photos[(page_num + slot) % len(photos)],
+            )
+        page.insert_textbox(
+            fitz.Rect(area.x0, area.y1 - 70, area.x1, area.y1),
+            f"Gambar {page_num + 1}. " + paragraph(rng, 40),
+            fontsize=8,
+        )
+    return _save(document, path)
+
+
+def many_page_pdf(path, pages, words_per_page=60, seed=0):
+    """PDF dengan sangat banyak halaman pendek (biaya per halaman dominan)"""
+    return text_pdf(path, pages, words_per_page=words_per_page, seed=seed)
+
+
+def scanned_pdf(path, pages, dpi=150, seed=0):
+    """
+    PDF hasil scan: setiap halaman hanya berisi gambar teks tanpa
+    lapisan teks, sehingga ekstraksi teks jatuh ke fallback
+    """
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    document = fitz.open()
+    for page_num in range(pages):
+        source = fitz.open()
+        source_page = source.new_page()
+        source_page.insert_textbox(
+            _text_rect(source_page),
+            f"Halaman {page_num + 1}. " + paragraph(rng, 250),
+            fontsize=9,
+        )
+        scan = source_page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        source.close()
+
+        page = document.new_page()
+        page.insert_image(page.rect, pixmap=scan)
+    return _save(document, path)
+
+
+# nama dokumen: (fungsi pembuat, jumlah halaman default)
+DOCUMENTS = {
+    'text_heavy': (text_pdf, 40),
+    'image_heavy': (image_pdf, 16),
+    'many_pages': (many_page_pdf, 200),
+    'scanned': (scanned_pdf, 16),
+}
+
+
+def build_corpus(directory, names=None, scale=1.0, seed=0):
+    """
+    Buat dokumen benchmark di directory.
+    scale mengalikan jumlah halaman default (misalnya 0.1 untuk uji cepat)
+    Returns: dict nama -> path PDF
+    """
+    os.makedirs(directory, exist_ok=True)
+    corpus = {}
+    for name in names or DOCUMENTS:
+        builder, pages = DOCUMENTS[name]
+        path = os.path.join(directory, f"{name}.pdf")
+        corpus[name] = builder(path, max(1, round(pages * scale)), seed=seed)
+    return corpus
@@ -0,0 +1,120 @@
+"""
+Benchmark waktu impor modul aplikasi.
+
+Setiap target diimpor di proses Python baru supaya cache modul tidak
+ikut terukur. Selain waktu, dicatat dependensi berat (PyMuPDF, numpy,
+scikit-learn, NLTK, ...) yang ikut termuat. Target ringan tidak boleh
+memuat dependensi berat: manage.py, test, dan worker hanya membayar
+biaya impor untuk fitur yang benar-benar dipakai.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 5 --check --max-seconds 1.0
+    python -m benchmarks.import_time --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['fitz', 'pymupdf', 'numpy', 'scipy', 'sklearn', 'nltk', 'PIL']
+
+# nama target: (kode impor, boleh memuat dependensi berat)
+TARGETS = {
+    'django_setup': ("pass", False),
+    # Yang dimuat runserver/manage.py check: semua URL dan view
+    'urls': ("import Elibrary.urls", False),
+    'library_utils': ("import library.utils", False),
+    'library_jobs': ("import library.jobs", False),
+    'library_keywords': ("import library.keywords", True),
+    'preload': ("import library.warmup; library.warmup.preload()", True),
+}
+
+CHILD_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+{code}
+end = time.perf_counter()
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{'setup': setup_done - start, 'import': end - setup_done,
+                  'total': end - start, 'heavy': heavy}}))
+"""
+
+
+def measure(code, settings_module):
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [BASE_DIR, env.get('PYTHONPATH')]))
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE.format(code=code, heavy=HEAVY_MODULES)],
+        cwd=BASE_DIR, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    # Baris terakhir berisi hasil, baris lain bisa berupa log/peringatan
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(targets, repeat, settings_module):
+    report = {}
+    for name in targets:
+        code, _ = TARGETS[name]
+        runs = [measure(code, settings_module) for _ in range(repeat)]
+        report[name] = {
+            'total_median': statistics.median(run['total'] for run in runs),
+            'import_median': statistics.median(run['import'] for run in runs),
+            'total_min': min(run['total'] for run in runs),
+            'heavy_modules': runs[-1]['heavy'],
+        }
+    return report
+
+
+def check(report, max_seconds):
+    """Daftar pelanggaran: target ringan yang memuat modul berat atau terlalu lambat"""
+    problems = []
+    for name, result in report.items():
+        heavy_allowed = TARGETS[name][1]
+        if not heavy_allowed and result['heavy_modules']:
+            problems.append(f"{name} memuat modul berat: {', '.join(result['heavy_modules'])}")
+        if not heavy_allowed and max_seconds and result['total_median'] > max_seconds:
+            problems.append(f"{name} butuh {result['total_median']:.3f}s (batas {max_seconds}s)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--target', action='append', choices=sorted(TARGETS),
+                        help='Target yang diukur (default semua)')
+    parser.add_argument('--settings', default='Elibrary.settings')
+    parser.add_argument('--check', action='store_true',
+                        help='Keluar dengan status 1 jika ada regresi')
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help='Batas waktu median untuk target ringan (dengan --check)')
+    parser.add_argument('--json', action='store_true', help='Cetak laporan sebagai JSON')
+    args = parser.parse_args(argv)
+
+    report = run(args.target or list(TARGETS), args.repeat, args.settings)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, result in report.items():
+            heavy = ', '.join(result['heavy_modules']) or '-'
+            print(f"{name:18} total {result['total_median'] * 1000:8.1f} ms   "
+                  f"impor {result['import_median'] * 1000:8.1f} ms   modul berat: {heavy}")
+
+    if args.check:
+        problems = check(report, args.max_seconds)
+        for problem in problems:
+            print(f"REGRESI: {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
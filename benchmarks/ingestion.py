@@ -0,0 +1,267 @@
+"""
+Benchmark pipeline ingestion PDF.
+
+Dokumen sintetis dari benchmarks.corpus (teks padat, bergambar, banyak
+halaman, hasil scan) diproses oleh setiap tahap di library.utils:
+convert_pdf_to_images, get_book_cover_from_pdf, extract_text_from_pdf,
+analyze_book_text, dan ingest_pdf (gabungan yang dipakai worker).
+
+Setiap pasangan dokumen/tahap dijalankan di proses Python baru sehingga
+puncak RSS (resident set size) yang dicatat hanya milik tahap itu.
+Hasilnya berupa halaman/detik, MB PDF/detik, dan puncak RSS. Laporan
+JSON (--output) bisa dibandingkan dengan laporan commit lain (--compare).
+
+    python -m benchmarks.ingestion
+    python -m benchmarks.ingestion --scale 0.2 --stage extract_text_from_pdf
+    python -m benchmarks.ingestion --output after.json --compare before.json --check
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import BASE_DIR, megabytes, setup_django
+
+
+def _convert(path, workers):
+    from library.utils import convert_pdf_to_images
+    return convert_pdf_to_images(path, 0, workers=workers)
+
+
+def _cover(path, workers):
+    from library.utils import get_book_cover_from_pdf
+    return get_book_cover_from_pdf(path, 0)
+
+
+def _extract(path, workers):
+    from library.utils import extract_text_from_pdf
+    return extract_text_from_pdf(path)
+
+
+def _analyze(path, workers):
+    from library.utils import analyze_book_text
+    return analyze_book_text(path, max_keywords=10)
+
+
+def _ingest(path, workers):
+    from library.utils import ingest_pdf
+    return ingest_pdf(path, 0, workers=workers)
+
+
+STAGES = {
+    'convert_pdf_to_images': _convert,
+    'get_book_cover_from_pdf': _cover,
+    'extract_text_from_pdf': _extract,
+    'analyze_book_text': _analyze,
+    'ingest_pdf': _ingest,
+}
+
+
+def _max_rss_mb(who=resource.RUSAGE_SELF):
+    """Puncak RSS dalam MB (ru_maxrss dalam KB di Linux, byte di macOS)"""
+    peak = resource.getrusage(who).ru_maxrss
+    if sys.platform != 'darwin':
+        peak *= 1024
+    return megabytes(peak)
+
+
+def run_stage(stage, pdf_path, repeat, workers):
+    """Dijalankan di proses anak: ukur satu tahap untuk satu dokumen"""
+    work_dir = setup_django()
+    from django.conf import settings
+
+    # Modul dan dependensi dimuat sebelum pengukuran agar tidak ikut terhitung
+    import fitz  # noqa: F401
+    from PIL import Image  # noqa: F401
+    import library.keywords  # noqa: F401
+    import library.utils  # noqa: F401
+    from library.tokenizer import stop_words
+    stop_words()
+
+    baseline = _max_rss_mb()
+    timings = []
+    try:
+        for _ in range(repeat):
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                started = time.perf_counter()
+                result = STAGES[stage](pdf_path, workers)
+                timings.append(time.perf_counter() - started)
+            if result is None:
+                raise RuntimeError(f"{stage} gagal untuk {pdf_path}")
+            # Hasil render tidak dipakai lagi, jangan sampai memenuhi disk
+            shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'seconds': min(timings),
+        'rss_baseline_mb': baseline,
+        # Render paralel berjalan di proses lain, puncaknya dicatat terpisah
+        'peak_rss_mb': max(_max_rss_mb(), _max_rss_mb(resource.RUSAGE_CHILDREN)),
+    }
+
+
+def measure(stage, pdf_path, repeat, workers, settings_module):
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [BASE_DIR, env.get('PYTHONPATH')]))
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.ingestion', '--run-stage', stage, '--pdf', pdf_path,
+         '--repeat', str(repeat), '--workers', str(workers)],
+        cwd=BASE_DIR, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    # Baris terakhir berisi hasil, baris lain bisa berupa log/peringatan
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    cwd=BASE_DIR, check=True, capture_output=True,
+                                    text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run(documents, stages, scale, repeat, workers, settings_module):
+    import fitz  # PyMuPDF
+
+    from benchmarks.corpus import build_corpus
+
+    corpus_dir = tempfile.mkdtemp(prefix='elibrary-corpus-')
+    try:
+        corpus = build_corpus(corpus_dir, documents, scale=scale)
+        document_info = {}
+        for name, path in corpus.items():
+            with fitz.open(path) as document:
+                pages = len(document)
+            document_info[name] = {'pages': pages, 'size_mb': round(megabytes(os.path.getsize(path)), 3)}
+
+        results = []
+        for name, path in corpus.items():
+            info = document_info[name]
+            for stage in stages:
+                result = measure(stage, path, repeat, workers, settings_module)
+                seconds = result['seconds']
+                results.append({
+                    'document': name,
+                    'stage': stage,
+                    'seconds': round(seconds, 4),
+                    'pages_per_sec': round(info['pages'] / seconds, 2) if seconds else None,
+                    'mb_per_sec': round(info['size_mb'] / seconds, 3) if seconds else None,
+                    'peak_rss_mb': round(result['peak_rss_mb'], 1),
+                    'rss_baseline_mb': round(result['rss_baseline_mb'], 1),
+                })
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    from django.conf import settings
+
+    commit, dirty = _git_commit()
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit,
+            'dirty': dirty,
+            'python': platform.python_version(),
+            'pymupdf': fitz.VersionBind,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'scale': scale,
+            'repeat': repeat,
+            'workers': workers,
+            'page_format': getattr(settings, 'LIBRARY_PAGE_FORMAT', 'png'),
+            # ingest_pdf hanya merender halaman awal sebanyak ini (None = semua)
+            'prerender_pages': getattr(settings, 'LIBRARY_PRERENDER_PAGES', None),
+        },
+        'documents': document_info,
+        'results': results,
+    }
+
+
+def compare(report, baseline, max_slowdown):
+    """Cetak perbandingan dengan laporan lain, returns: daftar regresi"""
+    previous = {(row['document'], row['stage']): row for row in baseline['results']}
+    problems = []
+    for row in report['results']:
+        before = previous.get((row['document'], row['stage']))
+        if not before or not before['seconds']:
+            continue
+        ratio = row['seconds'] / before['seconds']
+        rss = row['peak_rss_mb'] - before['peak_rss_mb']
+        print(f"{row['document']:12} {row['stage']:24} waktu {ratio:5.2f}x   RSS {rss:+7.1f} MB")
+        if max_slowdown and ratio > max_slowdown:
+            problems.append(f"{row['document']}/{row['stage']} {ratio:.2f}x lebih lambat "
+                            f"(batas {max_slowdown}x)")
+    return problems
+
+
+def main(argv=None):
+    from benchmarks.corpus import DOCUMENTS
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--document', action='append', choices=sorted(DOCUMENTS),
+                        help='Dokumen yang diukur (default semua)')
+    parser.add_argument('--stage', action='append', choices=sorted(STAGES),
+                        help='Tahap yang diukur (default semua)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Pengali jumlah halaman dokumen (misalnya 0.2 untuk uji cepat)')
+    parser.add_argument('--repeat', type=int, default=1, help='Waktu terbaik dari N kali jalan')
+    parser.add_argument('--workers', type=int, default=1, help='Jumlah proses render')
+    parser.add_argument('--settings', default='Elibrary.settings')
+    parser.add_argument('--output', help='Simpan laporan JSON ke file ini')
+    parser.add_argument('--json', action='store_true', help='Cetak laporan sebagai JSON')
+    parser.add_argument('--compare', help='Laporan JSON sebelumnya sebagai pembanding')
+    parser.add_argument('--check', action='store_true',
+                        help='Keluar dengan status 1 jika lebih lambat dari pembanding')
+    parser.add_argument('--max-slowdown', type=float, default=1.25,
+                        help='Batas rasio waktu terhadap pembanding (dengan --check)')
+    # Dipakai proses anak
+    parser.add_argument('--run-stage', choices=sorted(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument('--pdf', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage, args.pdf, args.repeat, args.workers)))
+        return 0
+
+    setup_django(args.settings)
+    report = run(args.document or list(DOCUMENTS), args.stage or list(STAGES),
+                 args.scale, args.repeat, args.workers, args.settings)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, info in report['documents'].items():
+            print(f"{name:12} {info['pages']:5d} halaman  {info['size_mb']:7.2f} MB")
+        for row in report['results']:
+            print(f"{row['document']:12} {row['stage']:24} {row['seconds']:8.3f} s  "
+                  f"{row['pages_per_sec']:8.1f} hal/s  {row['mb_per_sec']:7.2f} MB/s  "
+                  f"puncak RSS {row['peak_rss_mb']:7.1f} MB")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            problems = compare(report, json.load(f), args.max_slowdown if args.check else None)
+        if args.check:
+            for problem in problems:
+                print(f"REGRESI: {problem}", file=sys.stderr)
+            return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
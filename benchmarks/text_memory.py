@@ -0,0 +1,116 @@
+"""
+Benchmark memori ekstraksi dan analisis teks.
+
+Membandingkan puncak alokasi memori Python (tracemalloc) antara:
+- legacy    : seluruh teks digabung menjadi satu string lalu dianalisis
+              (extract_text_from_pdf + analyze_text, cara lama)
+- streaming : teks ditulis ke sidecar lalu dibaca per halaman untuk
+              kata kunci dan indeks pencarian (pipeline sekarang)
+
+Setiap skenario diukur pada dua ukuran dokumen. Puncak memori streaming
+harus hampir sama untuk dokumen kecil dan besar (dibatasi satu halaman
+dan LIBRARY_SEARCH_BODY_MAX_WORDS), sedangkan legacy tumbuh seiring jumlah halaman.
+Teks isi untuk indeks pencarian menyimpan frekuensi kata sehingga tumbuh
+sampai batas itu; batasnya diset sebesar dokumen kecil (--body-words)
+supaya yang diukur adalah batas tersebut.
+
+    python -m benchmarks.text_memory
+    python -m benchmarks.text_memory --pages 2000 --check
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import megabytes, setup_django
+
+WORDS_PER_PAGE = 400
+
+
+def legacy(pdf_path):
+    from library.utils import analyze_text, extract_text_from_pdf
+
+    text = extract_text_from_pdf(pdf_path)
+    return analyze_text(text, max_keywords=5)
+
+
+def streaming(pdf_path):
+    from library.keywords import count_terms
+    from library.search import body_text
+    from library.text_store import iter_text
+    from library.utils import store_pdf_text
+
+    text_file = store_pdf_text(pdf_path, 0)
+    counts = count_terms(iter_text(text_file)).counts
+    body = body_text(iter_text(text_file))
+    return [word for word, _ in counts.most_common(5)], len(body)
+
+
+SCENARIOS = {'legacy': legacy, 'streaming': streaming}
+
+
+def measure(function, pdf_path):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    function(pdf_path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'peak_mb': round(megabytes(peak), 2), 'seconds': round(elapsed, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark memori ekstraksi teks")
+    parser.add_argument('--pages', type=int, default=400, help='Jumlah halaman dokumen besar')
+    parser.add_argument('--small-pages', type=int, default=None,
+                        help='Jumlah halaman dokumen kecil (default pages / 4)')
+    parser.add_argument('--check', action='store_true',
+                        help='Gagal jika memori streaming tumbuh seiring jumlah halaman')
+    parser.add_argument('--body-words', type=int, default=None,
+                        help='LIBRARY_SEARCH_BODY_MAX_WORDS (default jumlah kata dokumen kecil)')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    work_dir = setup_django()
+    from django.conf import settings
+
+    from benchmarks.corpus import text_pdf
+
+    # Modul dan dependensi dimuat sebelum pengukuran agar tidak ikut terhitung
+    import library.keywords, library.search, library.utils  # noqa: F401
+    try:
+        import nltk.tokenize  # noqa: F401
+    except ImportError:
+        pass
+
+    sizes = [args.small_pages or max(1, args.pages // 4), args.pages]
+    settings.LIBRARY_SEARCH_BODY_MAX_WORDS = args.body_words or sizes[0] * WORDS_PER_PAGE
+    report = {}
+    for pages in sizes:
+        pdf_path = text_pdf(os.path.join(work_dir, f'text_{pages}.pdf'), pages, WORDS_PER_PAGE)
+        report[pages] = {name: measure(function, pdf_path) for name, function in SCENARIOS.items()}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for pages, results in report.items():
+            for name, result in results.items():
+                print(f"{pages:6d} halaman  {name:10} puncak {result['peak_mb']:8.2f} MB  "
+                      f"{result['seconds']:7.2f} s")
+
+    small, large = (report[pages]['streaming']['peak_mb'] for pages in sizes)
+    growth = large / small if small else 0
+    print(f"Pertumbuhan memori streaming {sizes[0]} -> {sizes[1]} halaman: {growth:.2f}x")
+
+    if args.check and growth > 1.5:
+        print("REGRESI: memori streaming tumbuh seiring jumlah halaman", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
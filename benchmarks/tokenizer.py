@@ -0,0 +1,136 @@
+"""
+Benchmark tokenizer kata kunci.
+
+Membandingkan loop analisis lama (clean_text, word_tokenize/split,
+re.sub per kata, set stopword dibuat ulang setiap panggilan) dengan
+library.tokenizer pada teks sintetis berukuran tertentu (default 1 MB).
+Hasil hitungan kedua cara juga dibandingkan agar optimasi tidak
+mengubah kata kunci.
+
+    python -m benchmarks.tokenizer
+    python -m benchmarks.tokenizer --size-mb 4 --check --min-speedup 5
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import setup_django
+from benchmarks.corpus import paragraph
+
+
+def legacy_counts(raw_text):
+    """Salinan loop filter analyze_text sebelum library.tokenizer"""
+    clean_text_content = ' '.join(re.sub(r'[^a-zA-Z\s]', '', raw_text).lower().split())
+    try:
+        from nltk.tokenize import word_tokenize
+        words = word_tokenize(clean_text_content.lower())
+    except Exception:
+        words = clean_text_content.lower().split()
+
+    stop_words = {
+        'dan', 'atau', 'yang', 'untuk', 'dengan', 'dari', 'ke', 'di', 'pada',
+        'dalam', 'oleh', 'karena', 'sebagai', 'adalah', 'akan', 'dapat',
+        'telah', 'tidak', 'ada', 'ini', 'itu', 'juga', 'hanya', 'sudah',
+        'masih', 'lebih', 'saja', 'bisa', 'jika', 'bila', 'maka', 'sehingga',
+        'namun', 'tetapi', 'bahwa', 'dimana', 'bagaimana', 'kapan', 'siapa',
+        'mengapa', 'apa', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to',
+        'for', 'of', 'with', 'by', 'a', 'an', 'as', 'is', 'was', 'are', 'were',
+        'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+        'could', 'should', 'may', 'might', 'must', 'can', 'shall', 'page', 'pdf'
+    }
+
+    filtered_words = []
+    for word in words:
+        clean_word = re.sub(r'[^a-zA-Z]', '', word)
+        if (len(clean_word) > 3 and
+                clean_word.isalpha() and
+                clean_word.lower() not in stop_words):
+            filtered_words.append(clean_word.lower())
+    return Counter(filtered_words)
+
+
+def tokenizer_counts(pages):
+    from library.tokenizer import count_words
+    return count_words(pages)
+
+
+def sample_pages(size_mb, seed=0):
+    """Halaman teks sintetis (~3 KB per halaman) dengan tanda baca dan angka"""
+    rng = random.Random(seed)
+    pages, size = [], 0
+    while size < size_mb * 1024 * 1024:
+        page = paragraph(rng, 400)
+        page = page.replace('an ', 'an, ', 3).replace('s ', "s' ", 2) + f" Hal. {len(pages) + 1}."
+        pages.append(page)
+        size += len(page)
+    return pages
+
+
+def best_of(function, argument, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(argument)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tokenizer kata kunci")
+    parser.add_argument('--size-mb', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--min-speedup', type=float, default=5.0)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from library.tokenizer import STOP_WORDS, stop_words
+
+    pages = sample_pages(args.size_mb)
+    text = '\n'.join(pages)
+    # Muat NLTK/stopword sebelum pengukuran
+    stop_words()
+    legacy_counts("pemanasan")
+
+    legacy_time, legacy = best_of(legacy_counts, text, args.repeat)
+    new_time, new = best_of(tokenizer_counts, pages, args.repeat)
+
+    # Stopword NLTK (jika terpasang) sengaja ikut dibuang oleh tokenizer baru
+    extra_stop = stop_words() - STOP_WORDS
+    expected = Counter({word: count for word, count in legacy.items() if word not in extra_stop})
+    speedup = legacy_time / new_time if new_time else float('inf')
+    report = {
+        'size_mb': round(len(text) / (1024 * 1024), 2),
+        'legacy_seconds': round(legacy_time, 4),
+        'tokenizer_seconds': round(new_time, 4),
+        'speedup': round(speedup, 1),
+        'same_counts': expected == new,
+        'nltk_stopwords': len(extra_stop),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Teks {report['size_mb']} MB: lama {legacy_time * 1000:.1f} ms, "
+              f"tokenizer {new_time * 1000:.1f} ms, {speedup:.1f}x lebih cepat, "
+              f"hasil sama: {report['same_counts']}")
+
+    if args.check:
+        problems = []
+        if not report['same_counts']:
+            problems.append("hasil hitungan berbeda dari analisis lama")
+        if speedup < args.min_speedup:
+            problems.append(f"hanya {speedup:.1f}x lebih cepat (minimal {args.min_speedup}x)")
+        for problem in problems:
+            print(f"REGRESI: {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
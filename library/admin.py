@@ -1,6 +1,27 @@
 from django.contrib import admin
-from .models import Book
+from .models import Book, ContentBlob, ProcessingJob, UploadSession
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'created_at')
+    list_display = ('title', 'author', 'processing_status', 'created_at')
+    list_filter = ('processing_status',)
+
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ('book', 'status', 'stage', 'attempts', 'run_after', 'locked_by', 'updated_at')
+    list_filter = ('status', 'stage')
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(ContentBlob)
+class ContentBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size', 'pages', 'refcount', 'created_at')
+    readonly_fields = ('sha256', 'size', 'refcount', 'created_at')
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'user', 'size', 'status', 'book', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,144 @@
+"""
+Cache halaman hasil katalog (view book_list).
+
+Satu halaman hasil (buku di halaman itu dan jumlah total untuk paginasi)
+di-cache per kombinasi parameter (q, genre, page) yang dinormalisasi,
+atau (genre, posisi cursor) untuk keyset pagination,
+sehingga request berikutnya tidak menjalankan query daftar buku maupun
+COUNT(*). Bagian ini sama untuk semua user; status favorit tiap user
+dihitung terpisah oleh view.
+
+Invalidasi memakai nomor versi katalog yang ikut menjadi bagian key.
+Setiap perubahan buku (post_save/post_delete Book, perubahan status
+pemrosesan, indeks pencarian dibangun ulang) menaikkan versi, jadi
+entri lama tidak pernah terbaca lagi dan kedaluwarsa sendiri.
+
+Versi disimpan di cache default Django, jadi cache itu harus dipakai
+bersama oleh proses web dan worker (lihat CACHES di settings).
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+
+from .pagination import KeysetPage, decode_cursor, keyset_page
+
+VERSION_KEY = 'library:catalog_version'
+
+
+def _timeout():
+    return getattr(settings, 'LIBRARY_BOOK_LIST_CACHE_TIMEOUT', 600)
+
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Versi awal unik, supaya entri dari sebelum versi hilang (evicted) tidak terpakai
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def bump_catalog_version():
+    """
+    Tandai semua halaman katalog yang di-cache sebagai usang.
+    Di dalam transaksi, versi baru dinaikkan setelah commit agar request
+    lain tidak meng-cache data lama dengan versi baru.
+    """
+    transaction.on_commit(_bump)
+
+
+def normalize_params(query, genre, page):
+    """
+    Parameter yang menentukan isi halaman katalog.
+    Query dinormalisasi seperti pencarian (huruf kecil, kata yang sama),
+    genre yang tidak dikenal selalu menghasilkan daftar kosong.
+    """
+    from .models import Book
+    from .search import tokenize
+
+    terms = ' '.join(tokenize(query)) if query else None
+    if genre and genre not in dict(Book.GENRE_CHOICES):
+        genre = '?'
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        page = 1
+    return terms, genre or None, page
+
+
+def _cache_key(params):
+    digest = hashlib.md5(json.dumps(params).encode()).hexdigest()
+    return f"library:book_list:{catalog_version()}:{digest}"
+
+
+class CachedPaginator(Paginator):
+    """Paginator dengan jumlah total yang sudah diketahui (dari cache)"""
+
+    def __init__(self, count, per_page):
+        super().__init__([], per_page)
+        self.count = count
+
+
+def cached_book_page(query, genre, page, queryset, per_page):
+    """
+    Halaman katalog (Page) dari cache atau dari queryset.
+    queryset: fungsi tanpa argumen yang mengembalikan queryset buku terfilter,
+        hanya dipanggil jika halaman belum ada di cache
+    """
+    params = normalize_params(query, genre, page)
+    key = _cache_key(params)
+    entry = cache.get(key)
+
+    if entry is None:
+        paginator = Paginator(queryset(), per_page)
+        page_obj = paginator.get_page(page)
+        entry = {
+            'books': list(page_obj.object_list),
+            'count': paginator.count,
+            'number': page_obj.number,
+        }
+        # Nomor halaman di luar jangkauan diarahkan ke halaman lain oleh
+        # get_page; tidak disimpan agar nomor acak tidak memenuhi cache
+        if page_obj.number == params[2]:
+            cache.set(key, entry, _timeout())
+        return page_obj
+
+    paginator = CachedPaginator(entry['count'], per_page)
+    return Page(entry['books'], entry['number'], paginator)
+
+
+def cached_keyset_page(genre, cursor, queryset, per_page):
+    """
+    Halaman katalog keyset (KeysetPage) dari cache atau dari queryset.
+    Key memakai posisi cursor yang sudah diverifikasi, bukan teks token,
+    sehingga token palsu tidak membuat entri baru.
+    """
+    position = decode_cursor(cursor)
+    _, genre, _ = normalize_params(None, genre, None)
+    params = ['keyset', genre, per_page,
+              [position[0].isoformat(), position[1], position[2]] if position else None]
+    key = _cache_key(params)
+    entry = cache.get(key)
+
+    if entry is None:
+        page_obj = keyset_page(queryset(), position, per_page)
+        cache.set(key, {
+            'books': page_obj.object_list,
+            'has_next': page_obj.has_next(),
+            'has_previous': page_obj.has_previous(),
+        }, _timeout())
+        return page_obj
+
+    return KeysetPage(entry['books'], entry['has_next'], entry['has_previous'])
@@ -0,0 +1,201 @@
+"""
+Manifest progres konversi halaman (checkpoint) di folder gambar buku.
+
+Konversi menulis <folder gambar>/.progress.json berisi halaman yang sudah
+selesai dirender beserta tanda pengaturan render-nya (format, kualitas,
+lebar varian, zoom). Manifest ditulis atomik (file sementara lalu
+os.replace) sebelum render dimulai, setiap LIBRARY_RENDER_CHECKPOINT_PAGES
+halaman, dan di akhir konversi, sehingga:
+
+- Konversi yang mati di tengah jalan dilanjutkan di folder yang sama;
+  hanya halaman sesudah checkpoint terakhir yang dirender lagi. Gambar
+  halaman ditulis ke nama sementara lalu di-rename (save_page_image) dan
+  baru dicatat di manifest sesudahnya, jadi nama asli tidak pernah berisi
+  gambar setengah jadi; sisa file sementara dibuang saat dilanjutkan.
+- Proses ulang hanya merender halaman yang belum ada atau dirender dengan
+  pengaturan lama. Buku yang sudah lengkap tidak dirender sama sekali.
+
+Folder book_images/ di-cache browser selamanya (immutable), jadi gambar
+yang sudah pernah dilayani tidak boleh ditimpa dengan isi berbeda.
+prepare_images_folder() membuat folder baru untuk buku yang punya halaman
+usang: halaman yang masih berlaku di-hardlink (tanpa render dan tanpa
+tambahan ruang disk), hanya halaman usang yang dirender ulang. Halaman
+yang belum ada boleh ditambahkan langsung ke folder lama.
+
+Nama manifest diawali titik sehingga tidak dilayani library.media.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+
+from django.conf import settings
+
+from .rendering import (
+    IMAGE_FORMATS, PAGE_ZOOM, image_options, is_partial_name, page_image_name, partial_path,
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.progress.json'
+
+# Tanda untuk halaman folder lama (tanpa manifest) yang formatnya berbeda
+UNKNOWN_SIGNATURE = 'unknown'
+
+# page_001.webp, page_001_w480.webp
+PAGE_FILE_RE = re.compile(r'^page_(\d+)(?:_w\d+)?\.(\w+)$')
+
+
+def new_images_dir(book_id):
+    """Buat folder baru untuk gambar halaman buku"""
+    images_folder = f"book_images/{book_id}_{uuid.uuid4().hex[:8]}"
+    images_dir = os.path.join(settings.MEDIA_ROOT, images_folder)
+    os.makedirs(images_dir, exist_ok=True)
+    return images_folder, images_dir
+
+
+def render_signature(options, zoom=PAGE_ZOOM):
+    """Hash pendek pengaturan yang menentukan isi gambar halaman"""
+    source = json.dumps([options.fmt, options.quality, list(options.widths), zoom])
+    return hashlib.md5(source.encode()).hexdigest()[:12]
+
+
+class ConversionProgress:
+    """
+    Halaman yang sudah selesai dirender di satu folder gambar.
+    Folder lama tanpa manifest (dikonversi sebelum ada checkpoint) dibaca
+    dari nama file: gambar penuh dengan format saat ini dianggap berlaku.
+    """
+
+    def __init__(self, images_dir, options=None, zoom=PAGE_ZOOM, checkpoint_every=None, on_save=None):
+        self.images_dir = images_dir
+        self.options = options or image_options()
+        self.signature = render_signature(self.options, zoom)
+        self.checkpoint_every = checkpoint_every or getattr(
+            settings, 'LIBRARY_RENDER_CHECKPOINT_PAGES', 20)
+        self._unsaved = 0
+        # Dipanggil setelah setiap checkpoint, misalnya heartbeat job
+        self.on_save = on_save
+        self.pages = self._load()
+
+    @property
+    def path(self):
+        return os.path.join(self.images_dir, MANIFEST_NAME)
+
+    def _load(self):
+        try:
+            with open(self.path) as manifest:
+                data = json.load(manifest)
+            return {int(page_num): signature for page_num, signature in data['pages'].items()}
+        except FileNotFoundError:
+            return self._adopt()
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning("Progress manifest %s unreadable, starting over: %s", self.path, e)
+            return {}
+
+    def _adopt(self):
+        ext = IMAGE_FORMATS[self.options.fmt][1]
+        pages = {}
+        for name in self._existing():
+            match = PAGE_FILE_RE.match(name)
+            if match and '_w' not in name:
+                page_num = int(match.group(1))
+                if match.group(2) == ext:
+                    pages[page_num] = self.signature
+                else:
+                    pages.setdefault(page_num, UNKNOWN_SIGNATURE)
+        return pages
+
+    def _existing(self):
+        try:
+            return set(os.listdir(self.images_dir))
+        except OSError:
+            return set()
+
+    def pending(self, page_nums):
+        """Nomor halaman yang belum ada atau dirender dengan pengaturan lain"""
+        existing = self._existing()
+        return [page_num for page_num in page_nums
+                if self.pages.get(page_num) != self.signature
+                or page_image_name(page_num, fmt=self.options.fmt) not in existing]
+
+    def outdated(self):
+        """Nomor halaman yang sudah ada tetapi dirender dengan pengaturan lain"""
+        return sorted(page_num for page_num, signature in self.pages.items()
+                      if signature != self.signature)
+
+    def current(self):
+        return sorted(page_num for page_num, signature in self.pages.items()
+                      if signature == self.signature)
+
+    def remove_partial(self):
+        """Buang file sementara yang tertinggal dari konversi yang mati di tengah jalan"""
+        for name in self._existing():
+            if is_partial_name(name):
+                try:
+                    os.remove(os.path.join(self.images_dir, name))
+                except OSError:
+                    pass
+
+    def mark(self, page_nums):
+        """Catat halaman yang selesai dirender, checkpoint tiap checkpoint_every halaman"""
+        for page_num in page_nums:
+            self.pages[page_num] = self.signature
+            self._unsaved += 1
+        if self._unsaved >= self.checkpoint_every:
+            self.save()
+
+    def save(self):
+        tmp_path = partial_path(self.path)
+        with open(tmp_path, 'w') as manifest:
+            json.dump({'pages': {str(page_num): signature
+                                 for page_num, signature in sorted(self.pages.items())}}, manifest)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+        if self.on_save:
+            self.on_save()
+
+
+def _link(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        # Filesystem tanpa hardlink atau beda device
+        shutil.copy2(source, target)
+
+
+def prepare_images_folder(images_folder, book_id, options=None):
+    """
+    Folder untuk memproses ulang buku yang gambarnya sudah dilayani dari
+    images_folder.
+    Returns: images_folder sendiri jika tidak ada halaman usang, folder
+        baru berisi hardlink halaman yang masih berlaku jika ada, atau
+        None jika folder lama sudah tidak ada
+    """
+    options = options or image_options()
+    images_dir = os.path.join(settings.MEDIA_ROOT, images_folder)
+    if not os.path.isdir(images_dir):
+        return None
+
+    progress = ConversionProgress(images_dir, options)
+    outdated = progress.outdated()
+    if not outdated:
+        return images_folder
+
+    new_folder, new_dir = new_images_dir(book_id)
+    current = set(progress.current())
+    ext = IMAGE_FORMATS[options.fmt][1]
+    for entry in os.scandir(images_dir):
+        match = PAGE_FILE_RE.match(entry.name)
+        if match and match.group(2) == ext and int(match.group(1)) in current:
+            _link(entry.path, os.path.join(new_dir, entry.name))
+
+    new_progress = ConversionProgress(new_dir, options)
+    new_progress.mark(current)
+    new_progress.save()
+    logger.info("Images folder %s has %d outdated pages, re-rendering into %s (%d pages linked)",
+                images_folder, len(outdated), new_folder, len(current))
+    return new_folder
@@ -0,0 +1,286 @@
+"""
+Upload PDF besar per potongan yang bisa dilanjutkan.
+
+Upload multipart biasa harus diulang dari awal jika gagal, dan Django
+menyimpan seluruh file sebelum view berjalan. Alur per potongan:
+
+1. POST data buku beserta nama dan ukuran file -> UploadSession dibuat
+   dan file sementara <LIBRARY_UPLOAD_ROOT>/<id>.part dialokasikan
+   seukuran file. Cover yang dipilih user ikut dikirim dan disimpan
+   sementara sebagai <id>.cover sampai buku dibuat.
+2. PUT tiap potongan (boleh paralel, urutan bebas). Body dibaca per blok
+   dari stream request langsung ke posisinya di file sementara sambil
+   di-hash SHA-256, tidak pernah ditampung utuh di memori. Header
+   X-Chunk-SHA256 (opsional) diperiksa; potongan yang sudah diterima
+   dicatat sebagai UploadChunk.
+3. Setelah potongan terakhir diterima, satu request (klaim dengan UPDATE
+   bersyarat) menghitung SHA-256 file utuh, memindahkan file sementara ke
+   storage (rename, bukan salin) lewat library.content, membuat Book, dan
+   memasukkannya ke antrean pemrosesan.
+
+Upload yang terputus dilanjutkan dengan GET status sesi untuk melihat
+potongan yang belum ada. Sesi yang tidak selesai dihapus oleh
+`manage.py clear_upload_sessions`; sesi kedaluwarsa milik user juga
+dihapus saat ia memulai sesi baru, dan jumlah sesi terbuka per user
+dibatasi LIBRARY_UPLOAD_MAX_OPEN_SESSIONS.
+"""
+import hashlib
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Book, ContentBlob, ProcessingJob, UploadChunk, UploadSession
+
+logger = logging.getLogger(__name__)
+
+# Ukuran blok baca/tulis dari stream request dan saat hash file utuh
+BLOCK_SIZE = 1024 * 1024
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def upload_root():
+    return _setting('LIBRARY_UPLOAD_ROOT', os.path.join(settings.BASE_DIR, 'library_data', 'uploads'))
+
+
+def part_path(session):
+    return os.path.join(upload_root(), f"{session.pk}.part")
+
+
+def cover_path(session):
+    return os.path.join(upload_root(), f"{session.pk}.cover")
+
+
+class _PartFile(File):
+    """File sementara yang sudah di disk; FileSystemStorage memindahkannya (rename)"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def create_session(user, filename, size, metadata, cover=None):
+    """
+    Buat sesi upload dan alokasikan file sementaranya.
+    cover: file gambar cover (opsional), dipasang ke buku saat upload selesai
+    Raises: ValueError jika user sudah punya LIBRARY_UPLOAD_MAX_OPEN_SESSIONS
+        sesi yang belum selesai
+    """
+    for session in _expired_sessions().filter(user=user).iterator():
+        abort_session(session)
+    limit = _setting('LIBRARY_UPLOAD_MAX_OPEN_SESSIONS', 5)
+    open_sessions = UploadSession.objects.filter(
+        user=user, status__in=[UploadSession.STATUS_OPEN, UploadSession.STATUS_ASSEMBLING])
+    if limit and open_sessions.count() >= limit:
+        raise ValueError(f"Masih ada {limit} upload yang belum selesai, "
+                         "lanjutkan atau batalkan salah satunya dulu")
+
+    if cover:
+        metadata = {**metadata, 'cover_name': os.path.basename(cover.name)}
+    session = UploadSession.objects.create(
+        user=user, filename=filename, size=size, metadata=metadata,
+        chunk_size=_setting('LIBRARY_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024),
+    )
+    os.makedirs(upload_root(), exist_ok=True)
+    with open(part_path(session), 'wb') as part:
+        # Sparse file: ruang disk baru dipakai saat potongan ditulis
+        part.truncate(size)
+    if cover:
+        with open(cover_path(session), 'wb') as handle:
+            for block in cover.chunks():
+                handle.write(block)
+    logger.debug("Upload session %s created for %s (%d bytes)", session.pk, filename, size)
+    return session
+
+
+def received_chunks(session):
+    return sorted(session.chunks.values_list('index', flat=True))
+
+
+def write_chunk(session, index, stream, length, expected_sha256=None):
+    """
+    Tulis satu potongan dari stream ke posisinya di file sementara.
+    Raises: ValueError jika index/panjang tidak sesuai, body terputus,
+        atau hash tidak sama dengan expected_sha256
+    """
+    if not 0 <= index < session.chunk_count:
+        raise ValueError(f"Potongan {index} di luar rentang 0-{session.chunk_count - 1}")
+    if length != session.chunk_length(index):
+        raise ValueError(f"Potongan {index} harus {session.chunk_length(index)} byte, diterima {length}")
+
+    digest = hashlib.sha256()
+    try:
+        part = open(part_path(session), 'r+b')
+    except FileNotFoundError:
+        raise ValueError("File sementara upload tidak ada lagi, mulai upload baru")
+    with part:
+        part.seek(index * session.chunk_size)
+        remaining = length
+        while remaining:
+            data = stream.read(min(BLOCK_SIZE, remaining))
+            if not data:
+                raise ValueError(f"Potongan {index} terputus, kurang {remaining} byte")
+            part.write(data)
+            digest.update(data)
+            remaining -= len(data)
+
+    sha256 = digest.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != sha256:
+        raise ValueError(f"Hash potongan {index} tidak cocok")
+
+    # Satu pernyataan upsert: PUT paralel tidak saling menunggu kunci baca-lalu-tulis
+    UploadChunk.objects.bulk_create(
+        [UploadChunk(session=session, index=index, size=length, sha256=sha256)],
+        update_conflicts=True, unique_fields=['session', 'index'], update_fields=['size', 'sha256'],
+    )
+    # Sesi yang masih menerima potongan tidak dianggap kedaluwarsa
+    UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    return sha256
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def complete_if_received(session):
+    """
+    Susun buku jika semua potongan sudah diterima. Hanya satu request
+    yang mengerjakannya walau potongan terakhir datang bersamaan.
+    Returns: Book yang dibuat, atau None
+    """
+    from .content import save_uploaded_book
+    from .jobs import enqueue_book_processing
+
+    if session.chunks.count() < session.chunk_count:
+        return None
+    claimed = UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_OPEN).update(
+        status=UploadSession.STATUS_ASSEMBLING, updated_at=timezone.now(),
+    )
+    if not claimed:
+        return None
+
+    path = part_path(session)
+    metadata = dict(session.metadata)
+    cover_name = metadata.pop('cover_name', None)
+    book = None
+    try:
+        digest = _file_digest(path)
+        with transaction.atomic():
+            book = Book(uploader=session.user, **metadata)
+            if cover_name and os.path.exists(cover_path(session)):
+                with open(cover_path(session), 'rb') as cover:
+                    book.cover.save(cover_name, File(cover), save=False)
+            with open(path, 'rb') as handle:
+                ready = save_uploaded_book(book, _PartFile(handle, name=session.filename), digest)
+            # Cover yang diupload user tidak ditimpa cover dari PDF
+            enqueue_book_processing(book, cover=not book.cover,
+                                    done_stages=[ProcessingJob.STAGE_INGEST] if ready else ())
+            UploadSession.objects.filter(pk=session.pk).update(
+                status=UploadSession.STATUS_COMPLETE, sha256=digest[0], book=book,
+                last_error='', updated_at=timezone.now(),
+            )
+    except Exception as e:
+        logger.exception("Assembling upload session %s failed", session.pk)
+        if book is not None and book.cover:
+            # Salinan cover di storage dibuat lagi saat penyusunan diulang
+            book.cover.delete(save=False)
+        # Kembali terbuka supaya potongan terakhir bisa dikirim ulang, kecuali
+        # file sementara sudah dipindah ke storage dan tidak bisa dikembalikan
+        status = UploadSession.STATUS_OPEN if _restore_part(session, book) else UploadSession.STATUS_FAILED
+        UploadSession.objects.filter(pk=session.pk).update(
+            status=status, last_error=str(e), updated_at=timezone.now(),
+        )
+        raise
+
+    # File sudah dipindah ke storage, atau tidak dipakai karena isinya sudah ada
+    _remove_part(session)
+    session.refresh_from_db()
+    logger.info("Upload session %s completed as book %s", session.pk, book.pk)
+    return book
+
+
+def _restore_part(session, book):
+    """
+    Kembalikan file sementara yang sudah dipindah ke storage sebelum
+    penyusunan gagal (transaksi dibatalkan, jadi tidak ada blob yang
+    memakainya). Returns: True jika file sementara ada
+    """
+    path = part_path(session)
+    if os.path.exists(path):
+        return True
+    if book is None or not book.file:
+        return False
+    if ContentBlob.objects.filter(file=book.file.name).exists():
+        # File milik blob yang disimpan request lain, bukan file sementara ini
+        return False
+    try:
+        os.replace(book.file.path, path)
+    except (OSError, NotImplementedError, ValueError):
+        logger.warning("Part file of upload session %s is lost", session.pk)
+        return False
+    return True
+
+
+def _remove_part(session):
+    for path in (part_path(session), cover_path(session)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def abort_session(session):
+    """Hapus sesi yang belum selesai beserta file sementaranya"""
+    _remove_part(session)
+    session.delete()
+
+
+def _expiry_cutoff(max_age=None, now=None):
+    max_age = max_age if max_age is not None else _setting('LIBRARY_UPLOAD_SESSION_TTL', 60 * 60 * 24)
+    return (now or timezone.now()) - timedelta(seconds=max_age)
+
+
+def _expired_sessions(max_age=None, now=None):
+    """Sesi tidak selesai yang tidak menerima potongan lebih lama dari max_age detik"""
+    # Sesi ASSEMBLING yang terlalu lama berarti prosesnya mati di tengah jalan
+    return UploadSession.objects.filter(
+        status__in=[UploadSession.STATUS_OPEN, UploadSession.STATUS_ASSEMBLING,
+                    UploadSession.STATUS_FAILED],
+        updated_at__lt=_expiry_cutoff(max_age, now),
+    )
+
+
+def clear_expired_sessions(max_age=None, now=None):
+    """
+    Hapus sesi yang tidak selesai dan tidak menerima potongan lebih lama
+    dari max_age detik (default LIBRARY_UPLOAD_SESSION_TTL), serta file
+    sementara tanpa sesi. Returns: jumlah sesi yang dihapus
+    """
+    cutoff = _expiry_cutoff(max_age, now)
+    count = 0
+    for session in _expired_sessions(max_age, now).iterator():
+        abort_session(session)
+        count += 1
+
+    root = upload_root()
+    if os.path.isdir(root):
+        active = {str(pk) for pk in UploadSession.objects.exclude(
+            status=UploadSession.STATUS_COMPLETE).values_list('pk', flat=True)}
+        for entry in os.scandir(root):
+            session_id, ext = os.path.splitext(entry.name)
+            if (ext in ('.part', '.cover') and session_id not in active
+                    and entry.stat().st_mtime < cutoff.timestamp()):
+                os.remove(entry.path)
+    return count
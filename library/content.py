@@ -0,0 +1,180 @@
+"""
+Penyimpanan isi PDF berbasis hash (content-addressed).
+
+Setiap isi PDF unik disimpan sekali sebagai ContentBlob dengan kunci
+SHA-256 yang dihitung saat file diupload (library.uploads). Gambar
+halaman, cover, teks, dan kata kunci hasil pemrosesan disimpan di blob
+dengan nama berawalan hash, lalu disalin ke kolom Book yang memakainya.
+
+- Upload dengan isi yang sudah pernah diproses tidak menyimpan file baru
+  dan tidak dirender ulang: Book langsung menunjuk ke PDF dan hasil
+  turunan milik blob (lihat save_uploaded_book); teks isinya langsung
+  diindeks dari sidecar teks blob.
+- refcount blob = jumlah Book yang memakainya, diubah dengan F() di
+  transaksi yang sama dengan Book. Saat kembali nol blob dihapus dengan
+  DELETE bersyarat dan file-filenya dihapus setelah commit.
+"""
+import logging
+import os
+import shutil
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Book, ContentBlob
+from .search import body_text, index_book
+from .text_store import iter_text
+
+logger = logging.getLogger(__name__)
+
+# Kolom hasil pemrosesan yang disimpan di blob dan disalin ke Book
+ASSET_FIELDS = ('images_folder', 'pages', 'text_file', 'keywords')
+
+
+def asset_key(blob):
+    """Awalan nama folder gambar, cover, dan sidecar teks milik blob"""
+    return blob.sha256[:16]
+
+
+def claim(digest, size):
+    """Blob untuk isi dengan hash tersebut (dibuat jika belum ada), refcount +1"""
+    while True:
+        with transaction.atomic():
+            blob, _ = ContentBlob.objects.get_or_create(sha256=digest, defaults={'size': size})
+            # 0 baris: blob baru saja dihapus release() di antara SELECT dan UPDATE
+            if ContentBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1):
+                blob.refcount += 1
+                return blob
+
+
+def _store_file(blob, upload):
+    """Simpan file upload sebagai PDF blob jika blob belum punya file"""
+    if blob.file:
+        return
+    name = blob.file.storage.save(blob.file.field.generate_filename(blob, upload.name), upload)
+    if ContentBlob.objects.filter(pk=blob.pk, file='').update(file=name):
+        blob.file.name = name
+        return
+    # Request lain dengan isi yang sama menyimpan filenya lebih dulu
+    blob.file.storage.delete(name)
+    blob.refresh_from_db(fields=['file'])
+
+
+def link_assets(book, blob):
+    """Salin hasil pemrosesan blob ke buku (belum disimpan)"""
+    book.content = blob
+    # Nama file (bukan file upload) supaya FileField tidak menyimpan salinan baru
+    book.file = blob.file.name
+    for field in ASSET_FIELDS:
+        setattr(book, field, getattr(blob, field))
+    if blob.cover and not book.cover:
+        book.cover = blob.cover
+
+
+def save_uploaded_book(book, upload, digest):
+    """
+    Simpan buku dengan file PDF yang baru diupload. Isi yang sudah ada
+    dipakai bersama, file upload tidak disimpan lagi.
+    digest: (hex SHA-256, ukuran) dari library.uploads.upload_digest
+    Returns: True jika hasil pemrosesan sudah tersedia (tidak perlu dirender)
+    """
+    sha256, size = digest
+    old_content_id = book.content_id
+    with transaction.atomic():
+        blob = claim(sha256, size)
+        _store_file(blob, upload)
+        link_assets(book, blob)
+        book.save()
+        if blob.is_ready:
+            # Tahap ingest dilewati, padahal di sanalah teks isi buku diindeks
+            index_book(book, text=body_text(iter_text(blob.text_file)))
+        if old_content_id:
+            release(old_content_id)
+
+    logger.info("Book %s uses content %s (%d references, %s)", book.pk, asset_key(blob),
+                blob.refcount, 'ready' if blob.is_ready else 'needs processing')
+    return blob.is_ready
+
+
+def store_assets(book, result):
+    """
+    Simpan hasil ingest_pdf sebagai hasil pemrosesan blob buku.
+    Jika proses lain sudah lebih dulu menyimpan hasilnya, hasil ini dibuang
+    dan buku memakai hasil yang sudah ada.
+    Returns: blob dengan hasil yang berlaku
+    """
+    blob = book.content
+    stored = ContentBlob.objects.filter(pk=blob.pk, images_folder__isnull=True).update(
+        images_folder=result['images_folder'], pages=result['pages'],
+        text_file=result['text_file'], cover=result['cover'] or None,
+    )
+    if not stored:
+        logger.info("Content %s already processed, discarding duplicate render", asset_key(blob))
+        delete_assets(images_folder=result['images_folder'], cover=result['cover'],
+                      text_file=result['text_file'])
+    blob.refresh_from_db()
+    return blob
+
+
+def replace_images_folder(blob, images_folder):
+    """
+    Pindahkan blob dan semua buku yang memakainya ke folder gambar hasil
+    proses ulang (library.checkpoint.prepare_images_folder), lalu hapus
+    folder lama. Jika proses lain lebih dulu memindahkannya, folder ini
+    yang dibuang.
+    Returns: blob dengan hasil yang berlaku
+    """
+    old_folder = blob.images_folder
+    if images_folder == old_folder:
+        return blob
+    with transaction.atomic():
+        moved = ContentBlob.objects.filter(pk=blob.pk, images_folder=old_folder).update(
+            images_folder=images_folder)
+        if moved:
+            Book.objects.filter(content=blob).update(images_folder=images_folder)
+    delete_assets(images_folder=old_folder if moved else images_folder)
+    blob.refresh_from_db()
+    return blob
+
+
+def store_keywords(book):
+    """Simpan kata kunci buku sebagai kata kunci blob jika blob belum punya"""
+    if book.content_id and book.keywords:
+        ContentBlob.objects.filter(pk=book.content_id, keywords__isnull=True).update(keywords=book.keywords)
+
+
+def release(content_id):
+    """refcount -1, blob dan file-filenya dihapus jika tidak dipakai lagi"""
+    ContentBlob.objects.filter(pk=content_id).update(refcount=F('refcount') - 1)
+    unused = ContentBlob.objects.filter(pk=content_id, refcount__lte=0)
+    names = unused.values('file', 'images_folder', 'cover', 'text_file').first()
+    if names is None:
+        return
+    # Bersyarat: claim() di request lain bisa menaikkan refcount lebih dulu
+    deleted, _ = unused.delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_assets(
+            pdf=names['file'], images_folder=names['images_folder'],
+            cover=names['cover'], text_file=names['text_file'],
+        ))
+
+
+def delete_assets(pdf=None, images_folder=None, cover=None, text_file=None):
+    """Hapus PDF dan hasil pemrosesan milik blob dari disk"""
+    from types import SimpleNamespace
+
+    from .page_cache import get_page_cache
+    from .text_store import delete_text
+
+    for name in (pdf, cover):
+        if name:
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, name))
+            except FileNotFoundError:
+                pass
+    if images_folder:
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, images_folder), ignore_errors=True)
+        get_page_cache().clear_book(SimpleNamespace(images_folder=images_folder))
+    delete_text(text_file)
+    logger.debug("Deleted content files %s", images_folder or pdf)
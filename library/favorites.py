@@ -0,0 +1,78 @@
+"""
+Favorit buku.
+
+Toggle dikerjakan tanpa SELECT lebih dulu: DELETE baris (user, buku),
+dan hanya jika tidak ada yang terhapus baris baru di-INSERT dengan
+pengabaian konflik unique (INSERT OR IGNORE / ON CONFLICT DO NOTHING).
+Jumlah baris yang terpengaruh (rowcount) menentukan hasilnya, jadi dua
+request bersamaan tidak bisa membuat favorit ganda atau error. Semuanya
+dalam satu transaksi bersama update counter:
+
+- Book.favorites_count, jumlah user yang memfavoritkan buku
+- counter 'user:<id>:favorites' di StatCounter (library.stats)
+
+sehingga jumlah favorit tidak perlu COUNT(*) atas tabel favorit.
+Counter disesuaikan saat buku atau user dihapus (signal di models.py)
+dan dihitung ulang oleh `manage.py reconcile_stats`.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.constants import OnConflict
+from django.http import Http404
+from django.utils import timezone
+
+from . import stats
+from .models import Book, Favorite
+
+FAVORITES = 'favorites'
+
+
+def _table():
+    return connection.ops.quote_name(Favorite._meta.db_table)
+
+
+def _insert_ignore_sql():
+    columns = ', '.join(connection.ops.quote_name(column) for column in ('user_id', 'book_id', 'created_at'))
+    fields = [Favorite._meta.get_field(name) for name in ('user', 'book')]
+    insert = connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)
+    suffix = connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, fields)
+    return f"{insert} {_table()} ({columns}) VALUES (%s, %s, %s) {suffix}".strip()
+
+
+def toggle_favorite(user_id, book_id):
+    """
+    Tambah atau hapus favorit.
+    Returns: (is_favorited, jumlah favorit user)
+    Raises: Http404 jika buku tidak ada
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {_table()} WHERE user_id = %s AND book_id = %s", [user_id, book_id])
+        if cursor.rowcount:
+            is_favorited, delta = False, -1
+        else:
+            cursor.execute(_insert_ignore_sql(), [
+                user_id, book_id, connection.ops.adapt_datetimefield_value(timezone.now()),
+            ])
+            # rowcount 0: request lain sudah menambahkannya lebih dulu
+            is_favorited, delta = True, cursor.rowcount
+
+        # Sekaligus memastikan bukunya ada; foreign key baru diperiksa saat commit
+        if not Book.objects.filter(pk=book_id).update(favorites_count=F('favorites_count') + delta):
+            raise Http404("Buku tidak ditemukan")
+        stats.add(stats.user_key(user_id, FAVORITES), delta)
+    return is_favorited, user_favorites_count(user_id)
+
+
+def user_favorites_count(user_id):
+    return stats.user_stats(user_id)[FAVORITES]
+
+
+def forget_book_favorites(book_id):
+    """Kurangi counter favorit user yang memfavoritkan buku yang akan dihapus"""
+    user_ids = Favorite.objects.filter(book_id=book_id).values_list('user_id', flat=True)
+    stats.add_many([stats.user_key(user_id, FAVORITES) for user_id in user_ids.iterator()], -1)
+
+
+def forget_user_favorites(user_id):
+    """Kurangi Book.favorites_count buku-buku favorit user yang akan dihapus"""
+    Book.objects.filter(favorite__user_id=user_id).update(favorites_count=F('favorites_count') - 1)
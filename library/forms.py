@@ -1,4 +1,7 @@
+import os
+
 from django import forms
+from django.conf import settings
 from .models import Book
 
 class BookForm(forms.ModelForm):
@@ -50,3 +53,34 @@ class BookEditForm(forms.ModelForm):
         self.fields['author'].label = 'Penulis'
         self.fields['year'].label = 'Tahun Terbit'
         self.fields['genre'].label = 'Genre'
+
+
+class ChunkedUploadForm(forms.ModelForm):
+    """
+    Data buku untuk upload per potongan (library.chunked_uploads).
+    File PDF tidak ikut dikirim, hanya nama dan ukurannya; cover (opsional)
+    dikirim bersama data buku.
+    """
+    filename = forms.CharField(max_length=255)
+    size = forms.IntegerField(min_value=1)
+
+    class Meta:
+        model = Book
+        fields = ['title', 'description', 'author', 'year', 'genre', 'cover']
+
+    def clean_filename(self):
+        filename = os.path.basename(self.cleaned_data['filename'].replace('\\', '/'))
+        if not filename.lower().endswith('.pdf'):
+            raise forms.ValidationError('File harus berformat PDF')
+        return filename
+
+    def clean_size(self):
+        size = self.cleaned_data['size']
+        max_size = getattr(settings, 'LIBRARY_UPLOAD_MAX_SIZE', 2 * 1024 ** 3)
+        if size > max_size:
+            raise forms.ValidationError(f'Ukuran file maksimal {max_size // (1024 * 1024)} MB')
+        return size
+
+    def book_metadata(self):
+        """Data buku yang disimpan di UploadSession.metadata (tanpa cover)"""
+        return {field: self.cleaned_data[field] for field in self.Meta.fields if field != 'cover'}
@@ -0,0 +1,413 @@
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import metrics
+from .catalog_cache import bump_catalog_version
+from .checkpoint import new_images_dir, prepare_images_folder
+from .content import asset_key, delete_assets, replace_images_folder, store_assets, store_keywords
+from .models import Book, ProcessingJob
+from .search import body_text, index_book
+from .text_store import delete_text, has_text, iter_book_text, iter_text
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def worker_id():
+    """Identitas worker untuk kolom locked_by"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobLockLost(Exception):
+    """Job sudah diambil alih worker lain (dianggap stale), hasil worker ini dibuang"""
+
+
+def enqueue_book_processing(book, cover=True, keywords=True, done_stages=()):
+    """
+    Masukkan buku ke antrean pemrosesan PDF.
+    Job lama yang belum berjalan untuk buku yang sama dibatalkan.
+    done_stages: tahap yang hasilnya sudah ada (misalnya ingest untuk
+        isi PDF yang sudah pernah diproses, lihat library.content)
+    Folder konversi job sebelumnya yang belum selesai untuk file yang sama
+    dilanjutkan, bukan dirender ulang dari awal; cover yang sudah dibuatnya
+    juga dipakai lagi.
+    """
+    options = {'cover': cover, 'keywords': keywords}
+    with transaction.atomic():
+        previous = ProcessingJob.objects.filter(book=book).exclude(
+            status=ProcessingJob.STATUS_DONE).order_by('-pk').values_list('options', flat=True).first()
+        if previous and previous.get('images_folder') and previous.get('file') == book.file.name:
+            options.update(images_folder=previous['images_folder'], file=previous['file'])
+            if previous.get('cover_file'):
+                options['cover_file'] = previous['cover_file']
+
+        ProcessingJob.objects.filter(
+            book=book, status=ProcessingJob.STATUS_PENDING
+        ).delete()
+
+        job = ProcessingJob.objects.create(
+            book=book,
+            options=options,
+            stage_status={stage: ProcessingJob.STATUS_DONE for stage in done_stages},
+            max_attempts=_setting('LIBRARY_JOB_MAX_ATTEMPTS', 3),
+        )
+
+        book.processing_status = Book.STATUS_PENDING
+        _set_book_status(book, Book.STATUS_PENDING)
+
+    logger.debug("Enqueued processing job #%s for book %s", job.pk, book.pk)
+    return job
+
+
+def _set_book_status(book, status):
+    Book.objects.filter(pk=book.pk).update(processing_status=status)
+    # update() tidak memicu post_save, padahal katalog menampilkan status pemrosesan
+    bump_catalog_version()
+
+
+def claim_next_job(worker=None):
+    """
+    Ambil satu job yang siap dikerjakan.
+    Klaim dilakukan dengan UPDATE bersyarat sehingga aman dipakai
+    beberapa worker sekaligus (juga di SQLite yang tidak punya SELECT FOR UPDATE).
+    Job berstatus running yang terlalu lama tidak diperbarui dianggap
+    ditinggal worker yang mati dan boleh diambil ulang.
+    """
+    worker = worker or worker_id()
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=_setting('LIBRARY_JOB_STALE_TIMEOUT', 60 * 30))
+
+    ready = ProcessingJob.objects.filter(
+        Q(status=ProcessingJob.STATUS_PENDING, run_after__lte=now) |
+        Q(status=ProcessingJob.STATUS_RUNNING, locked_at__lt=stale_before)
+    )
+
+    for job in ready.order_by('run_after', 'id')[:10]:
+        claimed = ProcessingJob.objects.filter(
+            pk=job.pk, status=job.status, locked_at=job.locked_at
+        ).update(
+            status=ProcessingJob.STATUS_RUNNING,
+            locked_at=now,
+            locked_by=worker,
+            updated_at=now,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+    return None
+
+
+def _claimed(job):
+    """Queryset job selama masih dipegang worker ini"""
+    return ProcessingJob.objects.filter(pk=job.pk, status=ProcessingJob.STATUS_RUNNING,
+                                        locked_by=job.locked_by)
+
+
+def _save_claimed(job, *fields, release=False):
+    """
+    Simpan kolom job hanya jika job masih dipegang worker ini, sekaligus
+    heartbeat: locked_at diperbarui supaya job yang berjalan lebih lama dari
+    LIBRARY_JOB_STALE_TIMEOUT tidak diambil ulang. release=True melepas
+    kunci (job selesai atau dijadwalkan ulang). Worker yang job-nya sudah
+    diambil alih tidak boleh menimpa hasil worker baru.
+    """
+    job.updated_at = timezone.now()
+    job.locked_at = None if release else job.updated_at
+    values = {field: getattr(job, field) for field in fields + ('locked_at', 'updated_at')}
+    if not _claimed(job).update(**values):
+        raise JobLockLost(f"Job #{job.pk} sudah diambil alih worker lain")
+
+
+def _ingest_folder(book, job, published, key):
+    """
+    Folder gambar tempat ingest merender (library.checkpoint):
+    - folder percobaan sebelumnya yang terhenti, dicatat di job.options;
+    - folder yang sudah dilayani (published) jika tidak ada halaman usang,
+      atau salinan hardlink-nya jika ada;
+    - folder baru.
+    Folder dicatat di job sebelum render supaya retry melanjutkannya.
+    """
+    folder = job.options.get('images_folder') if job.options.get('file') == book.file.name else None
+    if folder == published or not (folder and os.path.isdir(os.path.join(settings.MEDIA_ROOT, folder))):
+        folder = prepare_images_folder(published, key) if published else None
+        if folder is None:
+            folder, _ = new_images_dir(key)
+
+    if job.options.get('images_folder') != folder:
+        job.options.update(images_folder=folder, file=book.file.name)
+        _save_claimed(job, 'options')
+    return folder
+
+
+def _pending_cover(book, job, make_cover):
+    """
+    Cover yang dibuat percobaan sebelumnya untuk buku tanpa ContentBlob
+    tetapi belum tersimpan ke buku, dicatat di job.options seperti folder
+    gambar. Dipakai lagi jika masih diperlukan, selain itu dihapus.
+    """
+    cover = job.options.get('cover_file')
+    if not cover:
+        return None
+    if make_cover and os.path.isfile(os.path.join(settings.MEDIA_ROOT, cover)):
+        return cover
+    if cover != book.cover.name:
+        delete_assets(cover=cover)
+    del job.options['cover_file']
+    _save_claimed(job, 'options')
+    return None
+
+
+def _stage_ingest(book, job):
+    from .utils import ingest_pdf
+
+    # Jangan timpa cover yang diupload user
+    make_cover = job.options.get('cover', True) and not book.cover
+
+    blob = book.content
+    if blob is not None:
+        key = asset_key(blob)
+        # Hasil disimpan di blob dengan nama berawalan hash isi PDF; cover
+        # selalu dibuat supaya upload berikutnya dengan isi sama ikut memakainya.
+        # Isi yang sudah pernah diproses hanya merender halaman yang kurang/usang.
+        fresh = not blob.is_ready
+        result = ingest_pdf(book.file, key, make_cover=fresh, extract_text=fresh,
+                            images_folder=_ingest_folder(book, job, blob.images_folder, key),
+                            on_checkpoint=lambda: _save_claimed(job))
+        if not result['images_folder'] or result['pages'] <= 0:
+            raise RuntimeError("Konversi PDF ke gambar gagal")
+        if fresh:
+            blob = store_assets(book, result)
+        else:
+            blob = replace_images_folder(blob, result['images_folder'])
+
+        book.images_folder = blob.images_folder
+        book.pages = blob.pages
+        book.text_file = blob.text_file
+        if make_cover and blob.cover:
+            book.cover = blob.cover
+    else:
+        # Proses ulang: teks yang sudah diekstrak tidak diekstrak lagi
+        old_folder = book.images_folder
+        images_folder = _ingest_folder(book, job, old_folder, book.id)
+        cover = _pending_cover(book, job, make_cover)
+        result = ingest_pdf(book.file, book.id, make_cover=make_cover and not cover,
+                            extract_text=not has_text(book), images_folder=images_folder,
+                            on_checkpoint=lambda: _save_claimed(job))
+        if result['cover']:
+            # Dicatat sebelum buku disimpan supaya retry tidak membuat cover baru
+            cover = result['cover']
+            job.options['cover_file'] = cover
+            _save_claimed(job, 'options')
+        if not result['images_folder'] or result['pages'] <= 0:
+            raise RuntimeError("Konversi PDF ke gambar gagal")
+
+        book.images_folder = result['images_folder']
+        book.pages = result['pages']
+        if cover:
+            book.cover = cover
+
+        if old_folder and old_folder != book.images_folder:
+            # Buku menunjuk ke folder baru dulu, baru folder lama dihapus
+            Book.objects.filter(pk=book.pk).update(images_folder=book.images_folder)
+            delete_assets(images_folder=old_folder)
+
+        # Teks per halaman tersimpan di sidecar, sidecar lama tidak terpakai lagi
+        if result['text_file']:
+            old_text_file = book.text_file
+            book.text_file = result['text_file']
+            if old_text_file and old_text_file != book.text_file:
+                delete_text(old_text_file)
+
+    # Teks isi buku masuk ke indeks pencarian, dibaca per halaman dari sidecar
+    index_book(book, text=body_text(iter_text(book.text_file)))
+
+
+def _stage_keywords(book, job):
+    from .keywords import extract_keywords
+
+    if not job.options.get('keywords', True):
+        return
+
+    # Teks disimpan saat ingest dan dibaca per halaman, PDF tidak di-parsing lagi.
+    # Skor TF-IDF terhadap statistik seluruh koleksi.
+    keywords = extract_keywords(book.pk, iter_book_text(book), max_keywords=5,
+                                source_name=book.file.name)
+    if keywords:
+        book.keywords = ', '.join(keywords)
+        store_keywords(book)
+
+
+def _stage_related(book, job):
+    from .similarity import update_book
+
+    # Daftar buku serupa untuk buku ini dan buku lain yang mirip dengannya
+    update_book(book)
+
+
+# Kolom Book yang boleh diubah oleh tahap pemrosesan
+BOOK_RESULT_FIELDS = ['images_folder', 'pages', 'cover', 'text_file', 'keywords']
+
+STAGE_HANDLERS = {
+    ProcessingJob.STAGE_INGEST: _stage_ingest,
+    ProcessingJob.STAGE_KEYWORDS: _stage_keywords,
+    ProcessingJob.STAGE_RELATED: _stage_related,
+}
+
+
+def run_job(job):
+    """
+    Jalankan semua tahap job secara berurutan.
+    Tahap yang sudah selesai pada percobaan sebelumnya dilewati, jadi
+    retry hanya mengulang tahap yang gagal dan sesudahnya.
+    Job yang isi PDF-nya sedang di-ingest job lain menunggu hasilnya
+    (_defer_job), tidak ikut merender.
+    Setiap awal/akhir tahap dan checkpoint render memperbarui locked_at
+    (heartbeat). Jika job ternyata sudah diambil alih worker lain,
+    JobLockLost dilempar dan job tidak disentuh lagi oleh worker ini.
+    Returns: True jika job selesai
+    """
+    book = job.book
+    _set_book_status(book, Book.STATUS_PROCESSING)
+
+    if not (book.file and book.file.name.endswith('.pdf')):
+        return _fail_job(job, book, "File buku bukan PDF atau tidak ditemukan", retry=False)
+
+    for stage in ProcessingJob.STAGES:
+        if job.stage_status.get(stage) == ProcessingJob.STATUS_DONE:
+            continue
+        if stage == ProcessingJob.STAGE_INGEST and _content_in_progress(book, job):
+            return _defer_job(job, book)
+
+        job.stage = stage
+        job.stage_status[stage] = ProcessingJob.STATUS_RUNNING
+        _save_claimed(job, 'stage', 'stage_status')
+
+        try:
+            with metrics.span(f"job:{stage}"):
+                STAGE_HANDLERS[stage](book, job)
+        except JobLockLost:
+            raise
+        except Exception as e:
+            logger.exception("Job #%s stage %s failed", job.pk, stage)
+            job.stage_status[stage] = ProcessingJob.STATUS_FAILED
+            return _fail_job(job, book, f"{stage}: {str(e)}")
+
+        # Simpan hasil tiap tahap agar tidak hilang saat tahap berikutnya gagal.
+        # update_fields memastikan buku yang sudah dihapus tidak dibuat ulang.
+        book.save(update_fields=BOOK_RESULT_FIELDS)
+        job.stage_status[stage] = ProcessingJob.STATUS_DONE
+        _save_claimed(job, 'stage_status')
+
+    job.status = ProcessingJob.STATUS_DONE
+    job.last_error = ''
+    _save_claimed(job, 'status', 'last_error', release=True)
+
+    _set_book_status(book, Book.STATUS_READY)
+    metrics.increment('library_jobs_total', status='done')
+    logger.info("Job #%s completed for book %s", job.pk, book.pk)
+    return True
+
+
+def _content_in_progress(book, job):
+    """
+    True jika isi PDF buku (ContentBlob yang belum punya hasil) sedang
+    di-ingest job lain, misalnya upload duplikat yang datang saat upload
+    pertama masih diproses. Dicek sebelum tahap ingest ditandai berjalan,
+    jadi dua job tidak saling menunggu; jika keduanya lolos bersamaan,
+    store_assets tetap membuang hasil render yang kedua.
+    """
+    blob = book.content
+    if blob is None or blob.is_ready:
+        return False
+    stale_before = timezone.now() - timedelta(seconds=_setting('LIBRARY_JOB_STALE_TIMEOUT', 60 * 30))
+    return ProcessingJob.objects.filter(
+        book__content=blob, status=ProcessingJob.STATUS_RUNNING, stage=ProcessingJob.STAGE_INGEST,
+        locked_at__gte=stale_before,
+    ).exclude(pk=job.pk).exists()
+
+
+def _defer_job(job, book):
+    """
+    Kembalikan job ke antrean tanpa menghitung percobaan. Saat diambil
+    lagi hasil job lain sudah tersimpan di blob, jadi tidak ada yang
+    dirender ulang (lihat _stage_ingest).
+    """
+    delay = _setting('LIBRARY_JOB_WAIT_DELAY', 15)
+    job.status = ProcessingJob.STATUS_PENDING
+    job.run_after = timezone.now() + timedelta(seconds=delay)
+    _save_claimed(job, 'status', 'run_after', release=True)
+    _set_book_status(book, Book.STATUS_PENDING)
+    logger.info("Job #%s waits %ss for content %s processed by another job",
+                job.pk, delay, asset_key(book.content))
+    return False
+
+
+def _fail_job(job, book, error, retry=True):
+    """Catat kegagalan dan jadwalkan ulang dengan backoff eksponensial"""
+    job.attempts += 1
+    job.last_error = error
+
+    if retry and job.attempts < job.max_attempts:
+        delay = _setting('LIBRARY_JOB_RETRY_DELAY', 30) * (2 ** (job.attempts - 1))
+        job.status = ProcessingJob.STATUS_PENDING
+        job.run_after = timezone.now() + timedelta(seconds=delay)
+        book_status = Book.STATUS_PENDING
+        metrics.increment('library_jobs_total', status='retry')
+        logger.warning("Job #%s failed (%s), retry in %ss", job.pk, error, delay)
+    else:
+        job.status = ProcessingJob.STATUS_FAILED
+        book_status = Book.STATUS_FAILED
+        metrics.increment('library_jobs_total', status='failed')
+        logger.error("Job #%s failed permanently: %s", job.pk, error)
+
+    _save_claimed(job, 'attempts', 'last_error', 'status', 'run_after', 'stage_status', release=True)
+    _set_book_status(book, book_status)
+    return False
+
+
+def run_worker(once=False, poll_interval=5, stop_event=None):
+    """
+    Loop worker: ambil job, kerjakan, ulangi.
+    Dengan once=True worker berhenti ketika antrean kosong.
+    """
+    import time
+    from django.db import close_old_connections
+
+    worker = worker_id()
+    processed = 0
+
+    while not (stop_event and stop_event.is_set()):
+        close_old_connections()
+        job = claim_next_job(worker)
+
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        logger.debug("Worker %s picked job #%s", worker, job.pk)
+        try:
+            run_job(job)
+        except (Book.DoesNotExist, DatabaseError) as e:
+            # Buku (beserta job-nya) dihapus saat job berjalan
+            logger.info("Job #%s aborted: %s", job.pk, e)
+        except JobLockLost as e:
+            # Worker lain sudah mengerjakan job ini; hasil worker ini tidak dicatat
+            logger.warning("Job #%s abandoned: %s", job.pk, e)
+        processed += 1
+        # Metrik worker dibaca endpoint /library/metrics/ di proses web
+        metrics.flush(force=True)
+
+    return processed
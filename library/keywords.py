@@ -0,0 +1,525 @@
+"""
+Ekstraksi kata kunci berbasis TF-IDF seluruh koleksi.
+
+Jumlah kemunculan kata per buku disimpan sebagai sparse matrix
+(baris = buku, kolom = kata) di LIBRARY_KEYWORD_MODEL_PATH. Dari matrix
+ini didapat document frequency setiap kata, sehingga kata umum yang
+muncul di hampir semua buku tidak lagi mendominasi kata kunci.
+
+- Buku baru/diproses ulang cukup menambah atau mengganti satu baris
+  (KeywordModel.add_book), tanpa fit ulang seluruh koleksi. Perubahan
+  per buku (juga buku yang dihapus) ditambahkan ke journal kecil
+  <model>.journal; file model baru ditulis ulang setiap
+  LIBRARY_KEYWORD_JOURNAL_BATCH perubahan. Setiap proses menyimpan model
+  di memori dan hanya membaca baris journal yang baru.
+- Perankingan ulang semua buku (rerank) dihitung sekaligus dengan
+  operasi vektor numpy, dipakai oleh `python manage.py rerank_keywords`.
+
+Teks dibaca per halaman (TermCounter), jadi memori yang dipakai tidak
+bergantung pada tebal buku, hanya pada satu halaman dan kosakatanya.
+"""
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from . import tokenizer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MODEL_VERSION = 1
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def keyword_terms(text):
+    """
+    Kata kandidat kata kunci: hanya huruf, lebih dari 3 karakter,
+    bukan stopword (lihat library.tokenizer).
+    """
+    return tokenizer.words(text)
+
+
+class TermCounter:
+    """
+    Penghitung kata kunci kandidat yang diisi halaman demi halaman.
+    Hanya jumlah per kata yang disimpan, bukan teksnya.
+    """
+
+    # Potongan awal teks disimpan untuk fallback analyze_text (PDF hasil scan)
+    SAMPLE_CHARS = 200
+
+    def __init__(self):
+        self.counts = Counter()
+        self.chars = 0
+        self.sample = ""
+
+    def _track(self, pages):
+        for page in pages:
+            if page:
+                stripped = page.strip()
+                self.chars += len(stripped)
+                if len(self.sample) < self.SAMPLE_CHARS and stripped:
+                    self.sample = f"{self.sample} {stripped}".strip()[:self.SAMPLE_CHARS]
+            yield page
+
+    def feed(self, pages):
+        # Halaman diproses per batch oleh tokenizer, stopword dibuang di akhir
+        tokenizer.count_words(self._track(pages), counts=self.counts)
+        return self
+
+    def add(self, text):
+        return self.feed([text])
+
+
+def count_terms(pages):
+    """
+    Hitung kata kunci kandidat dari iterable teks halaman (boleh generator).
+    String tunggal dianggap satu halaman.
+    """
+    if isinstance(pages, str):
+        pages = [pages]
+    return TermCounter().feed(pages)
+
+
+def inverse_document_frequency(df, n_docs):
+    return np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+
+def tfidf(counts, df, n_docs):
+    """
+    Bobot TF-IDF dari matrix jumlah kata (CSR).
+    tf sublinear (1 + log n) karena panjang buku sangat bervariasi,
+    idf dengan smoothing seperti TfidfVectorizer(smooth_idf=True).
+    """
+    idf = inverse_document_frequency(df, n_docs)
+    weights = counts.astype(np.float32, copy=True)
+    weights.data = (1.0 + np.log(weights.data)) * idf[weights.indices]
+    return weights
+
+
+def top_terms(weights, k, chunk_rows=4096):
+    """
+    Index kolom k bobot tertinggi untuk setiap baris CSR, tanpa loop per baris.
+    Setiap blok baris disalin ke array padat (baris x jumlah kata terbanyak
+    per buku, dibatasi LIBRARY_KEYWORD_MAX_TERMS) lalu dipilih sekaligus
+    dengan argpartition, jadi tidak perlu mengurutkan semua nilai.
+    Returns: list array index kolom, satu per baris, bobot tertinggi lebih dulu
+    """
+    weights = weights.tocsr()
+    ranked = []
+    for start in range(0, weights.shape[0], chunk_rows):
+        block = weights[start:start + chunk_rows]
+        lengths = np.diff(block.indptr)
+        width = int(lengths.max()) if len(lengths) else 0
+        if width == 0:
+            ranked.extend(np.empty(0, dtype=block.indices.dtype) for _ in lengths)
+            continue
+
+        # Posisi setiap nilai di dalam barisnya
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        positions = np.arange(block.nnz) - block.indptr[rows]
+        dense = np.full((len(lengths), width), -np.inf, dtype=np.float32)
+        dense[rows, positions] = block.data
+
+        top = min(k, width)
+        best = np.argpartition(-dense, top - 1, axis=1)[:, :top]
+        order = np.argsort(-np.take_along_axis(dense, best, axis=1), axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+
+        valid = best < lengths[:, None]
+        columns = block.indices[np.where(valid, block.indptr[:-1, None] + best, 0)]
+        ranked.extend(np.split(columns[valid], np.cumsum(np.minimum(lengths, top))[:-1]))
+    return ranked
+
+
+class KeywordModel:
+    """
+    Statistik kata seluruh koleksi.
+    counts: csr_matrix jumlah kata (buku x kata)
+    book_ids: id buku untuk setiap baris
+    terms: daftar kata untuk setiap kolom
+    """
+
+    def __init__(self, terms=None, counts=None, book_ids=None):
+        self.terms = list(terms or [])
+        self.vocabulary = {term: index for index, term in enumerate(self.terms)}
+        self.book_ids = list(book_ids or [])
+        self.rows = {book_id: row for row, book_id in enumerate(self.book_ids)}
+        if counts is None:
+            counts = sparse.csr_matrix((len(self.book_ids), len(self.terms)), dtype=np.int32)
+        self.counts = counts.tocsr()
+        self._update_df()
+
+    def _update_df(self):
+        # Document frequency = jumlah baris bukan nol di setiap kolom
+        self.df = np.bincount(self.counts.indices, minlength=len(self.terms)).astype(np.int64)
+
+    @property
+    def n_docs(self):
+        return len(self.book_ids)
+
+    # --- Penyimpanan -----------------------------------------------------------
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or model_path()
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path, allow_pickle=False) as data:
+            terms = data['terms'].tolist()
+            counts = sparse.csr_matrix(
+                (data['data'], data['indices'], data['indptr']),
+                shape=tuple(data['shape']),
+            )
+            return cls(terms, counts, data['book_ids'].tolist())
+
+    def save(self, path=None):
+        """Simpan ke satu file .npz, ditulis ke file sementara lalu di-rename"""
+        path = path or model_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as handle:
+            np.savez(
+                handle,
+                version=np.array(MODEL_VERSION),
+                terms=np.array(self.terms, dtype=str),
+                book_ids=np.array(self.book_ids, dtype=np.int64),
+                data=self.counts.data,
+                indices=self.counts.indices,
+                indptr=self.counts.indptr,
+                shape=np.array(self.counts.shape),
+            )
+        os.replace(tmp_path, path)
+
+    # --- Fit dan pembaruan -----------------------------------------------------
+
+    @classmethod
+    def fit(cls, documents):
+        model = cls()
+        model.refit(documents)
+        return model
+
+    def refit(self, documents):
+        """
+        Bangun ulang statistik dari awal.
+        documents: iterable (book_id, jumlah kata) dengan jumlah kata berupa
+            dict/Counter (lihat count_terms), boleh berupa generator
+        Matrix dibangun langsung dalam format CSR, satu buku per baris,
+        sehingga hanya jumlah kata satu buku yang ada di memori.
+        """
+        self.__init__()
+        data, indices, indptr, book_ids = [], [], [0], []
+        for book_id, counts in documents:
+            for term, count in _cap_terms(counts).items():
+                column = self.vocabulary.get(term)
+                if column is None:
+                    column = self.vocabulary[term] = len(self.terms)
+                    self.terms.append(term)
+                indices.append(column)
+                data.append(count)
+            indptr.append(len(indices))
+            book_ids.append(book_id)
+
+        counts = sparse.csr_matrix(
+            (np.array(data, dtype=np.int32), np.array(indices, dtype=np.int32), np.array(indptr)),
+            shape=(len(book_ids), len(self.terms)),
+        )
+        counts.sort_indices()
+        self.__init__(self.terms, counts, book_ids)
+
+    def _row_for(self, counts):
+        """Satu baris CSR dari jumlah kata, kata baru ditambahkan ke kosakata"""
+        counts = _cap_terms(counts)
+        for term in counts:
+            if term not in self.vocabulary:
+                self.vocabulary[term] = len(self.terms)
+                self.terms.append(term)
+
+        columns = np.array([self.vocabulary[term] for term in counts], dtype=np.int32)
+        values = np.array(list(counts.values()), dtype=np.int32)
+        order = np.argsort(columns)
+        return sparse.csr_matrix(
+            (values[order], columns[order], np.array([0, len(columns)])),
+            shape=(1, len(self.terms)),
+        )
+
+    def _resize_columns(self):
+        if self.counts.shape[1] < len(self.terms):
+            self.counts.resize((self.counts.shape[0], len(self.terms)))
+
+    def add_book(self, book_id, counts):
+        """
+        Tambah atau ganti statistik satu buku tanpa fit ulang.
+        counts: dict/Counter jumlah kata buku (lihat count_terms)
+        """
+        self.update_books([(book_id, counts)])
+
+    def remove_book(self, book_id):
+        self.update_books([(book_id, None)])
+
+    def update_books(self, books):
+        """
+        Tambah, ganti, atau hapus statistik beberapa buku sekaligus dengan
+        satu vstack.
+        books: iterable (book_id, jumlah kata), jumlah kata None = hapus
+        """
+        books = dict(books)
+        if not books:
+            return
+        keep = np.array([book_id not in books for book_id in self.book_ids], dtype=bool)
+        if not keep.all():
+            self.counts = self.counts[keep]
+            self.book_ids = [book_id for book_id in self.book_ids if book_id not in books]
+
+        added = [(book_id, counts) for book_id, counts in books.items() if counts is not None]
+        if added:
+            rows = [self._row_for(counts) for _, counts in added]
+            self._resize_columns()
+            for row in rows:
+                row.resize((1, len(self.terms)))
+            self.counts = sparse.vstack([self.counts, *rows], format='csr')
+            self.book_ids.extend(book_id for book_id, _ in added)
+
+        self.rows = {book_id: row for row, book_id in enumerate(self.book_ids)}
+        self._update_df()
+
+    def retain(self, book_ids):
+        """Buang baris buku yang sudah tidak ada di database"""
+        book_ids = set(book_ids)
+        keep = np.array([book_id in book_ids for book_id in self.book_ids], dtype=bool)
+        if keep.all():
+            return
+        self.counts = self.counts[keep]
+        self.book_ids = [book_id for book_id in self.book_ids if book_id in book_ids]
+        self.rows = {book_id: row for row, book_id in enumerate(self.book_ids)}
+        self._update_df()
+
+    # --- Skor ------------------------------------------------------------------
+
+    def idf(self):
+        return inverse_document_frequency(self.df, self.n_docs)
+
+    def weights(self):
+        """Matrix TF-IDF semua buku (buku x kata)"""
+        return tfidf(self.counts, self.df, self.n_docs)
+
+    def keywords_for(self, book_id, max_keywords=5):
+        """Kata kunci satu buku yang sudah ada di model"""
+        row = self.rows.get(book_id)
+        if row is None:
+            return []
+        weights = tfidf(self.counts[row], self.df, self.n_docs)
+        return [self.terms[index] for index in top_terms(weights, max_keywords)[0]]
+
+    def rerank(self, max_keywords=5):
+        """Kata kunci semua buku sekaligus: dict book_id -> list kata"""
+        if not self.n_docs:
+            return {}
+        ranked = top_terms(self.weights(), max_keywords)
+        terms = np.array(self.terms, dtype=object)
+        return {
+            book_id: terms[indices].tolist()
+            for book_id, indices in zip(self.book_ids, ranked)
+        }
+
+
+def _cap_terms(counts):
+    """
+    Batasi kata per buku ke LIBRARY_KEYWORD_MAX_TERMS yang paling sering
+    supaya ukuran matrix tetap kecil untuk koleksi besar.
+    """
+    limit = _setting('LIBRARY_KEYWORD_MAX_TERMS', 1000)
+    if len(counts) <= limit:
+        return counts
+    return dict(Counter(counts).most_common(limit))
+
+
+def model_path():
+    return _setting(
+        'LIBRARY_KEYWORD_MODEL_PATH',
+        os.path.join(settings.BASE_DIR, 'library_data', 'keywords.npz'),
+    )
+
+
+def journal_path(path=None):
+    return f"{path or model_path()}.journal"
+
+
+_model_lock = threading.Lock()
+
+# Model per path di proses ini: tanda file model, posisi baca journal,
+# dan jumlah perubahan di journal yang belum dipadatkan ke file model
+_cache = {}
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+@contextmanager
+def _locked(path):
+    """
+    Kunci model selama dibaca-lalu-diubah. Kunci file (fcntl) mencegah
+    worker lain menimpa perubahan di antara load dan save; di Windows
+    hanya thread dalam proses yang dikunci.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _model_lock, open(f"{path}.lock", 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_journal(path, offset=0):
+    """
+    Perubahan di journal mulai posisi offset (byte).
+    Baris terakhir yang belum lengkap (penulisnya mati) diabaikan.
+    Returns: (list (book_id, jumlah kata atau None), posisi akhir)
+    """
+    try:
+        with open(journal_path(path), 'rb') as journal:
+            journal.seek(offset)
+            data = journal.read()
+    except FileNotFoundError:
+        return [], 0
+    end = data.rfind(b'\n') + 1
+    entries = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return [(entry['book'], entry['counts']) for entry in entries], offset + end
+
+
+def _append_journal(path, books):
+    with open(journal_path(path), 'a') as journal:
+        for book_id, counts in books:
+            journal.write(json.dumps({'book': book_id, 'counts': counts}) + '\n')
+
+
+def _current_model(path):
+    """
+    Model terbaru (file model + journal) milik proses ini. Dibaca ulang
+    penuh hanya jika file model berubah; selain itu cukup baris journal
+    yang baru. Harus dipanggil di dalam _locked(path).
+    """
+    base = _file_signature(path)
+    journal = _file_signature(journal_path(path))
+    journal_size = journal[2] if journal else 0
+    cached = _cache.get(path)
+    if cached is None or cached['base'] != base or journal_size < cached['offset']:
+        cached = _cache[path] = {'base': base, 'offset': 0, 'pending': 0,
+                                 'model': KeywordModel.load(path)}
+
+    if journal_size > cached['offset']:
+        books, cached['offset'] = _read_journal(path, cached['offset'])
+        cached['model'].update_books(books)
+        cached['pending'] += len(books)
+    return cached['model']
+
+
+def _compact(path, model):
+    """Tulis model utuh lalu kosongkan journal. Harus di dalam _locked(path)."""
+    model.save(path)
+    try:
+        os.remove(journal_path(path))
+    except FileNotFoundError:
+        pass
+    _cache[path] = {'base': _file_signature(path), 'offset': 0, 'pending': 0, 'model': model}
+
+
+def load_model(path=None):
+    """
+    Model terbaru (file model + journal) untuk dibaca saja: tanpa kunci,
+    tidak di-cache, dan tidak pernah disimpan
+    """
+    path = path or model_path()
+    model = KeywordModel.load(path)
+    model.update_books(_read_journal(path)[0])
+    return model
+
+
+@contextmanager
+def locked_model():
+    """
+    Model bersama yang dikunci selama diubah, lalu disimpan utuh
+    (journal ikut dipadatkan). Dipakai perubahan besar seperti refit.
+    """
+    path = model_path()
+    with _locked(path):
+        model = _current_model(path)
+        try:
+            yield model
+        except BaseException:
+            # Model di memori mungkin sudah berubah sebagian
+            _cache.pop(path, None)
+            raise
+        _compact(path, model)
+
+
+def record_book(book_id, counts, max_keywords=None):
+    """
+    Tambah atau ganti statistik satu buku (counts None = buku dihapus).
+    Hanya satu baris journal yang ditulis; file model ditulis ulang setiap
+    LIBRARY_KEYWORD_JOURNAL_BATCH perubahan.
+    Returns: kata kunci buku jika max_keywords diberikan
+    """
+    path = model_path()
+    if counts is not None:
+        counts = dict(_cap_terms(counts))
+    with _locked(path):
+        model = _current_model(path)
+        model.update_books([(book_id, counts)])
+        _append_journal(path, [(book_id, counts)])
+        cached = _cache[path]
+        cached['offset'] = os.path.getsize(journal_path(path))
+        cached['pending'] += 1
+        if cached['pending'] >= _setting('LIBRARY_KEYWORD_JOURNAL_BATCH', 50):
+            _compact(path, model)
+        if max_keywords:
+            return model.keywords_for(book_id, max_keywords)
+    return None
+
+
+def forget_book(book_id):
+    """Buang statistik buku yang dihapus supaya document frequency tetap benar"""
+    path = model_path()
+    if _file_signature(path) is None and _file_signature(journal_path(path)) is None:
+        return
+    record_book(book_id, None)
+
+
+def extract_keywords(book_id, pages, max_keywords=5, source_name=""):
+    """
+    Perbarui statistik koleksi dengan teks buku lalu ambil kata kuncinya.
+    pages: iterable teks per halaman (misalnya text_store.iter_book_text)
+    Teks yang hampir kosong (PDF hasil scan) memakai analyze_text
+    yang membuat kata kunci dari nama file.
+    """
+    counter = count_terms(pages)
+    if counter.chars < 30 or not counter.counts:
+        from .utils import analyze_text
+        return analyze_text(counter.sample, max_keywords, source_name=source_name)
+
+    keywords = record_book(book_id, counter.counts, max_keywords)
+
+    logger.debug("Found %d corpus keywords for book %s: %s", len(keywords), book_id, keywords)
+    return keywords
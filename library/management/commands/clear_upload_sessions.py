@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Hapus sesi upload per potongan yang tidak selesai beserta file sementaranya"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=None,
+            help='Umur sesi tanpa potongan baru dalam detik (default LIBRARY_UPLOAD_SESSION_TTL)',
+        )
+
+    def handle(self, *args, **options):
+        from library.chunked_uploads import clear_expired_sessions
+
+        count = clear_expired_sessions(max_age=options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f"Selesai, {count} sesi upload dihapus."))
@@ -0,0 +1,71 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def _worker_process(once, poll_interval):
+    # Modul ini diimpor ulang di proses anak sebelum Django siap
+    import django
+    django.setup()
+
+    from library.jobs import run_worker
+    run_worker(once=once, poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Jalankan worker antrean pemrosesan PDF (konversi gambar, cover, kata kunci)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=getattr(settings, 'LIBRARY_WORKER_CONCURRENCY', 1),
+            help='Jumlah proses worker yang berjalan bersamaan',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Kerjakan job yang ada lalu berhenti ketika antrean kosong',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5,
+            help='Jeda (detik) sebelum memeriksa antrean lagi ketika kosong',
+        )
+
+    def handle(self, *args, **options):
+        from library.jobs import run_worker
+
+        concurrency = max(1, options['concurrency'])
+        once = options['once']
+        poll_interval = options['poll_interval']
+
+        self.stdout.write(f"Menjalankan {concurrency} worker pemrosesan buku...")
+
+        if concurrency == 1:
+            processed = run_worker(once=once, poll_interval=poll_interval)
+            self.stdout.write(self.style.SUCCESS(f"Selesai, {processed} job diproses."))
+            return
+
+        # Pakai 'spawn' agar tiap worker memulai Django dan koneksi database sendiri
+        ctx = multiprocessing.get_context('spawn')
+        workers = [
+            ctx.Process(target=_worker_process, args=(once, poll_interval), daemon=False)
+            for _ in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def _terminate(signum, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+        signal.signal(signal.SIGTERM, _terminate)
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            _terminate(None, None)
+
+        self.stdout.write(self.style.SUCCESS("Semua worker berhenti."))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang daftar buku serupa untuk semua buku"
+
+    def handle(self, *args, **options):
+        from library.similarity import rebuild_all
+
+        started = time.perf_counter()
+        total = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai, {total} pasangan buku serupa disimpan "
+            f"({time.perf_counter() - started:.2f} detik)."
+        ))
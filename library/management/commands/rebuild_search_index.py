@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from library.catalog_cache import bump_catalog_version
+from library.models import Book
+from library.search import clear_index, fts5_available, index_book
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang indeks pencarian full-text untuk semua buku"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-text', action='store_true',
+            help='Hanya indeks metadata, tanpa mengekstrak teks isi PDF',
+        )
+
+    def handle(self, *args, **options):
+        from library.search import body_text
+        from library.text_store import iter_book_text
+
+        backend = 'SQLite FTS5' if fts5_available() else 'inverted index (SearchPosting)'
+        self.stdout.write(f"Membangun ulang indeks pencarian ({backend})...")
+
+        clear_index()
+        total = 0
+        for book in Book.objects.order_by('pk').iterator():
+            text = ''
+            if not options['skip_text'] and book.file and book.file.name.endswith('.pdf'):
+                try:
+                    # Teks dibaca per halaman dari sidecar; buku lama diekstrak sekali lalu disimpan
+                    text = body_text(iter_book_text(book))
+                except Exception as e:
+                    self.stderr.write(f"Gagal mengekstrak teks buku {book.pk}: {str(e)}")
+
+            index_book(book, text=text)
+            total += 1
+
+        # Hasil pencarian di katalog yang di-cache bisa berubah
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Selesai, {total} buku diindeks."))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang counter statistik (home/profil) dari data buku dan user"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Tampilkan counter yang meleset tanpa memperbaikinya',
+        )
+
+    def handle(self, *args, **options):
+        from library.stats import reconcile
+
+        started = time.perf_counter()
+        changes = reconcile(dry_run=options['dry_run'])
+        for key, stored, actual in changes:
+            self.stdout.write(f"{key}: {stored} -> {actual if actual is not None else 'dihapus'}")
+
+        action = "ditemukan" if options['dry_run'] else "diperbaiki"
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai, {len(changes)} counter meleset {action} "
+            f"({time.perf_counter() - started:.2f} detik)."
+        ))
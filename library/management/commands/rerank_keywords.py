@@ -0,0 +1,86 @@
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from library.catalog_cache import bump_catalog_version
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang kata kunci semua buku dengan TF-IDF seluruh koleksi"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--refit', action='store_true',
+            help='Bangun ulang statistik kata dari teks semua buku, bukan dari model tersimpan',
+        )
+        parser.add_argument(
+            '--max-keywords', type=int, default=5,
+            help='Jumlah kata kunci per buku',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Tampilkan jumlah perubahan tanpa menyimpan ke database dan model kata',
+        )
+
+    def handle(self, *args, **options):
+        from library.keywords import count_terms, load_model, locked_model
+        from library.search import index_book
+        from library.text_store import iter_book_text
+
+        started = time.perf_counter()
+        book_ids = list(Book.objects.order_by('pk').values_list('pk', flat=True))
+
+        # Dry run hanya membaca model: tanpa kunci dan tidak disimpan
+        with nullcontext(load_model()) if options['dry_run'] else locked_model() as model:
+            if options['refit']:
+                self.stdout.write(f"Membangun statistik kata dari {len(book_ids)} buku...")
+
+                def documents():
+                    for book in Book.objects.order_by('pk').iterator():
+                        counts = {}
+                        if book.file and book.file.name.endswith('.pdf'):
+                            try:
+                                counts = count_terms(iter_book_text(book)).counts
+                            except Exception as e:
+                                self.stderr.write(f"Gagal membaca teks buku {book.pk}: {str(e)}")
+                        yield book.pk, counts
+
+                model.refit(documents())
+            else:
+                # Buku yang sudah dihapus tidak ikut dihitung
+                model.retain(book_ids)
+
+            ranked = model.rerank(options['max_keywords'])
+
+        ranked_at = time.perf_counter()
+        self.stdout.write(
+            f"{model.n_docs} buku, {len(model.terms)} kata diranking "
+            f"dalam {ranked_at - started:.2f} detik"
+        )
+
+        changed = []
+        for book in Book.objects.filter(pk__in=list(ranked)).iterator():
+            keywords = ', '.join(ranked[book.pk])
+            if keywords and keywords != book.keywords:
+                book.keywords = keywords
+                changed.append(book)
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(changed)} buku akan berubah kata kuncinya (dry run).")
+            return
+
+        # bulk_update tidak memicu signal, jadi indeks pencarian diperbarui di sini
+        with transaction.atomic():
+            Book.objects.bulk_update(changed, ['keywords'], batch_size=500)
+            for book in changed:
+                index_book(book)
+            if changed:
+                bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai, kata kunci {len(changed)} buku diperbarui "
+            f"({time.perf_counter() - started:.2f} detik)."
+        ))
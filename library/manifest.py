@@ -0,0 +1,129 @@
+"""
+URL gambar halaman dan manifest halaman untuk pembaca (book_preview).
+
+Manifest berisi URL (src dan srcset), ukuran piksel, dan URL deskriptor
+tile zoom (library.tiles) semua halaman buku, sehingga pembaca di
+browser bisa berpindah halaman dan mengambil gambar halaman sekitar
+lebih dulu tanpa request HTML baru. Manifest di-cache per versi; versi
+berubah setiap buku diproses ulang (folder gambar baru) atau pengaturan
+format/lebar gambar/tile berubah, dan dipakai juga sebagai ETag.
+"""
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from .rendering import image_options, page_image_name
+from .tiles import tile_options
+
+logger = logging.getLogger(__name__)
+
+# Atribut sizes untuk srcset gambar halaman (lebar tampilan di template preview)
+IMAGE_SIZES = "(max-width: 576px) 100vw, (max-width: 1200px) 80vw, 960px"
+
+
+def _candidate_names(page_num, width, options):
+    names = [page_image_name(page_num, width, options.fmt)]
+    if width is None and options.fmt != 'png':
+        # Buku lama dikonversi sebagai PNG ukuran penuh
+        names.append(page_image_name(page_num))
+    return names
+
+
+def prerendered_page_path(book, page_num, width=None, existing=None):
+    """
+    Path relatif gambar halaman yang dirender saat upload, None jika tidak ada.
+    existing: set nama file di folder gambar (menghindari stat per file)
+    """
+    for name in _candidate_names(page_num, width, image_options()):
+        image_path = f"{book.images_folder}/{name}"
+        if existing is not None:
+            if name in existing:
+                return image_path
+        elif os.path.exists(os.path.join(settings.MEDIA_ROOT, image_path)):
+            return image_path
+    return None
+
+
+def page_image_urls(book, page_num, existing=None):
+    """
+    URL gambar halaman untuk atribut src dan srcset: file statis jika
+    sudah dirender saat upload, selain itu endpoint yang merender halaman
+    saat pertama kali dibaca
+    """
+    full_path = prerendered_page_path(book, page_num, existing=existing)
+    endpoint = reverse('book_page_image', args=[book.pk, page_num])
+    src = f"{settings.MEDIA_URL}{full_path}" if full_path else endpoint
+
+    srcset = []
+    for width in image_options().widths:
+        if full_path:
+            variant_path = prerendered_page_path(book, page_num, width, existing=existing)
+            # Varian tidak dibuat untuk lebar >= gambar penuh
+            url = f"{settings.MEDIA_URL}{variant_path}" if variant_path else src
+        else:
+            url = f"{endpoint}?w={width}"
+        srcset.append(f"{url} {width}w")
+
+    return src, ", ".join(srcset)
+
+
+def manifest_version(book):
+    """Hash pendek semua hal yang menentukan isi manifest"""
+    options = image_options()
+    source = '|'.join(str(value) for value in (
+        book.pk, book.images_folder, book.pages, book.file.name if book.file else '',
+        options.fmt, options.widths, tuple(tile_options()), settings.MEDIA_URL,
+    ))
+    return hashlib.md5(source.encode()).hexdigest()[:16]
+
+
+def _page_sizes(book):
+    from .rendering import page_sizes
+
+    try:
+        return page_sizes(book.file.path)
+    except Exception as e:
+        logger.warning("Ukuran halaman buku %s tidak bisa dibaca: %s", book.pk, e)
+        return []
+
+
+def _build_manifest(book, version):
+    images_dir = os.path.join(settings.MEDIA_ROOT, book.images_folder)
+    try:
+        existing = set(os.listdir(images_dir))
+    except OSError:
+        existing = set()
+
+    sizes = _page_sizes(book) if book.file else []
+    page_count = book.pages or len(sizes) or 1
+    pages = []
+    for page_num in range(1, page_count + 1):
+        src, srcset = page_image_urls(book, page_num, existing)
+        width, height = sizes[page_num - 1] if page_num <= len(sizes) else (None, None)
+        pages.append({'number': page_num, 'src': src, 'srcset': srcset,
+                      'width': width, 'height': height,
+                      'tiles': reverse('book_page_dzi', args=[book.pk, page_num])})
+
+    return {
+        'book': book.pk,
+        'title': book.title,
+        'version': version,
+        'page_count': page_count,
+        'sizes': IMAGE_SIZES,
+        'pages': pages,
+    }
+
+
+def page_manifest(book, version=None):
+    """Manifest halaman buku (dict siap dijadikan JSON), dari cache jika ada"""
+    version = version or manifest_version(book)
+    key = f"library:page_manifest:{version}"
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest = _build_manifest(book, version)
+        cache.set(key, manifest, getattr(settings, 'LIBRARY_PAGE_MANIFEST_CACHE_TIMEOUT', 60 * 60 * 24))
+    return manifest
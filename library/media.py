@@ -0,0 +1,226 @@
+"""
+Melayani file media (MEDIA_ROOT) dan gambar halaman buku.
+
+Pengganti django.conf.urls.static.static() yang hanya cocok untuk
+development:
+
+- Akses diperiksa per folder teratas (LIBRARY_MEDIA_ACCESS): 'public',
+  'login', atau 'staff'. Folder lain, file tersembunyi, dan file
+  sementara (.tmp) dijawab 404. Pemeriksaan cukup dengan os.stat, file
+  tidak dibaca oleh Python.
+- ETag (ukuran + mtime) dan Last-Modified, sehingga browser bisa
+  memvalidasi ulang dengan If-None-Match/If-Modified-Since dan mendapat
+  304 tanpa isi file.
+- Cache-Control: file yang namanya berubah setiap isinya berubah
+  (LIBRARY_MEDIA_IMMUTABLE_PREFIXES, misalnya folder gambar halaman
+  `book_images/<id>_<acak>/`) di-cache setahun dengan `immutable`,
+  lainnya LIBRARY_MEDIA_MAX_AGE detik.
+- Range request (satu rentang byte, juga If-Range) untuk PDF besar dan
+  pembaca yang melompat halaman.
+- Dengan LIBRARY_MEDIA_SENDFILE = 'x-sendfile' (Apache mod_xsendfile)
+  atau 'x-accel-redirect' (nginx, lihat LIBRARY_MEDIA_ACCEL_LOCATIONS),
+  isi file dikirim oleh web server; Django hanya memeriksa akses dan
+  mengisi header.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+PUBLIC = 'public'
+LOGIN = 'login'
+STAFF = 'staff'
+
+DEFAULT_ACCESS = {
+    'books/': PUBLIC,
+    'book_images/': PUBLIC,
+    'covers/': PUBLIC,
+    'page_cache/': PUBLIC,
+    'profiles/': PUBLIC,
+}
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def access_policy(relative_path):
+    """Aturan akses untuk path relatif MEDIA_ROOT, None berarti tidak dilayani"""
+    rules = _setting('LIBRARY_MEDIA_ACCESS', DEFAULT_ACCESS)
+    matches = [prefix for prefix in rules if relative_path.startswith(prefix)]
+    return rules[max(matches, key=len)] if matches else None
+
+
+def _is_immutable(relative_path):
+    return any(relative_path.startswith(prefix)
+               for prefix in _setting('LIBRARY_MEDIA_IMMUTABLE_PREFIXES', ['book_images/']))
+
+
+def _denied(request, policy):
+    """Response penolakan, atau None jika request boleh mengakses"""
+    if policy == PUBLIC:
+        return None
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if policy == STAFF and not request.user.is_staff:
+        return HttpResponseForbidden("Tidak memiliki izin untuk file ini")
+    return None
+
+
+def serve(request, path):
+    """File di MEDIA_ROOT setelah pemeriksaan path dan akses"""
+    relative_path = path.replace('\\', '/').lstrip('/')
+    parts = relative_path.split('/')
+    if any(part.startswith('.') for part in parts) or not parts[-1] or parts[-1].endswith('.tmp'):
+        raise Http404("File tidak ditemukan")
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, relative_path)
+    except SuspiciousFileOperation:
+        raise Http404("File tidak ditemukan")
+    # Symlink tidak boleh mengarah ke luar MEDIA_ROOT
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    if not os.path.realpath(full_path).startswith(media_root + os.sep):
+        raise Http404("File tidak ditemukan")
+
+    policy = access_policy(relative_path)
+    if policy is None:
+        raise Http404("File tidak ditemukan")
+    denied = _denied(request, policy)
+    if denied is not None:
+        return denied
+
+    return file_response(request, full_path, immutable=_is_immutable(relative_path),
+                         private=policy != PUBLIC)
+
+
+class _RangeFile:
+    """Bagian file mulai dari posisi saat ini sepanjang length byte, untuk FileResponse"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _requested_range(request, size, etag, last_modified):
+    """
+    Returns: (start, end) inklusif, None untuk seluruh file,
+        atau False jika rentang tidak bisa dipenuhi
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header or request.method != 'GET':
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        # File sudah berubah sejak bagian sebelumnya diunduh
+        return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Beberapa rentang sekaligus atau format lain: kirim seluruh file
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or end < start:
+            return False
+    else:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            return False
+        start, end = max(0, size - suffix), size - 1
+    return start, end
+
+
+def _sendfile(full_path, content_type):
+    """Response yang isinya dikirim web server, None jika tidak dikonfigurasi"""
+    mode = _setting('LIBRARY_MEDIA_SENDFILE', None)
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+    if mode == 'x-accel-redirect':
+        locations = _setting('LIBRARY_MEDIA_ACCEL_LOCATIONS', {settings.MEDIA_ROOT: '/protected-media/'})
+        real_path = os.path.realpath(full_path)
+        for root, location in locations.items():
+            root = os.path.realpath(root)
+            if real_path.startswith(root + os.sep):
+                relative = os.path.relpath(real_path, root).replace(os.sep, '/')
+                response = HttpResponse(content_type=content_type)
+                response['X-Accel-Redirect'] = location.rstrip('/') + '/' + quote(relative)
+                return response
+    return None
+
+
+def file_response(request, full_path, immutable=False, private=False, max_age=None):
+    """
+    Response untuk file di disk dengan ETag/Last-Modified, Cache-Control,
+    Range, dan sendfile. Raises: Http404 jika bukan file biasa.
+    """
+    try:
+        st = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File tidak ditemukan")
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404("File tidak ditemukan")
+
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    last_modified = int(st.st_mtime)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _sendfile(full_path, content_type)
+    if response is None:
+        requested = _requested_range(request, st.st_size, etag, last_modified)
+        if requested is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{st.st_size}"
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+            response['Content-Length'] = st.st_size
+        elif requested:
+            start, end = requested
+            file = open(full_path, 'rb')
+            file.seek(start)
+            response = FileResponse(_RangeFile(file, end - start + 1), status=206,
+                                    content_type=content_type)
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f"bytes {start}-{end}/{st.st_size}"
+        else:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if immutable:
+        patch_cache_control(response, max_age=IMMUTABLE_MAX_AGE, immutable=True,
+                            **{'private' if private else 'public': True})
+    else:
+        if max_age is None:
+            max_age = _setting('LIBRARY_MEDIA_MAX_AGE', 60 * 60)
+        patch_cache_control(response, max_age=max_age, **{'private' if private else 'public': True})
+    return response
@@ -0,0 +1,359 @@
+"""
+Metrik pemrosesan PDF dan view dalam format teks Prometheus.
+
+Setiap proses (web dan worker `process_books`) mencatat counter dan
+histogram di memori lalu menuliskannya ke satu file JSON per proses di
+LIBRARY_METRICS_DIR (flush). Endpoint /library/metrics/ menjumlahkan
+semua file itu, jadi metrik worker ikut terlihat dari proses web.
+Dengan LIBRARY_METRICS_DIR = None metrik hanya dari proses yang melayani
+request.
+
+File proses yang sudah mati (PID tidak ada lagi di host yang sama)
+digabung ke aggregate.json lalu dihapus saat metrik dibaca, jadi jumlah
+file tidak terus bertambah setiap worker/web di-restart, dan counter
+proses itu tidak hilang.
+
+Durasi diukur dengan span:
+
+    with metrics.span('ingest'):
+        ...
+
+    @metrics.span('extract_text')
+    def extract_text_from_pdf(...):
+        ...
+
+Span mengisi histogram library_stage_duration_seconds{stage=...} dan
+menambah library_failures_total{stage=...} jika terjadi exception.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import ContextDecorator
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Batas bucket histogram durasi (detik)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# nama: (tipe, keterangan)
+METRICS = {
+    'library_stage_duration_seconds': ('histogram', 'Durasi tahap pemrosesan PDF'),
+    'library_view_duration_seconds': ('histogram', 'Durasi request per view'),
+    'library_pages_rendered_total': ('counter', 'Halaman PDF yang dirender ke gambar'),
+    'library_tiles_rendered_total': ('counter', 'Tile DeepZoom halaman yang dirender'),
+    'library_bytes_written_total': ('counter', 'Byte file hasil pemrosesan yang ditulis'),
+    'library_failures_total': ('counter', 'Tahap pemrosesan yang gagal'),
+    'library_jobs_total': ('counter', 'Job pemrosesan yang selesai diproses per status'),
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled():
+    return _setting('LIBRARY_METRICS_ENABLED', True)
+
+
+def _key(name, labels):
+    if name not in METRICS:
+        raise KeyError(f"Metrik tidak dikenal: {name}")
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Registry:
+    """Counter dan histogram milik satu proses"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        # key -> [jumlah per bucket (termasuk +Inf), sum, count]
+        self.histograms = {}
+        self.token = uuid.uuid4().hex[:8]
+        self.flushed_at = 0.0
+
+    def increment(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [[0] * (len(DURATION_BUCKETS) + 1), 0.0, 0]
+            entry[0][bisect_left(DURATION_BUCKETS, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value]
+                             for (name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), list(buckets), total, count]
+                               for (name, labels), (buckets, total, count) in self.histograms.items()],
+            }
+
+    def merge(self, snapshot):
+        """Tambahkan snapshot (dari file proses lain) ke registry ini"""
+        for name, labels, value in snapshot.get('counters', []):
+            if name in METRICS:
+                self.increment(name, value, **labels)
+        for name, labels, buckets, total, count in snapshot.get('histograms', []):
+            # Bucket berbeda (file dari versi lama) tidak bisa dijumlahkan
+            if name not in METRICS or len(buckets) != len(DURATION_BUCKETS) + 1:
+                continue
+            key = _key(name, labels)
+            with self._lock:
+                entry = self.histograms.setdefault(
+                    key, [[0] * (len(DURATION_BUCKETS) + 1), 0.0, 0]
+                )
+                entry[0] = [a + b for a, b in zip(entry[0], buckets)]
+                entry[1] += total
+                entry[2] += count
+
+
+registry = Registry()
+
+# Proses hasil fork (gunicorn --preload) mulai dari nol dengan file sendiri
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+def increment(name, value=1, **labels):
+    if enabled():
+        registry.increment(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if enabled():
+        registry.observe(name, value, **labels)
+
+
+class span(ContextDecorator):
+    """
+    Ukur durasi satu tahap. Bisa dipakai sebagai context manager
+    atau decorator. Exception tetap diteruskan.
+    Sebagai decorator satu instance dipakai bersama semua pemanggilan
+    (antar thread dan rekursif), jadi setiap pemanggilan memakai salinan
+    sendiri untuk menyimpan waktu mulai.
+    """
+
+    def __init__(self, stage, metric='library_stage_duration_seconds', **labels):
+        self.stage = stage
+        self.metric = metric
+        self.labels = labels
+
+    def _recreate_cm(self):
+        return span(self.stage, self.metric, **self.labels)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.started
+        if enabled():
+            registry.observe(self.metric, self.elapsed, stage=self.stage, **self.labels)
+            if exc_type is not None:
+                registry.increment('library_failures_total', stage=self.stage)
+        logger.debug("Tahap %s selesai dalam %.3fs%s", self.stage, self.elapsed,
+                     " (gagal)" if exc_type is not None else "")
+        return False
+
+
+def metrics_dir():
+    return _setting('LIBRARY_METRICS_DIR', None)
+
+
+# Gabungan metrik proses yang sudah mati
+AGGREGATE_FILE = 'aggregate.json'
+
+
+def _host():
+    return socket.gethostname().replace('_', '-')
+
+
+def _process_file(directory):
+    return os.path.join(directory, f"{_host()}_{os.getpid()}_{registry.token}.json")
+
+
+def _file_pid(name):
+    """PID pemilik file metrik jika proses itu berjalan di host ini, selain itu None"""
+    parts = name[:-len('.json')].rsplit('_', 2)
+    if len(parts) == 2:
+        # Nama lama tanpa host: <pid>_<token>.json
+        parts.insert(0, _host())
+    if len(parts) != 3 or parts[0] != _host() or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # PermissionError: proses ada tetapi milik user lain
+        return True
+    return True
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning("File metrik rusak dilewati: %s", path)
+        return None
+
+
+def _write_snapshot(path, snapshot):
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def prune(directory=None):
+    """
+    Gabungkan file metrik proses yang sudah mati ke AGGREGATE_FILE lalu
+    hapus file-file itu. Nama file yang sudah digabung dicatat di
+    aggregate, jadi file yang gagal dihapus tidak terhitung dua kali.
+    Returns: nama file yang sudah tergabung di aggregate
+    """
+    directory = directory or metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return set()
+
+    with open(os.path.join(directory, '.prune.lock'), 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+        aggregate = _read_snapshot(aggregate_path) or {}
+        merged = set(aggregate.get('merged', []))
+        dead = []
+        for entry in os.scandir(directory):
+            pid = _file_pid(entry.name) if entry.name.endswith('.json') else None
+            if pid is not None and pid != os.getpid() and not _pid_alive(pid):
+                dead.append(entry)
+
+        fresh = [entry for entry in dead if entry.name not in merged]
+        if fresh:
+            combined = Registry()
+            combined.merge(aggregate)
+            for entry in fresh:
+                combined.merge(_read_snapshot(entry.path) or {})
+            snapshot = combined.snapshot()
+            snapshot['merged'] = sorted(entry.name for entry in dead)
+            _write_snapshot(aggregate_path, snapshot)
+            merged = set(snapshot['merged'])
+            logger.info("Merged metrics of %d dead processes into %s", len(fresh), AGGREGATE_FILE)
+
+        for entry in dead:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+    return merged
+
+
+def flush(force=False):
+    """
+    Tulis metrik proses ini ke LIBRARY_METRICS_DIR.
+    Tanpa force, paling sering sekali per LIBRARY_METRICS_FLUSH_INTERVAL detik.
+    """
+    directory = metrics_dir()
+    if not directory or not enabled():
+        return
+    now = time.monotonic()
+    if not force and now - registry.flushed_at < _setting('LIBRARY_METRICS_FLUSH_INTERVAL', 10):
+        return
+    registry.flushed_at = now
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _write_snapshot(_process_file(directory), registry.snapshot())
+    except OSError:
+        logger.warning("Gagal menulis metrik ke %s", directory, exc_info=True)
+
+
+def collect():
+    """Gabungan metrik semua proses (file di LIBRARY_METRICS_DIR) dan proses ini"""
+    directory = metrics_dir()
+    if not directory:
+        return registry
+
+    flush(force=True)
+    try:
+        merged = prune(directory)
+    except OSError:
+        logger.warning("Gagal menggabung file metrik lama di %s", directory, exc_info=True)
+        merged = set()
+
+    combined = Registry()
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.json') and entry.name not in merged:
+                combined.merge(_read_snapshot(entry.path) or {})
+    return combined
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound is None else repr(float(bound))
+
+
+def render(source=None):
+    """Metrik dalam format teks Prometheus (text/plain; version=0.0.4)"""
+    source = source or collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(source.counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (metric, labels), (buckets, total, count) in sorted(source.histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(list(DURATION_BUCKETS) + [None], buckets):
+                    cumulative += bucket_count
+                    le = (('le', _format_bound(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
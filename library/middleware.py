@@ -0,0 +1,174 @@
+import logging
+import os
+import random
+import time
+import uuid
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ViewMetricsMiddleware:
+    """
+    Catat durasi setiap request ke histogram library_view_duration_seconds
+    dengan label nama view (URL name), method, dan kelas status (2xx, 4xx, ...).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        metrics.observe(
+            'library_view_duration_seconds', elapsed,
+            view=view, method=request.method, status=f"{response.status_code // 100}xx",
+        )
+        metrics.flush()
+        return response
+
+
+class _QueryRecorder:
+    """execute_wrapper yang mencatat durasi setiap query SQL"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            self.queries.append((elapsed, sql))
+
+    def slowest(self, limit):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:limit]
+
+
+def _timing_desc(text, limit=80):
+    """Teks aman untuk quoted-string header Server-Timing"""
+    text = ' '.join(str(text).split())
+    if len(text) > limit:
+        text = text[:limit - 3] + '...'
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class RequestProfilerMiddleware:
+    """
+    Instrumentasi per request (opt-in, LIBRARY_PROFILER_ENABLED = True):
+    - jumlah query, total waktu SQL, dan query paling lambat dikirim lewat
+      header Server-Timing (terlihat di tab Network/Timing browser).
+      Teks SQL hanya untuk staff atau saat DEBUG.
+    - cProfile request yang dipilih secara acak
+      (LIBRARY_PROFILER_SAMPLE_RATE) atau diminta staff dengan header
+      X-Profile: 1, disimpan sebagai file .prof di LIBRARY_PROFILER_DIR.
+      Buka dengan `python -m pstats file.prof` atau snakeviz.
+    Letakkan sesudah AuthenticationMiddleware.
+    """
+
+    PROFILE_HEADER = 'X-Profile'
+
+    def __init__(self, get_response):
+        from django.conf import settings
+        from django.core.exceptions import MiddlewareNotUsed
+
+        if not getattr(settings, 'LIBRARY_PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.debug = settings.DEBUG
+        self.slow_queries = getattr(settings, 'LIBRARY_PROFILER_SLOW_QUERIES', 3)
+        self.sample_rate = getattr(settings, 'LIBRARY_PROFILER_SAMPLE_RATE', 0.0)
+        self.profile_dir = getattr(settings, 'LIBRARY_PROFILER_DIR', None)
+        self.max_files = getattr(settings, 'LIBRARY_PROFILER_MAX_FILES', 200)
+
+    def __call__(self, request):
+        from contextlib import ExitStack
+
+        from django.db import connections
+
+        recorder = _QueryRecorder()
+        profiler = self._start_profiler(request)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        if profiler:
+            self._save_profile(profiler, request)
+
+        show_sql = self.debug or getattr(getattr(request, 'user', None), 'is_staff', False)
+        timings = [
+            f'app;dur={elapsed * 1000:.1f}',
+            f'db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries"',
+        ]
+        for index, (seconds, sql) in enumerate(recorder.slowest(self.slow_queries), start=1):
+            entry = f'sql{index};dur={seconds * 1000:.1f}'
+            if show_sql:
+                entry += f';desc="{_timing_desc(sql)}"'
+            timings.append(entry)
+        response['Server-Timing'] = ', '.join(timings)
+
+        logger.debug("%s %s: %.1f ms, %d queries (%.1f ms SQL)", request.method, request.path,
+                     elapsed * 1000, recorder.count, recorder.seconds * 1000)
+        return response
+
+    def _profile_requested(self, request):
+        if request.headers.get(self.PROFILE_HEADER) == '1':
+            # Header hanya dituruti untuk staff agar tidak bisa dipakai membebani server
+            return getattr(getattr(request, 'user', None), 'is_staff', False)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start_profiler(self, request):
+        if not self.profile_dir or not self._profile_requested(request):
+            return None
+
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Profiler lain sedang aktif (request lain di thread yang sama-sama diprofile)
+            return None
+        return profiler
+
+    def _save_profile(self, profiler, request):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{view.replace(':', '-')}_{uuid.uuid4().hex[:8]}.prof"
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, name)
+            profiler.dump_stats(path)
+            logger.info("Profile %s %s saved to %s", request.method, request.path, path)
+            self._prune()
+        except OSError:
+            logger.warning("Gagal menyimpan profile ke %s", self.profile_dir, exc_info=True)
+
+    def _prune(self):
+        """Hapus file profile terlama jika lebih dari LIBRARY_PROFILER_MAX_FILES"""
+        entries = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(self.profile_dir) if entry.name.endswith('.prof')
+        )
+        for _, path in entries[:max(0, len(entries) - self.max_files)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
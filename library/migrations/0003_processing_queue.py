@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_book_genre_book_images_folder_book_keywords_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Menunggu Antrean'), ('processing', 'Sedang Diproses'), ('ready', 'Siap'), ('failed', 'Gagal Diproses')], default='ready', max_length=20, verbose_name='Status Pemrosesan'),
+        ),
+        migrations.CreateModel(
+            name='ProcessingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Menunggu'), ('running', 'Berjalan'), ('done', 'Selesai'), ('failed', 'Gagal')], default='pending', max_length=20)),
+                ('stage', models.CharField(blank=True, help_text='Tahap yang sedang/terakhir dikerjakan', max_length=20)),
+                ('stage_status', models.JSONField(blank=True, default=dict, help_text='Status per tahap pemrosesan')),
+                ('options', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processing_jobs', to='library.book')),
+            ],
+            options={
+                'ordering': ['run_after', 'id'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='library_pro_status_89eca9_idx')],
+            },
+        ),
+    ]
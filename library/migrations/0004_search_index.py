@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:59
+
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    """
+    Buat virtual table FTS5 jika database SQLite mendukungnya.
+    Tanpa FTS5 pencarian memakai tabel SearchPosting
+    (isi dengan `python manage.py rebuild_search_index`).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS library_book_fts USING fts5("
+            "title, author, keywords, description, year, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    except OperationalError:
+        return
+
+    # Metadata buku yang sudah ada; teks isi diisi oleh rebuild_search_index
+    schema_editor.execute(
+        "INSERT INTO library_book_fts (rowid, title, author, keywords, description, year, body) "
+        "SELECT id, title, COALESCE(author, ''), COALESCE(keywords, ''), "
+        "COALESCE(description, ''), COALESCE(CAST(year AS TEXT), ''), '' FROM library_book"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS library_book_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_processing_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('field', models.CharField(max_length=20)),
+                ('weight', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='library.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'book'], name='library_sea_term_037d04_idx'), models.Index(fields=['book', 'field'], name='library_sea_book_id_5f432e_idx')],
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='text_file',
+            field=models.CharField(blank=True, help_text='File sidecar berisi teks per halaman hasil ekstraksi PDF', max_length=200, null=True),
+        ),
+    ]
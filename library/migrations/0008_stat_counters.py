@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:32
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    # Nilai awal counter dari data yang sudah ada, selanjutnya dijaga signal.
+    # Sengaja tidak memakai library.stats: migrasi harus tetap berjalan
+    # dengan model historis walau modul itu berubah.
+    Book = apps.get_model('library', 'Book')
+    StatCounter = apps.get_model('library', 'StatCounter')
+    User = apps.get_model('auth', 'User')
+
+    processed = Q(images_folder__isnull=False)
+    counters = {
+        'books': Book.objects.count(),
+        'users': User.objects.count(),
+        'processed_books': Book.objects.filter(processed).count(),
+    }
+    for row in Book.objects.order_by().values('genre').annotate(total=Count('pk')):
+        counters[f"genre:{row['genre']}"] = row['total']
+    per_user = Book.objects.order_by().values('uploader_id').annotate(
+        books=Count('pk'), processed_books=Count('pk', filter=processed),
+    )
+    for row in per_user:
+        counters[f"user:{row['uploader_id']}:books"] = row['books']
+        if row['processed_books']:
+            counters[f"user:{row['uploader_id']}:processed_books"] = row['processed_books']
+
+    StatCounter.objects.bulk_create(
+        [StatCounter(key=key, value=value) for key, value in counters.items()], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_book_catalog_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
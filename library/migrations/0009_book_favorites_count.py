@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:34
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    # Book.favorites_count dan counter favorit per user dari favorit yang sudah ada
+    # (model historis, bukan library.stats yang bisa berubah)
+    Book = apps.get_model('library', 'Book')
+    Favorite = apps.get_model('library', 'Favorite')
+    StatCounter = apps.get_model('library', 'StatCounter')
+
+    for row in Favorite.objects.order_by().values('book_id').annotate(total=Count('pk')):
+        Book.objects.filter(pk=row['book_id']).update(favorites_count=row['total'])
+
+    StatCounter.objects.bulk_create(
+        [StatCounter(key=f"user:{row['user_id']}:favorites", value=row['total'])
+         for row in Favorite.objects.order_by().values('user_id').annotate(total=Count('pk'))],
+        update_conflicts=True, unique_fields=['key'], update_fields=['value'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_stat_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='favorites_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Dijaga oleh library.favorites', verbose_name='Jumlah Favorit'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_book_favorites_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('file', models.FileField(blank=True, upload_to='books/')),
+                ('images_folder', models.CharField(blank=True, max_length=200, null=True)),
+                ('pages', models.IntegerField(blank=True, null=True)),
+                ('cover', models.CharField(blank=True, max_length=200, null=True)),
+                ('text_file', models.CharField(blank=True, max_length=200, null=True)),
+                ('keywords', models.TextField(blank=True, null=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='content',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='books', to='library.contentblob'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Menerima Potongan'), ('assembling', 'Menyusun File'), ('complete', 'Selesai'), ('failed', 'Gagal')], default='open', max_length=20),
+        ),
+    ]
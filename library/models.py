@@ -1,8 +1,39 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+import math
 import os
 import shutil
+import uuid
 from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+
+class ContentBlob(models.Model):
+    """
+    Satu isi file PDF unik (SHA-256) beserta hasil turunannya: gambar
+    halaman, cover, teks, dan kata kunci. Buku yang diupload dengan isi
+    sama memakai blob yang sama (lihat library.content); file dihapus saat
+    refcount (jumlah Book yang memakainya) kembali nol.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    file = models.FileField(upload_to='books/', blank=True)
+    images_folder = models.CharField(max_length=200, blank=True, null=True)
+    pages = models.IntegerField(null=True, blank=True)
+    cover = models.CharField(max_length=200, blank=True, null=True)
+    text_file = models.CharField(max_length=200, blank=True, null=True)
+    keywords = models.TextField(blank=True, null=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:16]} ({self.refcount} buku)"
+
+    @property
+    def is_ready(self):
+        return bool(self.images_folder and self.pages)
 
 
 class Book(models.Model):
@@ -12,6 +43,17 @@ class Book(models.Model):
         ('motivasi', 'Motivasi'),
     ]
 
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    PROCESSING_STATUS_CHOICES = [
+        (STATUS_PENDING, 'Menunggu Antrean'),
+        (STATUS_PROCESSING, 'Sedang Diproses'),
+        (STATUS_READY, 'Siap'),
+        (STATUS_FAILED, 'Gagal Diproses'),
+    ]
+
     title = models.CharField(max_length=200)
     author = models.CharField(max_length=100, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
@@ -24,14 +66,58 @@ class Book(models.Model):
     file = models.FileField(upload_to='books/', null=True)
     images_folder = models.CharField(max_length=200, blank=True, null=True,
                                      help_text="Folder berisi gambar hasil konversi PDF")
+    text_file = models.CharField(max_length=200, blank=True, null=True,
+                                 help_text="File sidecar berisi teks per halaman hasil ekstraksi PDF")
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES,
+                                         default=STATUS_READY, verbose_name="Status Pemrosesan")
+    favorites_count = models.IntegerField(default=0, editable=False, verbose_name="Jumlah Favorit",
+                                          help_text="Dijaga oleh library.favorites")
+    # DO_NOTHING: blob dihapus dengan satu DELETE bersyarat saat refcount nol (library.content)
+    content = models.ForeignKey(ContentBlob, null=True, blank=True, editable=False,
+                                on_delete=models.DO_NOTHING, related_name='books')
 
     uploader = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Urutan katalog (terbaru dulu) dan keyset pagination, lihat library/pagination.py
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['genre', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def is_processing(self):
+        return self.processing_status in (self.STATUS_PENDING, self.STATUS_PROCESSING)
+
+    def save(self, *args, **kwargs):
+        # Counter statistik diubah signal pre_save/post_save (library.stats),
+        # harus ikut commit atau rollback bersama baris buku
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def delete(self, *args, **kwargs):
+        if self.content_id:
+            # PDF dan hasil turunannya milik ContentBlob, dilepas oleh signal
+            # post_delete; hanya cover yang diupload sendiri yang dihapus
+            if self.cover and self.cover.name != self.content.cover:
+                try:
+                    if os.path.isfile(self.cover.path):
+                        os.remove(self.cover.path)
+                except Exception as e:
+                    pass
+            # Begitu juga sidecar teks per buku yang bukan milik blob
+            if self.text_file and self.text_file != self.content.text_file:
+                try:
+                    from .text_store import delete_text
+                    delete_text(self.text_file)
+                except Exception as e:
+                    pass
+            return super().delete(*args, **kwargs)
+
         # Hapus file PDF
         if self.file:
             try:
@@ -61,6 +147,21 @@ class Book(models.Model):
             except Exception as e:
                 pass
 
+            # Hapus halaman yang dirender saat dibaca
+            try:
+                from .page_cache import get_page_cache
+                get_page_cache().clear_book(self)
+            except Exception as e:
+                pass
+
+        # Hapus teks hasil ekstraksi
+        if self.text_file:
+            try:
+                from .text_store import delete_text
+                delete_text(self.text_file)
+            except Exception as e:
+                pass
+
         # Panggil method delete parent
         super().delete(*args, **kwargs)
 
@@ -74,4 +175,256 @@ class Favorite(models.Model):
         unique_together = ('user', 'book')
 
     def __str__(self):
-        return f"{self.user.username} - {self.book.title}"
\ No newline at end of file
+        return f"{self.user.username} - {self.book.title}"
+
+
+class ProcessingJob(models.Model):
+    """
+    Antrean pemrosesan PDF yang disimpan di database.
+    Dikerjakan oleh `python manage.py process_books`.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Menunggu'),
+        (STATUS_RUNNING, 'Berjalan'),
+        (STATUS_DONE, 'Selesai'),
+        (STATUS_FAILED, 'Gagal'),
+    ]
+
+    # Urutan tahap pemrosesan satu buku. Tahap ingest membuka PDF sekali
+    # untuk gambar halaman, jumlah halaman, cover, dan teks.
+    STAGE_INGEST = 'ingest'
+    STAGE_KEYWORDS = 'keywords'
+    STAGE_RELATED = 'related'
+    STAGES = [STAGE_INGEST, STAGE_KEYWORDS, STAGE_RELATED]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='processing_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    stage = models.CharField(max_length=20, blank=True, help_text="Tahap yang sedang/terakhir dikerjakan")
+    stage_status = models.JSONField(default=dict, blank=True, help_text="Status per tahap pemrosesan")
+    options = models.JSONField(default=dict, blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.pk} - {self.book.title} ({self.status})"
+
+
+class SearchPosting(models.Model):
+    """
+    Inverted index pencarian untuk database tanpa SQLite FTS5
+    (lihat library.search). Satu baris per kata per kolom per buku.
+    """
+    term = models.CharField(max_length=64)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='search_postings')
+    field = models.CharField(max_length=20)
+    weight = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'book']),
+            models.Index(fields=['book', 'field']),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.book_id} ({self.field})"
+
+
+class RelatedBook(models.Model):
+    """
+    Daftar buku serupa yang sudah dihitung sebelumnya (lihat library.similarity).
+    Halaman detail cukup membaca baris milik satu buku, tanpa menghitung
+    kemiripan saat request.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(help_text="Cosine similarity vektor teks dan kata kunci")
+
+    class Meta:
+        ordering = ['book', '-score']
+        unique_together = ('book', 'related')
+        indexes = [
+            models.Index(fields=['book', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class StatCounter(models.Model):
+    """
+    Statistik perpustakaan yang dijaga tetap terkini oleh signal (library.stats),
+    supaya halaman home dan profil tidak menghitung ulang dengan COUNT(*).
+    Contoh key: 'books', 'users', 'genre:fiksi', 'user:7:processed_books'.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class UploadSession(models.Model):
+    """
+    Upload PDF per potongan yang bisa dilanjutkan (library.chunked_uploads).
+    Potongan ditulis langsung ke posisinya di file sementara, buku dibuat
+    setelah potongan terakhir diterima.
+    """
+    STATUS_OPEN = 'open'
+    STATUS_ASSEMBLING = 'assembling'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Menerima Potongan'),
+        (STATUS_ASSEMBLING, 'Menyusun File'),
+        (STATUS_COMPLETE, 'Selesai'),
+        (STATUS_FAILED, 'Gagal'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    metadata = models.JSONField(default=dict, blank=True, help_text="Data buku dari form upload")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    sha256 = models.CharField(max_length=64, blank=True)
+    book = models.ForeignKey(Book, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+    @property
+    def chunk_count(self):
+        return max(1, math.ceil(self.size / self.chunk_size))
+
+    def chunk_length(self, index):
+        """Panjang byte potongan ke-index (potongan terakhir bisa lebih pendek)"""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+class UploadChunk(models.Model):
+    """Potongan UploadSession yang sudah diterima utuh"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('session', 'index')
+
+    def __str__(self):
+        return f"{self.session_id} #{self.index}"
+
+
+# Signal untuk menjaga indeks pencarian tetap sinkron dengan data buku
+@receiver(post_save, sender=Book)
+def index_book_for_search(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .search import index_book
+    index_book(instance)
+
+@receiver(post_delete, sender=Book)
+def remove_book_from_search(sender, instance, **kwargs):
+    from .search import remove_book
+    remove_book(instance.pk)
+
+
+# Statistik kata (library.keywords) tidak lagi menghitung buku yang dihapus
+@receiver(post_delete, sender=Book)
+def remove_book_from_keyword_model(sender, instance, **kwargs):
+    book_id = instance.pk
+
+    def forget():
+        from .keywords import forget_book
+        forget_book(book_id)
+
+    transaction.on_commit(forget)
+
+
+# Halaman katalog yang di-cache (library.catalog_cache) tidak berlaku lagi
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_catalog_cache(sender, instance, raw=False, **kwargs):
+    from .catalog_cache import bump_catalog_version
+    bump_catalog_version()
+
+
+# Counter statistik (library.stats) mengikuti perubahan buku dan user
+@receiver(pre_save, sender=Book)
+def remember_book_stats_state(sender, instance, **kwargs):
+    from .stats import stored_book_state
+    instance._stats_state = stored_book_state(instance)
+
+@receiver(post_save, sender=Book)
+def update_book_stats(sender, instance, update_fields=None, **kwargs):
+    from .stats import book_state, record_book_change
+    old_state = getattr(instance, '_stats_state', None)
+    record_book_change(old_state, book_state(instance, old_state, update_fields))
+    instance._stats_state = None
+
+@receiver(post_delete, sender=Book)
+def remove_book_stats(sender, instance, **kwargs):
+    from .stats import book_state, record_book_change
+    record_book_change(book_state(instance), None)
+
+@receiver(post_save, sender=User)
+def count_new_user(sender, instance, created, **kwargs):
+    if created:
+        from .stats import record_user_change
+        # User.save() tidak atomik dengan signal-nya, hitung setelah commit
+        transaction.on_commit(lambda: record_user_change(1))
+
+@receiver(post_delete, sender=User)
+def remove_user_stats(sender, instance, **kwargs):
+    from .stats import record_user_change
+    record_user_change(-1, user_id=instance.pk)
+
+
+# Isi PDF bersama (library.content) dilepas juga saat buku ikut terhapus (cascade user)
+@receiver(post_delete, sender=Book)
+def release_book_content(sender, instance, **kwargs):
+    if instance.content_id:
+        from .content import release
+        release(instance.content_id)
+
+
+# Counter favorit (library.favorites) untuk favorit yang ikut terhapus
+@receiver(pre_delete, sender=Book)
+def forget_book_favorites(sender, instance, **kwargs):
+    from .favorites import forget_book_favorites
+    forget_book_favorites(instance.pk)
+
+@receiver(pre_delete, sender=User)
+def forget_user_favorites(sender, instance, **kwargs):
+    from .favorites import forget_user_favorites
+    forget_user_favorites(instance.pk)
@@ -0,0 +1,242 @@
+"""
+Cache disk untuk gambar halaman yang dirender saat pertama kali dibaca.
+Ukuran cache dibatasi; file yang paling lama tidak diakses dihapus lebih dulu (LRU).
+Tile DeepZoom halaman yang diperbesar (library.tiles) disimpan di cache yang sama.
+"""
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+
+from . import metrics
+
+from .rendering import (
+    image_options, page_image_name, pixmap_to_image, render_page, render_region, resize_to_width,
+    save_image,
+)
+from .tiles import level_size, page_pyramid_size, tile_box, tile_extension, tile_options
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class PageCache:
+    """
+    Gambar disimpan di <root>/<nama folder gambar buku>/page_XXX[_wNNN].<ext>,
+    tile di <root>/<nama folder gambar buku>/page_XXX_files/<level>/<kolom>_<baris>.<ext>.
+    Nama folder gambar buku unik per konversi, jadi cache lama otomatis
+    tidak terpakai lagi ketika buku diproses ulang.
+    Waktu akses dicatat lewat mtime file (os.utime) karena atime sering
+    dimatikan (noatime) di server.
+    """
+
+    # Setelah eviction ukuran cache diturunkan sampai rasio ini dari batas
+    LOW_WATERMARK = 0.9
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or _setting(
+            'LIBRARY_PAGE_CACHE_ROOT', os.path.join(settings.MEDIA_ROOT, 'page_cache')
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else _setting(
+            'LIBRARY_PAGE_CACHE_MAX_BYTES', 1024 * 1024 * 1024
+        )
+        self._lock = threading.Lock()
+        # Perkiraan ukuran cache; dihitung ulang penuh hanya saat melewati batas
+        self._approx_bytes = None
+
+    def book_dir(self, book):
+        return os.path.join(self.root, os.path.basename(book.images_folder.rstrip('/')))
+
+    def path_for(self, book, page_num, width=None, options=None):
+        options = options or image_options()
+        return os.path.join(self.book_dir(book), page_image_name(page_num, width, options.fmt))
+
+    def tile_path(self, book, page_num, level, col, row, options):
+        return os.path.join(self.book_dir(book), f"page_{page_num:03d}_files", str(level),
+                            f"{col}_{row}.{tile_extension(options)}")
+
+    def get(self, book, page_num, width=None, options=None):
+        """Path gambar di cache atau None, sekaligus menandai baru diakses"""
+        return self._touch(self.path_for(book, page_num, width, options))
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_or_render(self, book, page_num, width=None):
+        """
+        Ambil gambar halaman dari cache, render dari PDF jika belum ada.
+        width: lebar varian (salah satu LIBRARY_PAGE_WIDTHS), None = ukuran penuh
+        """
+        options = image_options()
+        path = self.get(book, page_num, width, options)
+        if path:
+            return path
+        return self._render(book, page_num, width, options)
+
+    @metrics.span('page_cache_render')
+    def _render(self, book, page_num, width, options):
+        """Render satu halaman dari PDF ke cache, returns: path gambar"""
+        from .utils import open_pdf
+
+        pdf_document = open_pdf(book.file)
+        try:
+            pix = render_page(pdf_document.load_page(page_num - 1))
+        finally:
+            pdf_document.close()
+
+        image = pixmap_to_image(pix)
+        if width and width < image.width:
+            image = resize_to_width(image, width)
+
+        path = self.path_for(book, page_num, width, options)
+        self._store(image, path, options)
+        metrics.increment('library_pages_rendered_total', source='on_demand')
+        logger.debug("Rendered page %d (width %s) of book %s into cache", page_num, width, book.pk)
+        return path
+
+    def get_or_render_tile(self, book, page_num, level, col, row, options=None):
+        """
+        Ambil tile DeepZoom dari cache, render bagian halaman itu saja dari
+        PDF jika belum ada.
+        Returns: path tile, None jika tile di luar piramida halaman
+        """
+        options = options or tile_options()
+        path = self._touch(self.tile_path(book, page_num, level, col, row, options))
+        if path:
+            return path
+
+        width, height = page_pyramid_size(book, page_num, options)
+        box = tile_box(width, height, level, col, row, options)
+        if box is None:
+            return None
+        return self._render_tile(book, page_num, level, col, row, level_size(width, height, level),
+                                 box, options)
+
+    @metrics.span('page_cache_render_tile')
+    def _render_tile(self, book, page_num, level, col, row, level_dimensions, box, options):
+        """Render satu tile dari PDF ke cache, returns: path tile"""
+        from .utils import open_pdf
+
+        level_width, level_height = level_dimensions
+        pdf_document = open_pdf(book.file)
+        try:
+            image = render_region(pdf_document.load_page(page_num - 1), level_width, level_height, box)
+        finally:
+            pdf_document.close()
+
+        path = self.tile_path(book, page_num, level, col, row, options)
+        self._store(image, path, options)
+        metrics.increment('library_tiles_rendered_total')
+        logger.debug("Rendered tile %d/%d_%d of page %d of book %s into cache",
+                     level, col, row, page_num, book.pk)
+        return path
+
+    def _store(self, image, path, options):
+        """Simpan Image Pillow ke cache"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Tulis ke file sementara lalu rename supaya request lain
+        # tidak pernah membaca file yang setengah jadi
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        save_image(image, tmp_path, options.fmt, options.quality)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        metrics.increment('library_bytes_written_total', size, kind='page_cache')
+
+        self._added(size, keep=path)
+
+    def clear_book(self, book):
+        """Hapus semua halaman cache milik satu buku"""
+        import shutil
+
+        if not book.images_folder:
+            return
+        book_dir = self.book_dir(book)
+        if os.path.isdir(book_dir):
+            shutil.rmtree(book_dir, ignore_errors=True)
+        self._approx_bytes = None
+
+    def _added(self, size, keep=None):
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()
+            else:
+                self._approx_bytes += size
+
+            if self._approx_bytes > self.max_bytes:
+                self._approx_bytes = self.evict(keep=keep)
+
+    def _entries(self):
+        """Semua file cache termasuk tile: list (mtime, size, path)"""
+        entries = []
+        for directory, _, names in os.walk(self.root):
+            if directory == self.root:
+                continue
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep=None):
+        """
+        Hapus file yang paling lama tidak diakses sampai ukuran cache
+        di bawah LOW_WATERMARK * max_bytes.
+        keep: file yang baru dirender dan akan segera dikirim, tidak ikut dihapus
+        Returns: ukuran cache setelah eviction
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return total
+
+        target = self.max_bytes * self.LOW_WATERMARK
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+        # Bersihkan folder buku dan folder tile yang sudah kosong
+        for directory, _, _ in os.walk(self.root, topdown=False):
+            if directory != self.root:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+
+        logger.info("Page cache evicted down to %d bytes", total)
+        return total
+
+
+_page_cache = None
+
+
+def get_page_cache():
+    """Instance PageCache bersama untuk proses ini"""
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PageCache()
+    return _page_cache
@@ -0,0 +1,126 @@
+"""
+Keyset (cursor) pagination untuk katalog buku.
+
+Paginator Django memakai OFFSET dan COUNT(*): halaman ke-10.000 harus
+melewati semua baris sebelumnya. Di sini halaman berikutnya dicari
+langsung dari posisi buku terakhir, (created_at, id) < (t, i), memakai
+index (created_at, id) atau (genre, created_at, id), jadi biaya halaman
+mana pun sama dengan halaman pertama. Jumlah total dan nomor halaman
+terakhir sengaja tidak dihitung.
+
+Posisi dikirim ke client sebagai token cursor yang ditandatangani
+(django.core.signing), sehingga tidak bisa diubah dan formatnya bebas
+diganti di kemudian hari.
+"""
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SALT = 'library.pagination.cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+# Urutan katalog: terbaru lebih dulu, id sebagai penentu untuk waktu yang sama
+ORDERING = ('-created_at', '-pk')
+
+
+def encode_cursor(book, direction):
+    if book.created_at is None:
+        # created_at selalu diisi auto_now_add; baris tanpa waktu tidak punya posisi
+        return None
+    position = [book.created_at.isoformat(), book.pk, direction]
+    return signing.Signer(salt=CURSOR_SALT).sign_object(position, compress=True)
+
+
+def decode_cursor(token):
+    """Returns: (created_at, pk, direction) atau None jika token tidak valid"""
+    if not token:
+        return None
+    try:
+        created_at, pk, direction = signing.Signer(salt=CURSOR_SALT).unsign_object(token)
+        created_at = parse_datetime(created_at)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if created_at is None or not isinstance(pk, int) or direction not in (NEXT, PREVIOUS):
+        return None
+    return created_at, pk, direction
+
+
+class KeysetPage:
+    """
+    Satu halaman hasil keyset pagination.
+    Antarmukanya mengikuti Page Django sejauh yang dipakai template
+    (has_next, has_previous, has_other_pages, iterasi), ditambah token
+    next_cursor/previous_cursor untuk link navigasi.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = list(object_list)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not (self._has_next and self.object_list):
+            return None
+        return encode_cursor(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not (self._has_previous and self.object_list):
+            return None
+        return encode_cursor(self.object_list[0], PREVIOUS)
+
+
+def _first_page(queryset, per_page):
+    rows = list(queryset.order_by(*ORDERING)[:per_page + 1])
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=False)
+
+
+def keyset_page(queryset, cursor, per_page):
+    """
+    Halaman buku setelah/sebelum posisi cursor, urut ORDERING.
+    Satu baris ekstra diambil untuk mengetahui apakah masih ada halaman lanjutan.
+    Cursor yang tidak valid dianggap halaman pertama.
+    """
+    position = decode_cursor(cursor) if isinstance(cursor, str) else cursor
+    if position is None:
+        return _first_page(queryset, per_page)
+
+    created_at, pk, direction = position
+    if direction == NEXT:
+        # (created_at, id) < (t, i), ditulis agar index bisa dipakai sebagai rentang created_at <= t
+        rows = list(
+            queryset.filter(Q(created_at__lte=created_at) & ~Q(created_at=created_at, pk__gte=pk))
+            .order_by(*ORDERING)[:per_page + 1]
+        )
+        return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=True)
+
+    rows = list(
+        queryset.filter(Q(created_at__gte=created_at) & ~Q(created_at=created_at, pk__lte=pk))
+        .order_by('created_at', 'pk')[:per_page + 1]
+    )
+    if not rows:
+        # Buku di halaman sebelumnya sudah dihapus semua
+        return _first_page(queryset, per_page)
+    return KeysetPage(reversed(rows[:per_page]), has_next=True, has_previous=len(rows) > per_page)
@@ -0,0 +1,266 @@
+"""
+Render halaman PDF ke gambar.
+Modul ini sengaja hanya bergantung pada PyMuPDF dan Pillow agar ringan
+diimpor oleh proses worker render paralel. Keduanya baru diimpor saat
+dipakai, jadi view yang hanya butuh nama file tidak ikut memuatnya.
+"""
+import math
+import multiprocessing
+import os
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Zoom render halaman buku
+PAGE_ZOOM = 2.0
+
+# Format gambar yang didukung: nama format Pillow dan ekstensi file
+IMAGE_FORMATS = {
+    'png': ('PNG', 'png'),
+    'jpeg': ('JPEG', 'jpg'),
+    'webp': ('WEBP', 'webp'),
+}
+
+# Format, kualitas, dan lebar varian gambar halaman.
+# Dikirim apa adanya ke proses render paralel.
+ImageOptions = namedtuple('ImageOptions', ['fmt', 'quality', 'widths'])
+
+LEGACY_IMAGE_OPTIONS = ImageOptions('png', None, ())
+
+
+def image_options():
+    """ImageOptions dari settings LIBRARY_PAGE_FORMAT/QUALITY/WIDTHS"""
+    from django.conf import settings
+
+    fmt = getattr(settings, 'LIBRARY_PAGE_FORMAT', 'png').lower()
+    if fmt not in IMAGE_FORMATS:
+        fmt = 'png'
+    quality = getattr(settings, 'LIBRARY_PAGE_QUALITY', 80)
+    widths = tuple(sorted(set(getattr(settings, 'LIBRARY_PAGE_WIDTHS', ()))))
+    return ImageOptions(fmt, quality, widths)
+
+
+def page_image_name(page_num, width=None, fmt='png'):
+    """
+    Nama file gambar halaman (page_num dimulai dari 1).
+    Gambar ukuran penuh: page_001.webp, varian lebar: page_001_w480.webp
+    """
+    ext = IMAGE_FORMATS[fmt][1]
+    if width:
+        return f"page_{page_num:03d}_w{width}.{ext}"
+    return f"page_{page_num:03d}.{ext}"
+
+
+def pixmap_to_image(pix):
+    """Konversi pixmap PyMuPDF ke Image Pillow"""
+    from PIL import Image
+
+    mode = "RGBA" if pix.alpha else "RGB"
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+
+def save_image(image, path, fmt, quality=None):
+    """Simpan Image Pillow dengan format dan kualitas tertentu"""
+    pil_format = IMAGE_FORMATS[fmt][0]
+    params = {}
+    if fmt == 'jpeg':
+        image = image.convert('RGB')
+        params = {'quality': quality or 80, 'optimize': True, 'progressive': True}
+    elif fmt == 'webp':
+        # method 2: ukuran hampir sama dengan method 4, encode ~2x lebih cepat
+        params = {'quality': quality or 80, 'method': 2}
+    elif fmt == 'png':
+        params = {'optimize': False}
+    image.save(path, pil_format, **params)
+
+
+def resize_to_width(image, width):
+    """Perkecil gambar ke lebar tertentu dengan rasio tetap"""
+    from PIL import Image
+
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def partial_path(path):
+    """
+    Nama sementara di folder yang sama untuk path. Diawali titik agar tidak
+    dilayani library.media dan tidak dianggap gambar halaman.
+    """
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def is_partial_name(name):
+    """True untuk nama file sementara dari partial_path"""
+    return name.startswith('.') and name.endswith('.tmp')
+
+
+def _write_atomic(path, write):
+    """
+    Tulis file lewat nama sementara lalu os.replace, sehingga path hanya
+    pernah berisi gambar yang utuh
+    """
+    tmp_path = partial_path(path)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_page_image(pix, images_dir, page_num, options=LEGACY_IMAGE_OPTIONS):
+    """
+    Simpan gambar halaman ukuran penuh beserta varian lebarnya.
+    Varian hanya dibuat untuk lebar yang lebih kecil dari gambar penuh.
+    Setiap file ditulis ke nama sementara lalu di-rename, dan gambar penuh
+    ditulis paling akhir: folder gambar di-cache browser selamanya, jadi
+    halaman yang terputus di tengah tidak boleh terlihat di nama aslinya.
+    Returns: list nama file yang disimpan
+    """
+    full_name = page_image_name(page_num, fmt=options.fmt)
+    full_path = os.path.join(images_dir, full_name)
+
+    # PNG tanpa varian: simpan langsung dari pixmap seperti sebelumnya
+    if options.fmt == 'png' and not options.widths:
+        _write_atomic(full_path, lambda tmp_path: pix.save(tmp_path, output='png'))
+        return [full_name]
+
+    image = pixmap_to_image(pix)
+    variants = []
+
+    # Dari lebar terbesar ke terkecil, tiap varian diperkecil dari varian sebelumnya
+    source = image
+    for width in sorted(options.widths, reverse=True):
+        if width >= image.width:
+            continue
+        source = resize_to_width(source, width)
+        name = page_image_name(page_num, width, options.fmt)
+        _write_atomic(os.path.join(images_dir, name),
+                      lambda tmp_path: save_image(source, tmp_path, options.fmt, options.quality))
+        variants.append(name)
+
+    _write_atomic(full_path, lambda tmp_path: save_image(image, tmp_path, options.fmt, options.quality))
+    return [full_name] + variants
+
+
+def render_page(page, zoom=PAGE_ZOOM):
+    """Render satu halaman ke pixmap"""
+    import fitz  # PyMuPDF
+
+    mat = fitz.Matrix(zoom, zoom)
+    return page.get_pixmap(matrix=mat)
+
+
+def page_size(page, zoom=PAGE_ZOOM):
+    """
+    Ukuran (lebar, tinggi) piksel hasil render_page, dihitung dari ukuran
+    halaman PDF tanpa merender
+    """
+    import fitz  # PyMuPDF
+
+    rect = (page.rect * fitz.Matrix(zoom, zoom)).irect
+    return rect.width, rect.height
+
+
+def page_sizes(source, zoom=PAGE_ZOOM):
+    """Ukuran (lebar, tinggi) piksel gambar penuh tiap halaman (lihat page_size)"""
+    with open_document(source) as document:
+        return [page_size(page, zoom) for page in document]
+
+
+def render_region(page, width, height, box):
+    """
+    Render sebagian halaman: halaman diskalakan menjadi width x height
+    piksel lalu hanya kotak box (x0, y0, x1, y1 piksel) yang dirender.
+    Returns: Image Pillow berukuran persis kotak tersebut
+    """
+    import fitz  # PyMuPDF
+
+    mat = fitz.Matrix(width / page.rect.width, height / page.rect.height)
+    clip = fitz.Rect(*box) * ~mat
+    image = pixmap_to_image(page.get_pixmap(matrix=mat, clip=clip))
+
+    # Pembulatan PyMuPDF bisa meleset satu piksel dari kotak yang diminta
+    size = (box[2] - box[0], box[3] - box[1])
+    if image.size != size:
+        image = image.resize(size)
+    return image
+
+
+def open_document(source):
+    """Buka PDF dari path atau bytes (dipakai di proses worker)"""
+    import fitz  # PyMuPDF
+
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def render_page_list(source, images_dir, page_nums, zoom=PAGE_ZOOM,
+                     options=LEGACY_IMAGE_OPTIONS):
+    """
+    Render halaman page_nums (nomor mulai 1) ke images_dir.
+    Setiap pemanggilan membuka dokumennya sendiri sehingga aman
+    dijalankan di proses terpisah.
+    Returns: list nomor halaman yang disimpan
+    """
+    pdf_document = open_document(source)
+    saved = []
+    try:
+        for page_num in page_nums:
+            pix = render_page(pdf_document.load_page(page_num - 1), zoom)
+            save_page_image(pix, images_dir, page_num, options)
+            saved.append(page_num)
+    finally:
+        pdf_document.close()
+    return saved
+
+
+def split_pages(page_nums, workers, chunks_per_worker=4):
+    """
+    Bagi nomor halaman menjadi potongan berurutan. Beberapa potongan per
+    worker supaya halaman yang berat tidak membuat satu worker tertinggal.
+    """
+    page_nums = sorted(page_nums)
+    if not page_nums:
+        return []
+    chunk_count = max(1, min(len(page_nums), workers * chunks_per_worker))
+    size = math.ceil(len(page_nums) / chunk_count)
+    return [page_nums[start:start + size] for start in range(0, len(page_nums), size)]
+
+
+def render_pages_parallel(source, images_dir, page_count, workers, zoom=PAGE_ZOOM,
+                          options=LEGACY_IMAGE_OPTIONS, pages=None, on_saved=None):
+    """
+    Render halaman memakai process pool.
+    source harus berupa path atau bytes karena dikirim ke proses lain.
+    Nama file sama persis dengan render serial (page_001.png, ...).
+    pages: nomor halaman yang dirender (default semua page_count halaman)
+    on_saved: dipanggil dengan list nomor halaman setiap satu potongan
+        selesai (checkpoint, lihat library.checkpoint)
+    Returns: list nomor halaman yang disimpan, urut
+    """
+    chunks = split_pages(range(1, page_count + 1) if pages is None else pages, workers)
+    if not chunks:
+        return []
+    # 'spawn' menghindari fork dari proses Django yang punya koneksi database/thread
+    ctx = multiprocessing.get_context('spawn')
+
+    saved = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=ctx) as executor:
+        futures = [
+            executor.submit(render_page_list, source, images_dir, chunk, zoom, options)
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            chunk_saved = future.result()
+            if on_saved is not None:
+                on_saved(chunk_saved)
+            saved.extend(chunk_saved)
+
+    return sorted(saved)
@@ -0,0 +1,242 @@
+"""
+Indeks pencarian full-text untuk katalog buku.
+
+Di SQLite yang mendukung FTS5 dipakai virtual table `library_book_fts`
+(dibuat oleh migrasi 0004). Database lain memakai inverted index
+sederhana di tabel SearchPosting yang dihitung di Python.
+Kedua backend mengindeks judul, penulis, deskripsi, kata kunci, tahun,
+dan teks isi buku, mendukung pencocokan awalan kata, dan
+mengurutkan hasil berdasarkan relevansi.
+"""
+import io
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+FTS_TABLE = 'library_book_fts'
+
+# Kolom yang diindeks beserta bobot relevansinya
+FIELD_WEIGHTS = {
+    'title': 10.0,
+    'author': 5.0,
+    'keywords': 4.0,
+    'description': 2.0,
+    'year': 2.0,
+    'body': 1.0,
+}
+METADATA_FIELDS = ['title', 'author', 'keywords', 'description', 'year']
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts5_available = None
+
+
+def fts5_available():
+    """True jika database default adalah SQLite dengan tabel FTS5 siap dipakai"""
+    global _fts5_available
+    if _fts5_available is None:
+        _fts5_available = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [FTS_TABLE],
+                )
+                _fts5_available = cursor.fetchone() is not None
+    return _fts5_available
+
+
+def tokenize(text):
+    """Pecah teks menjadi kata huruf kecil (minimal 2 karakter)"""
+    if not text:
+        return []
+    return [word for word in WORD_RE.findall(str(text).lower()) if len(word) > 1]
+
+
+def body_text(pages, max_words=None):
+    """
+    Teks isi buku untuk indeks dari iterable teks halaman (boleh generator).
+    Urutan kata dan pengulangannya dipertahankan supaya frekuensi kata ikut
+    menentukan relevansi (bm25 / bobot 1 + log tf). Panjangnya dibatasi
+    LIBRARY_SEARCH_BODY_MAX_WORDS kata; halaman sesudahnya tidak dibaca.
+    """
+    if max_words is None:
+        max_words = getattr(settings, 'LIBRARY_SEARCH_BODY_MAX_WORDS', 200000)
+    # Ditulis langsung ke buffer, bukan list kata (objek str per kata jauh lebih boros)
+    body = io.StringIO()
+    remaining = max_words
+    for page in pages:
+        words = tokenize(page)[:remaining]
+        if words:
+            if remaining < max_words:
+                body.write(' ')
+            body.write(' '.join(words))
+            remaining -= len(words)
+        if remaining <= 0:
+            break
+    return body.getvalue()
+
+
+def _metadata(book):
+    return {
+        'title': book.title or '',
+        'author': book.author or '',
+        'keywords': book.keywords or '',
+        'description': book.description or '',
+        'year': str(book.year) if book.year else '',
+    }
+
+
+def index_book(book, text=None):
+    """
+    Perbarui indeks untuk satu buku.
+    text=None mempertahankan teks isi yang sudah terindeks sehingga
+    perubahan metadata tidak perlu mengekstrak PDF lagi.
+    """
+    if fts5_available():
+        _fts_index(book, text)
+    else:
+        _posting_index(book, text)
+
+
+def remove_book(book_id):
+    """Hapus buku dari indeks"""
+    if fts5_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book_id])
+    else:
+        from .models import SearchPosting
+        SearchPosting.objects.filter(book_id=book_id).delete()
+
+
+def clear_index():
+    if fts5_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    else:
+        from .models import SearchPosting
+        SearchPosting.objects.all().delete()
+
+
+def search_book_ids(query, limit=None):
+    """
+    Cari buku yang cocok dengan semua kata pada query.
+    Kata terakhir dicocokkan sebagai awalan, begitu pula kata lainnya,
+    jadi "sej indo" menemukan "Sejarah Indonesia".
+    Returns: list id buku, paling relevan lebih dulu
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    limit = limit or getattr(settings, 'LIBRARY_SEARCH_MAX_RESULTS', 500)
+
+    if fts5_available():
+        return _fts_search(terms, limit)
+    return _posting_search(terms, limit)
+
+
+# --- Backend FTS5 -------------------------------------------------------------
+
+def _fts_index(book, text):
+    meta = _metadata(book)
+    with transaction.atomic(), connection.cursor() as cursor:
+        if text is None:
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET title = %s, author = %s, keywords = %s, "
+                f"description = %s, year = %s WHERE rowid = %s",
+                [meta['title'], meta['author'], meta['keywords'],
+                 meta['description'], meta['year'], book.pk],
+            )
+            if cursor.rowcount:
+                return
+            text = ''
+
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, author, keywords, description, year, body) "
+            f"VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [book.pk, meta['title'], meta['author'], meta['keywords'],
+             meta['description'], meta['year'], text],
+        )
+
+
+def _fts_search(terms, limit):
+    # Setiap kata dikutip agar karakter khusus FTS5 tidak dianggap operator
+    match = ' '.join(f'"{term}"*' for term in terms)
+    weights = ', '.join(str(FIELD_WEIGHTS[field]) for field in
+                        ['title', 'author', 'keywords', 'description', 'year', 'body'])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+# --- Backend inverted index (fallback) ----------------------------------------
+
+def _postings(field, text):
+    """Bobot tiap kata pada satu kolom: bobot kolom * (1 + log tf)"""
+    weight = FIELD_WEIGHTS[field]
+    return {
+        term[:64]: weight * (1 + math.log(count))
+        for term, count in Counter(tokenize(text)).items()
+    }
+
+
+def _posting_index(book, text):
+    from .models import SearchPosting
+
+    fields = dict(_metadata(book))
+    if text is not None:
+        fields['body'] = text
+
+    rows = [
+        SearchPosting(term=term, book_id=book.pk, field=field, weight=weight)
+        for field, value in fields.items()
+        for term, weight in _postings(field, value).items()
+    ]
+
+    with transaction.atomic():
+        SearchPosting.objects.filter(book_id=book.pk, field__in=list(fields)).delete()
+        SearchPosting.objects.bulk_create(rows, batch_size=1000)
+
+
+def _posting_search(terms, limit):
+    from django.db.models import Count
+    from .models import Book, SearchPosting
+
+    total_books = max(Book.objects.count(), 1)
+    scores = None
+
+    for term in terms:
+        postings = SearchPosting.objects.filter(term__startswith=term)
+
+        # idf per kata yang cocok dengan awalan
+        doc_freq = dict(
+            postings.values('term').annotate(df=Count('book', distinct=True))
+            .values_list('term', 'df')
+        )
+
+        term_scores = defaultdict(float)
+        for book_id, matched, weight in postings.values_list('book_id', 'term', 'weight'):
+            idf = math.log(1 + total_books / doc_freq.get(matched, 1))
+            term_scores[book_id] += weight * idf
+
+        # Semua kata harus cocok (AND)
+        if scores is None:
+            scores = term_scores
+        else:
+            scores = {
+                book_id: score + term_scores[book_id]
+                for book_id, score in scores.items() if book_id in term_scores
+            }
+        if not scores:
+            return []
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return [book_id for book_id, _ in ranked[:limit]]
@@ -0,0 +1,263 @@
+"""
+Rekomendasi buku serupa dari indeks kemiripan yang dihitung sebelumnya.
+
+Setiap buku direpresentasikan sebagai vektor ternormalisasi dari bobot
+TF-IDF teksnya (library.keywords.KeywordModel) ditambah kata kuncinya.
+k tetangga terdekat (cosine similarity) setiap buku disimpan di tabel
+RelatedBook, sehingga halaman detail cukup membaca beberapa baris.
+
+- Buku baru/diproses ulang diperbarui satu per satu (update_book):
+  daftar tetangganya sendiri dihitung ulang, lalu buku itu disisipkan ke
+  daftar buku lain yang skornya cukup tinggi. Hanya vektor buku yang
+  punya kata sama dengan buku itu yang dihitung; buku lain skornya nol.
+- Buku dengan isi PDF yang sama (ContentBlob yang sama, library.content)
+  tidak saling direkomendasikan.
+- `python manage.py rebuild_related_books` menghitung ulang semuanya.
+
+numpy/scipy hanya diimpor oleh fungsi yang menghitung kemiripan;
+related_books() yang dipanggil view cukup membaca database.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Bobot vektor kata kunci dibanding vektor teks isi buku
+KEYWORD_WEIGHT = 0.5
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def neighbour_count():
+    return _setting('LIBRARY_RELATED_BOOKS', 6)
+
+
+def min_score():
+    return _setting('LIBRARY_RELATED_MIN_SCORE', 0.05)
+
+
+def normalize_rows(matrix):
+    """Normalisasi L2 setiap baris, baris kosong dibiarkan nol"""
+    import numpy as np
+    from scipy import sparse
+
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def book_vectors(model, keywords_by_book, rows=None):
+    """
+    Vektor ternormalisasi buku di model.
+    keywords_by_book: dict book_id -> string kata kunci (dipisah koma)
+    rows: baris model yang dihitung (default semua), urutan hasil mengikutinya
+    """
+    import numpy as np
+    from scipy import sparse
+
+    from .keywords import keyword_terms, tfidf
+
+    if rows is None:
+        rows = range(model.n_docs)
+        counts = model.counts
+    else:
+        counts = model.counts[list(rows)]
+
+    idf = model.idf()
+    keyword_rows, columns = [], []
+    for position, row in enumerate(rows):
+        for term in set(keyword_terms(keywords_by_book.get(model.book_ids[row]) or '')):
+            column = model.vocabulary.get(term)
+            if column is not None:
+                keyword_rows.append(position)
+                columns.append(column)
+
+    keywords = sparse.csr_matrix(
+        (idf[columns].astype(np.float32), (keyword_rows, columns)),
+        shape=counts.shape,
+    )
+    text = tfidf(counts, model.df, model.n_docs)
+    combined = normalize_rows(text) + KEYWORD_WEIGHT * normalize_rows(keywords)
+    return normalize_rows(combined).tocsr()
+
+
+def _top_neighbours(scores, k, threshold):
+    """Index dan skor k nilai tertinggi di atas threshold, urut menurun"""
+    import numpy as np
+
+    if k <= 0 or not len(scores):
+        return []
+    top = min(k, len(scores))
+    best = np.argpartition(-scores, top - 1)[:top]
+    best = best[np.argsort(-scores[best], kind='stable')]
+    return [(int(index), float(scores[index])) for index in best if scores[index] > threshold]
+
+
+def _existing_rows(model):
+    """
+    Mask baris model yang bukunya masih ada, kata kunci buku, dan baris
+    model per isi PDF (ContentBlob)
+    """
+    import numpy as np
+
+    from .models import Book
+
+    keywords_by_book, rows_by_content = {}, {}
+    for book_id, keywords, content_id in Book.objects.values_list('pk', 'keywords', 'content_id'):
+        keywords_by_book[book_id] = keywords
+        if content_id is not None and book_id in model.rows:
+            rows_by_content.setdefault(content_id, []).append(model.rows[book_id])
+    alive = np.array([book_id in keywords_by_book for book_id in model.book_ids], dtype=bool)
+    same_content = {row: rows for rows in rows_by_content.values() if len(rows) > 1 for row in rows}
+    return alive, keywords_by_book, same_content
+
+
+def _candidate_rows(model, row, keywords):
+    """Baris model yang punya minimal satu kata (teks atau kata kunci) yang sama dengan row"""
+    import numpy as np
+
+    from .keywords import keyword_terms
+
+    shared = np.zeros(len(model.terms), dtype=np.float32)
+    shared[model.counts[row].indices] = 1
+    for term in keyword_terms(keywords or ''):
+        column = model.vocabulary.get(term)
+        if column is not None:
+            shared[column] = 1
+    return [int(index) for index in np.flatnonzero(model.counts @ shared) if index != row]
+
+
+def _book_fields(book_ids, batch_size=500):
+    """Kata kunci dan content_id buku yang masih ada, dibaca per batch"""
+    from .models import Book
+
+    book_ids = list(book_ids)
+    fields = {}
+    for start in range(0, len(book_ids), batch_size):
+        fields.update(
+            (pk, (keywords, content_id)) for pk, keywords, content_id in
+            Book.objects.filter(pk__in=book_ids[start:start + batch_size])
+            .values_list('pk', 'keywords', 'content_id')
+        )
+    return fields
+
+
+def rebuild_all(chunk_rows=512):
+    """
+    Hitung ulang tetangga semua buku.
+    Perkalian matrix dilakukan per blok baris agar memori tetap kecil.
+    Returns: jumlah baris RelatedBook yang dibuat
+    """
+    import numpy as np
+
+    from .keywords import load_model
+    from .models import RelatedBook
+
+    model = load_model()
+    alive, keywords_by_book, same_content = _existing_rows(model)
+    k, threshold = neighbour_count(), min_score()
+
+    entries = []
+    if model.n_docs:
+        vectors = book_vectors(model, keywords_by_book)
+        transposed = vectors.T.tocsc()
+        for start in range(0, model.n_docs, chunk_rows):
+            block = (vectors[start:start + chunk_rows] @ transposed).toarray()
+            block[:, ~alive] = -np.inf
+            for offset, scores in enumerate(block):
+                row = start + offset
+                if not alive[row]:
+                    continue
+                scores[row] = -np.inf
+                scores[same_content.get(row, [])] = -np.inf
+                book_id = model.book_ids[row]
+                entries.extend(
+                    RelatedBook(book_id=book_id, related_id=model.book_ids[index], score=score)
+                    for index, score in _top_neighbours(scores, k, threshold)
+                )
+
+    with transaction.atomic():
+        RelatedBook.objects.all().delete()
+        RelatedBook.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def update_book(book):
+    """
+    Perbarui indeks kemiripan untuk satu buku yang baru ditambah atau
+    diproses ulang, tanpa menghitung ulang seluruh koleksi: hanya vektor
+    buku ini dan buku yang punya kata sama dengannya yang dihitung, dan
+    hanya daftar tetangga buku-buku itu yang diubah.
+    """
+    import numpy as np
+
+    from .keywords import count_terms, load_model, record_book
+    from .models import RelatedBook
+    from .text_store import iter_book_text
+
+    model = load_model()
+    if book.pk not in model.rows:
+        # Tahap kata kunci dilewati (keywords sudah ada), teks belum masuk model
+        counts = count_terms(iter_book_text(book)).counts
+        record_book(book.pk, counts)
+        model = load_model()
+
+    row = model.rows[book.pk]
+    fields = _book_fields(model.book_ids[index] for index in _candidate_rows(model, row, book.keywords))
+    # Buku dengan isi PDF yang sama tidak saling direkomendasikan
+    others = [model.rows[pk] for pk, (_, content_id) in fields.items()
+              if pk != book.pk and (content_id is None or content_id != book.content_id)]
+    keywords_by_book = {pk: keywords for pk, (keywords, _) in fields.items()}
+    keywords_by_book[book.pk] = book.keywords
+
+    vectors = book_vectors(model, keywords_by_book, rows=[row] + others)
+    scores = (vectors[1:] @ vectors[0].T).toarray().ravel()
+
+    k, threshold = neighbour_count(), min_score()
+    own = [
+        RelatedBook(book_id=book.pk, related_id=model.book_ids[others[index]], score=score)
+        for index, score in _top_neighbours(scores, k, threshold)
+    ]
+
+    # Buku lain yang mungkin memasukkan buku ini ke daftar tetangganya
+    candidate_scores = {
+        model.book_ids[others[index]]: float(scores[index])
+        for index in np.flatnonzero(scores > threshold)
+    }
+
+    with transaction.atomic():
+        RelatedBook.objects.filter(book_id=book.pk).delete()
+        RelatedBook.objects.bulk_create(own)
+
+        # Skor lama buku ini di daftar buku lain sudah tidak berlaku
+        RelatedBook.objects.filter(related_id=book.pk).delete()
+
+        current = {}
+        for entry in RelatedBook.objects.filter(book_id__in=list(candidate_scores)).order_by('book_id', '-score'):
+            current.setdefault(entry.book_id, []).append(entry)
+
+        inserted, dropped = [], []
+        for other_id, score in candidate_scores.items():
+            neighbours = current.get(other_id, [])
+            if len(neighbours) >= k and score <= neighbours[k - 1].score:
+                continue
+            inserted.append(RelatedBook(book_id=other_id, related_id=book.pk, score=score))
+            # Tetangga dengan skor terendah tergeser
+            dropped.extend(entry.pk for entry in neighbours[k - 1:])
+
+        RelatedBook.objects.filter(pk__in=dropped).delete()
+        RelatedBook.objects.bulk_create(inserted, batch_size=1000)
+
+    logger.debug("Related books updated for book %s: %d neighbours, added to %d other lists",
+                 book.pk, len(own), len(inserted))
+
+
+def related_books(book, limit=None):
+    """Buku serupa yang sudah dihitung, paling mirip lebih dulu"""
+    entries = book.related_entries.select_related('related')[:limit or neighbour_count()]
+    return [entry.related for entry in entries]
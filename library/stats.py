@@ -0,0 +1,213 @@
+"""
+Statistik perpustakaan untuk halaman home dan profil.
+
+Jumlah buku, user, buku yang sudah diproses (punya folder gambar), buku
+per genre, serta jumlah buku dan buku terproses per uploader disimpan
+sebagai baris StatCounter. Signal Book/User (lihat library/models.py)
+menambah atau mengurangi counter, jadi halaman cukup membaca beberapa
+baris dengan satu query, bukan menjalankan COUNT(*) setiap kunjungan.
+Counter buku diubah di transaksi yang sama dengan baris bukunya
+(Book.save() dibungkus transaction.atomic, delete() Django sudah atomik),
+begitu juga saat user dihapus. User baru dihitung setelah transaksi yang
+membuatnya commit (on_commit), karena User.save() bukan milik app ini.
+
+QuerySet.update()/bulk_create() tidak memicu signal dan bisa membuat
+counter meleset; `manage.py reconcile_stats` menghitung ulang dari data
+sebenarnya. Jalankan berkala (cron), misalnya sekali sehari.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+TOTAL_BOOKS = 'books'
+TOTAL_USERS = 'users'
+PROCESSED_BOOKS = 'processed_books'
+GENRE_PREFIX = 'genre:'
+
+# Kolom Book yang menentukan counter: (nama field untuk update_fields, atribut)
+BOOK_STATE_FIELDS = (('uploader', 'uploader_id'), ('genre', 'genre'), ('images_folder', 'images_folder'))
+
+
+def user_key(user_id, name):
+    return f"user:{user_id}:{name}"
+
+
+def _counter_model():
+    from .models import StatCounter
+    return StatCounter
+
+
+def stored_book_state(book):
+    """Nilai kolom BOOK_STATE_FIELDS buku di database (sebelum disimpan)"""
+    if book._state.adding or book.pk is None:
+        return None
+    return type(book).objects.filter(pk=book.pk).values(
+        *(attname for _, attname in BOOK_STATE_FIELDS)
+    ).first()
+
+
+def book_state(book, old_state=None, update_fields=None):
+    """
+    Nilai kolom BOOK_STATE_FIELDS setelah disimpan. Dengan update_fields,
+    kolom yang tidak ikut disimpan tetap memakai nilai di database.
+    """
+    state = {}
+    for name, attname in BOOK_STATE_FIELDS:
+        if update_fields is not None and old_state is not None and name not in update_fields:
+            state[attname] = old_state[attname]
+        else:
+            state[attname] = getattr(book, attname)
+    return state
+
+
+def _book_counters(state):
+    if state is None:
+        return {}
+    counters = {
+        TOTAL_BOOKS: 1,
+        GENRE_PREFIX + state['genre']: 1,
+        user_key(state['uploader_id'], 'books'): 1,
+    }
+    # Sama dengan definisi lama: images_folder tidak NULL
+    if state['images_folder'] is not None:
+        counters[PROCESSED_BOOKS] = 1
+        counters[user_key(state['uploader_id'], 'processed_books')] = 1
+    return counters
+
+
+def add(key, delta):
+    """Tambah counter secara atomik di database (F() expression)"""
+    StatCounter = _counter_model()
+    if not delta or StatCounter.objects.filter(key=key).update(value=F('value') + delta):
+        return
+    if delta < 0:
+        # Counter belum ada (atau sudah dihapus bersama user-nya), tidak ada yang dikurangi
+        return
+    try:
+        with transaction.atomic():
+            StatCounter.objects.create(key=key, value=delta)
+    except IntegrityError:
+        # Dibuat proses lain di antara UPDATE dan INSERT
+        StatCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def add_many(keys, delta, batch_size=500):
+    """Tambah delta ke banyak counter yang sudah ada, per batch"""
+    StatCounter = _counter_model()
+    keys = list(keys)
+    for start in range(0, len(keys), batch_size):
+        StatCounter.objects.filter(key__in=keys[start:start + batch_size]).update(value=F('value') + delta)
+
+
+def record_book_change(old_state, new_state):
+    """Perbarui counter dari keadaan buku sebelum dan sesudah (None = tidak ada)"""
+    deltas = Counter(_book_counters(new_state))
+    deltas.subtract(_book_counters(old_state))
+    for key, delta in deltas.items():
+        add(key, delta)
+
+
+def record_user_change(delta, user_id=None):
+    add(TOTAL_USERS, delta)
+    if user_id is not None and delta < 0:
+        _counter_model().objects.filter(key__startswith=user_key(user_id, '')).delete()
+
+
+def library_stats():
+    """Statistik halaman home dari satu query"""
+    values = dict(
+        _counter_model().objects
+        .filter(Q(key__in=[TOTAL_BOOKS, TOTAL_USERS, PROCESSED_BOOKS]) | Q(key__startswith=GENRE_PREFIX))
+        .values_list('key', 'value')
+    )
+    return {
+        'total_books': values.get(TOTAL_BOOKS, 0),
+        'total_users': values.get(TOTAL_USERS, 0),
+        'processed_books': values.get(PROCESSED_BOOKS, 0),
+        'total_genres': sum(1 for key, value in values.items()
+                            if key.startswith(GENRE_PREFIX) and value > 0),
+    }
+
+
+def user_stats(user_id):
+    """Jumlah buku, buku terproses, dan favorit milik satu user, satu query"""
+    names = ('books', 'processed_books', 'favorites')
+    values = dict(
+        _counter_model().objects
+        .filter(key__in=[user_key(user_id, name) for name in names])
+        .values_list('key', 'value')
+    )
+    return {name: values.get(user_key(user_id, name), 0) for name in names}
+
+
+def expected_counters():
+    """Nilai semua counter dihitung langsung dari tabel buku dan user"""
+    from django.contrib.auth.models import User
+
+    from .models import Book, Favorite
+
+    processed = Q(images_folder__isnull=False)
+    counters = {
+        TOTAL_BOOKS: Book.objects.count(),
+        TOTAL_USERS: User.objects.count(),
+        PROCESSED_BOOKS: Book.objects.filter(processed).count(),
+    }
+    for row in Book.objects.order_by().values('genre').annotate(total=Count('pk')):
+        counters[GENRE_PREFIX + row['genre']] = row['total']
+    per_user = Book.objects.order_by().values('uploader_id').annotate(
+        books=Count('pk'), processed_books=Count('pk', filter=processed),
+    )
+    for row in per_user:
+        counters[user_key(row['uploader_id'], 'books')] = row['books']
+        if row['processed_books']:
+            counters[user_key(row['uploader_id'], 'processed_books')] = row['processed_books']
+    for row in Favorite.objects.order_by().values('user_id').annotate(total=Count('pk')):
+        counters[user_key(row['user_id'], 'favorites')] = row['total']
+    return counters
+
+
+def reconcile_book_favorites(dry_run=False):
+    """
+    Samakan Book.favorites_count dengan jumlah baris favorit.
+    Returns: daftar (key 'book:<id>:favorites', nilai tersimpan, nilai benar)
+    """
+    from .models import Book
+
+    wrong = list(Book.objects.order_by('pk').annotate(actual=Count('favorite'))
+                 .exclude(favorites_count=F('actual')).values_list('pk', 'favorites_count', 'actual'))
+    if not dry_run:
+        for pk, _, actual in wrong:
+            Book.objects.filter(pk=pk).update(favorites_count=actual)
+    return [(f"book:{pk}:favorites", stored, actual) for pk, stored, actual in wrong]
+
+
+def reconcile_counters(dry_run=False):
+    """
+    Samakan baris StatCounter dengan data sebenarnya.
+    Returns: daftar (key, nilai tersimpan, nilai benar) yang berbeda;
+        nilai benar None berarti counter dihapus
+    """
+    StatCounter = _counter_model()
+    with transaction.atomic():
+        expected = expected_counters()
+        current = dict(StatCounter.objects.values_list('key', 'value'))
+        changes = [(key, current.get(key), value) for key, value in sorted(expected.items())
+                   if current.get(key) != value]
+        stale = [key for key in current if key not in expected]
+        # Counter bernilai 0 yang tidak diperlukan lagi dibuang tanpa dilaporkan
+        changes += [(key, current[key], None) for key in sorted(stale) if current[key]]
+
+        if not dry_run:
+            StatCounter.objects.filter(key__in=stale).delete()
+            StatCounter.objects.bulk_create(
+                [StatCounter(key=key, value=value) for key, _, value in changes if value is not None],
+                update_conflicts=True, unique_fields=['key'], update_fields=['value', 'updated_at'],
+            )
+    return changes
+
+
+def reconcile(dry_run=False):
+    """Samakan semua counter (StatCounter dan Book.favorites_count) dengan data sebenarnya"""
+    with transaction.atomic():
+        return reconcile_counters(dry_run) + reconcile_book_favorites(dry_run)
@@ -1,3 +1,1413 @@
-from django.test import TestCase
+import contextlib
+import hashlib
+import importlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from benchmarks import corpus
+
+from . import (checkpoint, keywords, metrics, page_cache, pagination, rendering, search, similarity, stats, text_store,
+               tiles, tokenizer, utils)
+from . import jobs, uploads
+from .jobs import run_worker
+from .models import Book, ContentBlob, Favorite, ProcessingJob, RelatedBook, StatCounter, UploadSession
+from .search import body_text, index_book, search_book_ids
+
+class LibraryTestCase(TestCase):
+    """
+    Media, teks, cache halaman, model kata kunci, metrik, upload, dan
+    profil disimpan di folder sementara yang dihapus setelah setiap test
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='elibrary-test-')
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        media_root = os.path.join(self.tmp, 'media')
+        overrides = override_settings(
+            MEDIA_ROOT=media_root,
+            LIBRARY_PAGE_CACHE_ROOT=os.path.join(media_root, 'page_cache'),
+            LIBRARY_TEXT_ROOT=os.path.join(self.tmp, 'text'),
+            LIBRARY_KEYWORD_MODEL_PATH=os.path.join(self.tmp, 'keywords.npz'),
+            LIBRARY_METRICS_DIR=os.path.join(self.tmp, 'metrics'),
+            LIBRARY_UPLOAD_ROOT=os.path.join(self.tmp, 'uploads'),
+            LIBRARY_PROFILER_DIR=os.path.join(self.tmp, 'profiles'),
+            LIBRARY_RENDER_WORKERS=1,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        page_cache._page_cache = None
+        self.addCleanup(setattr, page_cache, '_page_cache', None)
+        keywords._cache.clear()
+        self.addCleanup(keywords._cache.clear)
+        cache.clear()
+
+        self.user = User.objects.create_user('pembaca', 'pembaca@example.com', 'Rahasia123!')
+        self.client.force_login(self.user)
+
+    def make_pdf(self, name='buku.pdf', pages=3, seed=0, words_per_page=60):
+        return corpus.text_pdf(os.path.join(self.tmp, name), pages, words_per_page, seed)
+
+    def make_image(self, name='cover.png', size=(60, 80)):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 40, 40)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def upload_book(self, path, title='Buku Uji', **data):
+        with open(path, 'rb') as pdf:
+            response = self.client.post('/library/add/', {'file': pdf, 'title': title,
+                                                          'genre': 'fiksi', **data})
+        self.assertEqual(response.status_code, 302)
+        return Book.objects.get(title=title)
+
+
+class JobQueueTests(LibraryTestCase):
+    def test_upload_is_processed_by_worker_not_request(self):
+        book = self.upload_book(self.make_pdf(pages=3))
+        self.assertEqual(book.processing_status, Book.STATUS_PENDING)
+        self.assertIsNone(book.images_folder)
+        self.assertEqual(ProcessingJob.objects.get(book=book).status, ProcessingJob.STATUS_PENDING)
+
+        self.assertEqual(run_worker(once=True), 1)
+        book.refresh_from_db()
+        job = ProcessingJob.objects.get(book=book)
+        self.assertEqual(job.status, ProcessingJob.STATUS_DONE)
+        self.assertEqual(set(job.stage_status.values()), {ProcessingJob.STATUS_DONE})
+        self.assertEqual((book.processing_status, book.pages), (Book.STATUS_READY, 3))
+        self.assertTrue(book.cover and book.keywords)
+
+    def test_claim_is_exclusive_and_stale_jobs_are_reclaimed(self):
+        book = Book.objects.create(title='Antre', genre='fiksi', uploader=self.user)
+        job = jobs.enqueue_book_processing(book)
+        self.assertEqual(jobs.claim_next_job('worker-1').pk, job.pk)
+        self.assertIsNone(jobs.claim_next_job('worker-2'))
+
+        # Worker pertama mati tanpa memperbarui job
+        ProcessingJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(jobs.claim_next_job('worker-2').locked_by, 'worker-2')
+
+    @override_settings(LIBRARY_PRERENDER_PAGES=None, LIBRARY_RENDER_CHECKPOINT_PAGES=2)
+    def test_long_running_job_keeps_its_lock(self):
+        book = self.upload_book(self.make_pdf(pages=6))
+        stale = timezone.now() - timedelta(hours=1)
+        save_page_image = utils.save_page_image
+        fresh = []
+
+        def slow_page(*args):
+            # Setiap halaman seolah berjalan lebih lama dari LIBRARY_JOB_STALE_TIMEOUT
+            fresh.append(ProcessingJob.objects.get(book=book).locked_at > stale)
+            ProcessingJob.objects.filter(book=book).update(locked_at=stale)
+            return save_page_image(*args)
+
+        def slow_stage(book, job):
+            ProcessingJob.objects.filter(pk=job.pk).update(locked_at=stale)
+
+        def next_stage(book, job):
+            fresh.append(ProcessingJob.objects.get(pk=job.pk).locked_at > stale)
+
+        with mock.patch.object(utils, 'save_page_image', side_effect=slow_page), \
+                mock.patch.dict(jobs.STAGE_HANDLERS, {ProcessingJob.STAGE_KEYWORDS: slow_stage,
+                                                      ProcessingJob.STAGE_RELATED: next_stage}):
+            run_worker(once=True)
+        # Checkpoint tiap 2 halaman dan pergantian tahap memperbarui locked_at
+        self.assertEqual(fresh, [True, False, True, False, True, False, True])
+        job = ProcessingJob.objects.get(book=book)
+        self.assertEqual((job.status, job.attempts, job.locked_at), (ProcessingJob.STATUS_DONE, 0, None))
+
+    def test_reclaimed_job_is_not_saved_by_the_old_worker(self):
+        for seed, error in enumerate([None, RuntimeError('koneksi putus')]):
+            # Isi berbeda: job kedua tidak menunggu isi yang masih dipegang worker-2
+            book = self.upload_book(self.make_pdf(pages=1, seed=seed), f'Diambil alih {error}')
+            later_stage = mock.Mock()
+
+            def reclaimed(book, job):
+                # Worker lain mengambil alih job yang dikira ditinggal
+                ProcessingJob.objects.filter(pk=job.pk).update(locked_by='worker-2')
+                if error:
+                    raise error
+
+            with mock.patch.dict(jobs.STAGE_HANDLERS, {ProcessingJob.STAGE_INGEST: reclaimed,
+                                                       ProcessingJob.STAGE_KEYWORDS: later_stage}):
+                self.assertEqual(run_worker(once=True), 1)
+            job = ProcessingJob.objects.get(book=book)
+            # Status dan jumlah percobaan tetap milik worker baru
+            self.assertEqual((job.status, job.locked_by, job.attempts, job.last_error),
+                             (ProcessingJob.STATUS_RUNNING, 'worker-2', 0, ''))
+            self.assertEqual(Book.objects.get(pk=book.pk).processing_status, Book.STATUS_PROCESSING)
+            self.assertFalse(later_stage.called)
+
+    def test_failed_stage_is_retried_later_without_repeating_done_stages(self):
+        book = self.upload_book(self.make_pdf(pages=2))
+        failing = mock.Mock(side_effect=RuntimeError('model terkunci'))
+        with mock.patch.dict(jobs.STAGE_HANDLERS, {ProcessingJob.STAGE_KEYWORDS: failing}):
+            run_worker(once=True)
+        job = ProcessingJob.objects.get(book=book)
+        self.assertEqual((job.status, job.attempts), (ProcessingJob.STATUS_PENDING, 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=20))
+        self.assertEqual(job.stage_status, {ProcessingJob.STAGE_INGEST: ProcessingJob.STATUS_DONE,
+                                            ProcessingJob.STAGE_KEYWORDS: ProcessingJob.STATUS_FAILED})
+        # Belum waktunya dicoba lagi
+        self.assertEqual(run_worker(once=True), 0)
+
+        ProcessingJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        ingest = mock.Mock(side_effect=AssertionError('ingest diulang'))
+        with mock.patch.dict(jobs.STAGE_HANDLERS, {ProcessingJob.STAGE_INGEST: ingest}):
+            run_worker(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.STATUS_DONE)
+        self.assertEqual(Book.objects.get(pk=book.pk).processing_status, Book.STATUS_READY)
+
+    def test_job_failing_every_attempt_marks_book_failed(self):
+        book = self.upload_book(self.make_pdf(pages=1))
+        ProcessingJob.objects.filter(book=book).update(max_attempts=2)
+        failing = mock.Mock(side_effect=RuntimeError('PDF rusak'))
+        with mock.patch.dict(jobs.STAGE_HANDLERS, {ProcessingJob.STAGE_INGEST: failing}):
+            run_worker(once=True)
+            ProcessingJob.objects.filter(book=book).update(run_after=timezone.now())
+            run_worker(once=True)
+        job = ProcessingJob.objects.get(book=book)
+        self.assertEqual((job.status, job.attempts), (ProcessingJob.STATUS_FAILED, 2))
+        self.assertIn('PDF rusak', job.last_error)
+        self.assertEqual(Book.objects.get(pk=book.pk).processing_status, Book.STATUS_FAILED)
+
+
+class IngestTests(LibraryTestCase):
+    def images_dir(self, result):
+        return os.path.join(self.tmp, 'media', result['images_folder'])
+
+    def test_single_pass_opens_pdf_once(self):
+        path = self.make_pdf(pages=4)
+        with mock.patch.object(utils, 'open_document', wraps=rendering.open_document) as opened, \
+                mock.patch.object(utils, 'render_page', wraps=rendering.render_page) as rendered:
+            result = utils.ingest_pdf(path, 'uji', prerender_pages=2)
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(rendered.call_count, 2)
+
+        self.assertEqual(result['pages'], 4)
+        fmt = rendering.image_options().fmt
+        files = os.listdir(self.images_dir(result))
+        self.assertIn(rendering.page_image_name(2, fmt=fmt), files)
+        self.assertNotIn(rendering.page_image_name(3, fmt=fmt), files)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp, 'media', result['cover'])))
+        # Teks semua halaman diekstrak di jalan yang sama, termasuk yang belum dirender
+        pages = list(text_store.iter_pages(result['text_file']))
+        self.assertEqual(len(pages), 4)
+        self.assertTrue(pages[3].startswith('Bab 4.'))
+
+    def test_unreadable_pdf_leaves_no_images_folder(self):
+        path = os.path.join(self.tmp, 'rusak.pdf')
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.4 bukan pdf')
+        with self.assertRaises(Exception):
+            utils.ingest_pdf(path, 'rusak')
+        # PDF dibuka sebelum folder gambar dibuat
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'media', 'book_images')))
+
+    def test_parallel_render_matches_serial(self):
+        path = self.make_pdf(pages=5)
+        self.assertEqual(rendering.split_pages(range(1, 6), 2, chunks_per_worker=1), [[1, 2, 3], [4, 5]])
+        serial_dir, parallel_dir = (os.path.join(self.tmp, name) for name in ('serial', 'parallel'))
+        os.makedirs(serial_dir)
+        os.makedirs(parallel_dir)
+
+        rendering.render_page_list(path, serial_dir, range(1, 6))
+        checkpoints = []
+        saved = rendering.render_pages_parallel(path, parallel_dir, 5, workers=2, on_saved=checkpoints.append)
+        self.assertEqual(saved, [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(page for chunk in checkpoints for page in chunk), saved)
+        self.assertEqual(sorted(os.listdir(parallel_dir)), sorted(os.listdir(serial_dir)))
+        for name in os.listdir(serial_dir):
+            with open(os.path.join(serial_dir, name), 'rb') as serial, \
+                    open(os.path.join(parallel_dir, name), 'rb') as parallel:
+                self.assertEqual(serial.read(), parallel.read(), name)
+
+    @override_settings(LIBRARY_RENDER_PARALLEL_MIN_PAGES=4)
+    def test_ingest_renders_in_parallel_from_min_pages(self):
+        path = self.make_pdf(pages=4)
+        with mock.patch.object(utils, 'render_pages_parallel', wraps=rendering.render_pages_parallel) as parallel:
+            utils.ingest_pdf(self.make_pdf('kecil.pdf', pages=3), 'kecil', workers=2)
+            self.assertFalse(parallel.called)
+            result = utils.ingest_pdf(path, 'besar', workers=2)
+        self.assertEqual(parallel.call_count, 1)
+        fmt = rendering.image_options().fmt
+        # Tanpa varian lebar dan file checkpoint tersembunyi
+        names = [name for name in os.listdir(self.images_dir(result)) if '_w' not in name and name[0] != '.']
+        self.assertEqual(sorted(names), [rendering.page_image_name(page, fmt=fmt) for page in range(1, 5)])
+        self.assertEqual(len(list(text_store.iter_pages(result['text_file']))), 4)
+
+
+@override_settings(LIBRARY_PRERENDER_PAGES=1)
+class PageCacheTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.book = self.upload_book(self.make_pdf(pages=4))
+        run_worker(once=True)
+        self.book.refresh_from_db()
+
+    def test_missing_pages_are_rendered_once_on_demand(self):
+        url = f'/library/{self.book.pk}/pages/3/'
+        with mock.patch.object(page_cache, 'render_page', wraps=rendering.render_page) as rendered:
+            for _ in range(2):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                b''.join(response.streaming_content)
+        self.assertEqual(rendered.call_count, 1)
+        self.assertTrue(os.path.isfile(page_cache.get_page_cache().path_for(self.book, 3)))
+        for page in (0, 5):
+            self.assertEqual(self.client.get(f'/library/{self.book.pk}/pages/{page}/').status_code, 404)
+
+    def test_least_recently_used_pages_are_evicted(self):
+        disk_cache = page_cache.PageCache(root=os.path.join(self.tmp, 'lru'))
+        paths = {page: disk_cache.get_or_render(self.book, page) for page in (2, 3, 4)}
+        for age, page in enumerate((2, 3, 4)):
+            os.utime(paths[page], (1000 + age, 1000 + age))
+        # Halaman 2 baru dibaca lagi, jadi halaman 3 yang paling lama tidak diakses
+        disk_cache.get(self.book, 2)
+
+        kept = os.path.getsize(paths[2]) + os.path.getsize(paths[4])
+        disk_cache.max_bytes = int(kept / disk_cache.LOW_WATERMARK) + 1
+        self.assertEqual(disk_cache.evict(), kept)
+        self.assertEqual([os.path.exists(paths[page]) for page in (2, 3, 4)], [True, False, True])
+
+    def test_render_error_is_404_and_leaves_no_partial_file(self):
+        disk_cache = page_cache.get_page_cache()
+        with mock.patch.object(page_cache, 'render_page', side_effect=RuntimeError('PDF rusak')):
+            self.assertEqual(self.client.get(f'/library/{self.book.pk}/pages/2/').status_code, 404)
+        self.assertEqual([name for _, _, names in os.walk(disk_cache.root) for name in names], [])
+
+
+class PageImageTests(LibraryTestCase):
+    @override_settings(LIBRARY_PAGE_FORMAT='webp', LIBRARY_PAGE_WIDTHS=[480, 300, 5000])
+    def test_compact_pages_with_width_variants(self):
+        from PIL import Image
+
+        document = rendering.open_document(self.make_pdf(pages=1))
+        pix = rendering.render_page(document.load_page(0))
+        document.close()
+        options = rendering.image_options()
+        self.assertEqual(options.widths, (300, 480, 5000))
+
+        names = rendering.save_page_image(pix, self.tmp, 1, options)
+        # Varian selebar atau lebih lebar dari gambar penuh tidak dibuat
+        self.assertEqual(names, ['page_001.webp', 'page_001_w480.webp', 'page_001_w300.webp'])
+        for name, width in zip(names, (pix.width, 480, 300)):
+            with Image.open(os.path.join(self.tmp, name)) as image:
+                self.assertEqual((image.format, image.width), ('WEBP', width))
+        rendering.save_page_image(pix, self.tmp, 1)
+        self.assertLess(os.path.getsize(os.path.join(self.tmp, 'page_001.webp')),
+                        os.path.getsize(os.path.join(self.tmp, 'page_001.png')))
+
+    @override_settings(LIBRARY_PAGE_FORMAT='tiff')
+    def test_unknown_format_falls_back_to_png(self):
+        self.assertEqual(rendering.image_options().fmt, 'png')
+
+    @override_settings(LIBRARY_PAGE_FORMAT='webp', LIBRARY_PAGE_WIDTHS=[480, 5000], LIBRARY_PRERENDER_PAGES=1)
+    def test_preview_offers_srcset_of_variants(self):
+        from PIL import Image
+
+        book = self.upload_book(self.make_pdf(pages=2))
+        run_worker(once=True)
+        book.refresh_from_db()
+
+        response = self.client.get(f'/library/{book.pk}/preview/')
+        self.assertEqual(response.status_code, 200)
+        full = f'/media/{book.images_folder}/page_001.webp'
+        self.assertEqual(response.context['image_url'], full)
+        self.assertEqual(response.context['image_srcset'],
+                         f'/media/{book.images_folder}/page_001_w480.webp 480w, {full} 5000w')
+        self.assertIn('imagesrcset=', response['Link'])
+
+        # Halaman yang belum dirender: varian dibuat oleh endpoint halaman
+        response = self.client.get(f'/library/{book.pk}/pages/2/', {'w': 480})
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.width, 480)
+
+
+class TextStoreTests(LibraryTestCase):
+    def test_sidecar_pages_and_fallback(self):
+        with text_store.PageTextWriter('uji', 3) as writer:
+            writer.write_page('Halaman satu')
+            writer.write_page('Dua')
+            writer.fallback = 'Judul dari metadata'
+        self.assertEqual(list(text_store.iter_pages(writer.text_file)), ['Halaman satu', 'Dua', ''])
+        self.assertEqual(text_store.read_page(writer.text_file, 2), 'Dua')
+        self.assertEqual(text_store.read_page(writer.text_file, 9), '')
+        # Teks asli terlalu sedikit: teks pengganti ikut dianalisis
+        self.assertEqual(list(text_store.iter_text(writer.text_file))[-1], 'Judul dari metadata')
+
+        with self.assertRaises(RuntimeError), text_store.PageTextWriter('batal', 1):
+            raise RuntimeError
+        self.assertEqual(sorted(os.listdir(text_store.text_root())), [writer.text_file])
+
+    def test_analysis_reads_sidecar_instead_of_pdf(self):
+        book = self.upload_book(self.make_pdf(pages=2))
+        run_worker(once=True)
+        book.refresh_from_db()
+        self.assertTrue(text_store.has_text(book))
+
+        with mock.patch.object(utils, 'open_pdf', side_effect=AssertionError('PDF dibuka lagi')), \
+                mock.patch.object(rendering, 'open_document', side_effect=AssertionError('PDF dibuka lagi')):
+            response = self.client.post(f'/library/{book.pk}/analyze/', '{}', content_type='application/json')
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(len(response.json()['keywords']), 5)
+
+        text_file = book.text_file
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertFalse(os.path.exists(text_store.text_path(text_file)))
+
+    def test_legacy_book_text_is_extracted_once(self):
+        book = self.upload_book(self.make_pdf(pages=2))
+        run_worker(once=True)
+        book.refresh_from_db()
+        text_store.delete_text(book.text_file)
+
+        with mock.patch.object(utils, 'store_pdf_text', wraps=utils.store_pdf_text) as extracted:
+            first = list(text_store.iter_book_text(book))
+            second = list(text_store.iter_book_text(Book.objects.get(pk=book.pk)))
+        self.assertEqual(extracted.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertTrue(first[1].startswith('Bab 2.'))
+
+        # Sidecar baru milik blob: dipakai buku lain dengan isi sama dan dihapus bersama blob
+        book.refresh_from_db()
+        blob = ContentBlob.objects.get()
+        self.assertEqual(blob.text_file, book.text_file)
+        self.assertTrue(book.text_file.startswith(blob.sha256[:16]))
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(os.listdir(text_store.text_root()), [])
+
+
+class StartupTests(TestCase):
+    def test_light_entry_points_do_not_import_heavy_dependencies(self):
+        from benchmarks import import_time
+
+        for target in ('urls', 'library_utils', 'library_jobs'):
+            code, heavy_allowed = import_time.TARGETS[target]
+            self.assertFalse(heavy_allowed)
+            # Termasuk nltk: tidak ada unduhan data saat impor
+            self.assertEqual(import_time.measure(code, 'Elibrary.settings')['heavy'], [], target)
+
+
+class TokenizerTests(TestCase):
+    def test_batched_counts_match_word_by_word_analysis(self):
+        pages = ['Sejarah e-Book "Nusantara", halaman 12: kerajaan dan KERAJAAN!',
+                 '', 'The history of the kingdoms; sejarah-sejarah lama.', 'pdf page data2024']
+        expected = Counter(word for page in pages for word in tokenizer.words(page))
+        self.assertEqual(tokenizer.count_words(pages), expected)
+        # Batas batch kecil (per halaman) memberi hasil yang sama
+        self.assertEqual(tokenizer.count_words(iter(pages), batch_chars=1), expected)
+
+        self.assertEqual(expected['kerajaan'], 2)
+        self.assertIn('ebook', expected)
+        self.assertIn('sejarahsejarah', expected)
+        self.assertEqual(expected['data'], 1)
+        self.assertFalse({'the', 'page', 'with'} & set(expected))
+
+
+class BenchmarkCorpusTests(TestCase):
+    def test_corpus_is_deterministic(self):
+        tmp = tempfile.mkdtemp(prefix='elibrary-corpus-')
+        self.addCleanup(shutil.rmtree, tmp, True)
+        first = corpus.build_corpus(os.path.join(tmp, 'a'), ['text_heavy', 'scanned'], scale=0.05)
+        second = corpus.build_corpus(os.path.join(tmp, 'b'), ['text_heavy', 'scanned'], scale=0.05)
+        for name in first:
+            with open(first[name], 'rb') as a, open(second[name], 'rb') as b:
+                self.assertEqual(a.read(), b.read(), name)
+
+        document = rendering.open_document(first['text_heavy'])
+        self.assertEqual(len(document), 2)
+        document.close()
+        # Hasil scan tidak punya lapisan teks
+        document = rendering.open_document(first['scanned'])
+        self.assertEqual([page.get_text().strip() for page in document], [''])
+        document.close()
+
+    def test_compare_reports_slowdown(self):
+        from benchmarks import ingestion
+
+        def report(seconds):
+            return {'results': [{'document': 'text_heavy', 'stage': stage, 'seconds': value,
+                                 'peak_rss_mb': 50.0} for stage, value in seconds.items()]}
+
+        before = report({'ingest_pdf': 1.0, 'extract_text_from_pdf': 1.0})
+        after = report({'ingest_pdf': 1.1, 'extract_text_from_pdf': 1.5})
+        with contextlib.redirect_stdout(io.StringIO()):
+            problems = ingestion.compare(after, before, max_slowdown=1.25)
+        self.assertEqual(len(problems), 1)
+        self.assertIn('extract_text_from_pdf', problems[0])
+
+
+class CatalogCacheTests(LibraryTestCase):
+    def titles(self, url='/library/'):
+        return [book.title for book in self.client.get(url).context['books']]
+
+    def make_books(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [Book.objects.create(title=f'Buku {index}', genre='fiksi', uploader=self.user)
+                    for index in range(count)]
+
+    def check_cached_until_books_change(self, url):
+        books = self.make_books(3)
+        self.assertEqual(self.titles(url), ['Buku 2', 'Buku 1', 'Buku 0'])
+
+        # update() tanpa signal: halaman masih dari cache
+        Book.objects.filter(pk=books[2].pk).update(title='Diam-diam')
+        self.assertEqual(self.titles(url), ['Buku 2', 'Buku 1', 'Buku 0'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            books[1].title = 'Diubah'
+            books[1].save()
+        self.assertEqual(self.titles(url), ['Diam-diam', 'Diubah', 'Buku 0'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            books[0].delete()
+        self.assertEqual(self.titles(url), ['Diam-diam', 'Diubah'])
+
+    def test_keyset_page_is_cached_until_books_change(self):
+        self.check_cached_until_books_change('/library/')
+
+    @override_settings(LIBRARY_BOOK_LIST_PAGINATION='page')
+    def test_numbered_page_is_cached_until_books_change(self):
+        self.check_cached_until_books_change('/library/?page=1')
+
+    @override_settings(LIBRARY_BOOK_LIST_PAGINATION='page')
+    def test_cached_page_skips_list_and_count_queries(self):
+        self.make_books(7)
+        self.client.get('/library/?page=2&genre=fiksi')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/library/?genre=fiksi&page=2')
+        self.assertEqual([book.title for book in response.context['books']], ['Buku 1', 'Buku 0'])
+        self.assertEqual(response.context['page_obj'].paginator.count, 7)
+        self.assertFalse([query['sql'] for query in queries.captured_queries
+                          if 'FROM "library_book"' in query['sql']])
+
+    def test_favorite_status_is_per_user(self):
+        book = self.make_books(1)[0]
+        Favorite.objects.create(user=self.user, book=book)
+        self.assertEqual(self.client.get('/library/').context['user_favorites'], [book.pk])
+
+        other = User.objects.create_user('tamu', 'tamu@example.com', 'Rahasia123!')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get('/library/').context['user_favorites'], [])
+
+
+class KeysetPaginationTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.books = [Book.objects.create(title=f'Buku {index}', genre='fiksi' if index % 3 else 'komik',
+                                          uploader=self.user) for index in range(12)]
+        # Waktu upload yang sama: urutan ditentukan id
+        same_time = timezone.now() - timedelta(days=1)
+        Book.objects.filter(pk__in=[book.pk for book in self.books[4:8]]).update(created_at=same_time)
+
+    def expected(self, **filters):
+        return list(Book.objects.filter(**filters).order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def walk(self, queryset, per_page):
+        seen, cursor = [], None
+        while True:
+            page_obj = pagination.keyset_page(queryset, cursor, per_page)
+            seen.append([book.pk for book in page_obj])
+            if not page_obj.has_next():
+                return seen
+            cursor = page_obj.next_cursor
+
+    def test_next_cursors_visit_every_book_once(self):
+        pages = self.walk(Book.objects.all(), 5)
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), self.expected())
+
+        pages = self.walk(Book.objects.filter(genre='fiksi'), 3)
+        self.assertEqual(sum(pages, []), self.expected(genre='fiksi'))
+
+    def test_previous_cursor_returns_the_previous_page(self):
+        first = pagination.keyset_page(Book.objects.all(), None, 5)
+        second = pagination.keyset_page(Book.objects.all(), first.next_cursor, 5)
+        self.assertTrue(second.has_previous())
+        back = pagination.keyset_page(Book.objects.all(), second.previous_cursor, 5)
+        self.assertEqual([book.pk for book in back], [book.pk for book in first])
+        self.assertFalse(back.has_previous())
+        self.assertIsNone(back.previous_cursor)
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        cursor = pagination.keyset_page(Book.objects.all(), None, 5).next_cursor
+        self.assertIsNone(pagination.decode_cursor(cursor[:-2] + 'xx'))
+        response = self.client.get('/library/', {'cursor': cursor[:-2] + 'xx'})
+        self.assertEqual([book.pk for book in response.context['books']], self.expected()[:5])
+
+    def test_book_list_follows_cursor_links(self):
+        response = self.client.get('/library/')
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.is_keyset)
+        self.assertContains(response, 'cursor=')
+        response = self.client.get('/library/', {'cursor': page_obj.next_cursor})
+        self.assertEqual([book.pk for book in response.context['books']], self.expected()[5:10])
+
+        # Tanpa COUNT(*) atau OFFSET
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/library/', {'cursor': response.context['page_obj'].next_cursor,
+                                          'favorite': '1'})
+        book_queries = [query['sql'] for query in queries.captured_queries
+                        if 'FROM "library_book"' in query['sql']]
+        self.assertTrue(book_queries)
+        self.assertFalse([sql for sql in book_queries if 'COUNT(' in sql or 'OFFSET' in sql])
+
+
+class FavoriteToggleTests(LibraryTestCase):
+    def toggle(self, pk):
+        return self.client.post(f'/library/{pk}/toggle-favorite/')
+
+    def test_toggle_updates_favorite_and_counters(self):
+        book = Book.objects.create(title='Disukai', genre='fiksi', uploader=self.user)
+        data = self.toggle(book.pk).json()
+        self.assertEqual((data['is_favorited'], data['favorites_count']), (True, 1))
+        self.assertTrue(Favorite.objects.filter(user=self.user, book=book).exists())
+        self.assertEqual(Book.objects.get(pk=book.pk).favorites_count, 1)
+
+        data = self.toggle(book.pk).json()
+        self.assertEqual((data['is_favorited'], data['favorites_count']), (False, 0))
+        self.assertFalse(Favorite.objects.exists())
+        self.assertEqual(Book.objects.get(pk=book.pk).favorites_count, 0)
+        # Hanya counter user: 'pembaca' dibuat di setUp sebelum on_commit dijalankan
+        self.assertEqual(stats.reconcile(dry_run=True), [('users', 0, 1)])
+
+    def test_missing_book_is_404_without_favorite(self):
+        self.assertEqual(self.toggle(999).status_code, 404)
+        self.assertFalse(Favorite.objects.exists())
+        self.assertEqual(stats.user_stats(self.user.pk)['favorites'], 0)
+        self.assertEqual(self.client.get('/library/999/toggle-favorite/').status_code, 405)
+
+    def test_deleting_book_or_user_keeps_counters_consistent(self):
+        book = Book.objects.create(title='Satu', genre='fiksi', uploader=self.user)
+        other_book = Book.objects.create(title='Dua', genre='fiksi', uploader=self.user)
+        self.toggle(book.pk)
+        self.toggle(other_book.pk)
+        other = User.objects.create_user('tamu', 'tamu@example.com', 'Rahasia123!')
+        self.client.force_login(other)
+        self.toggle(other_book.pk)
+        self.assertEqual(Book.objects.get(pk=other_book.pk).favorites_count, 2)
+
+        book.delete()
+        self.assertEqual(stats.user_stats(self.user.pk)['favorites'], 1)
+        other.delete()
+        self.assertEqual(Book.objects.get(pk=other_book.pk).favorites_count, 1)
+        self.assertEqual(stats.reconcile_book_favorites(dry_run=True), [])
+
+
+class MediaServeTests(LibraryTestCase):
+    content = bytes(range(256)) * 4
+
+    def write_media(self, relative_path, content=None):
+        path = os.path.join(self.tmp, 'media', relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(self.content if content is None else content)
+        return path
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_etag_revalidation_and_cache_control(self):
+        self.write_media('books/buku.pdf')
+        response = self.client.get('/media/books/buku.pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('max-age=3600', response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+        self.assertEqual(self.client.get('/media/books/buku.pdf',
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/media/books/buku.pdf',
+                                         HTTP_IF_NONE_MATCH='"lain"').status_code, 200)
+
+        self.write_media('book_images/1_abcd1234/page_001.webp', b'RIFF')
+        response = self.client.get('/media/book_images/1_abcd1234/page_001.webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_byte_ranges(self):
+        self.write_media('books/buku.pdf')
+        response = self.client.get('/media/books/buku.pdf', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(self.body(response), self.content[10:20])
+
+        response = self.client.get('/media/books/buku.pdf', HTTP_RANGE='bytes=-5')
+        self.assertEqual(self.body(response), self.content[-5:])
+        # Akhir range melewati ukuran file dipotong ke byte terakhir
+        response = self.client.get('/media/books/buku.pdf', HTTP_RANGE='bytes=1020-5000')
+        self.assertEqual(response['Content-Range'], f'bytes 1020-1023/{len(self.content)}')
+        self.assertEqual(self.body(response), self.content[1020:])
+        # Awal range di luar file tidak bisa dipenuhi
+        response = self.client.get('/media/books/buku.pdf', HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+        # If-Range dengan ETag lama: file sudah berubah, kirim seluruhnya
+        response = self.client.get('/media/books/buku.pdf', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"lama"')
+        self.assertEqual(response.status_code, 200)
+        self.body(response)
+
+    def test_hidden_unknown_and_outside_paths_are_not_served(self):
+        self.write_media('book_images/1_abcd1234/.progress.json', b'{}')
+        self.write_media('book_images/1_abcd1234/page_001.webp.tmp', b'x')
+        self.write_media('rahasia/data.txt', b'x')
+        with open(os.path.join(self.tmp, 'luar.txt'), 'w') as f:
+            f.write('x')
+        os.makedirs(os.path.join(self.tmp, 'media', 'covers'))
+        os.symlink(os.path.join(self.tmp, 'luar.txt'), os.path.join(self.tmp, 'media', 'covers', 'luar.txt'))
+        for path in ('book_images/1_abcd1234/.progress.json', 'book_images/1_abcd1234/page_001.webp.tmp',
+                     'rahasia/data.txt', 'covers/luar.txt', 'books/tidak-ada.pdf', 'books/'):
+            self.assertEqual(self.client.get(f'/media/{path}').status_code, 404, path)
+
+    @override_settings(LIBRARY_MEDIA_ACCESS={'books/': 'login', 'profiles/': 'staff'})
+    def test_access_rules_per_folder(self):
+        self.write_media('books/buku.pdf')
+        self.write_media('profiles/lambat.prof', b'x')
+        self.assertEqual(self.client.get('/media/profiles/lambat.prof').status_code, 403)
+        response = self.client.get('/media/books/buku.pdf')
+        self.assertIn('private', response['Cache-Control'])
+        self.body(response)
+
+        self.client.logout()
+        self.assertEqual(self.client.get('/media/books/buku.pdf').status_code, 302)
+
+    @override_settings(LIBRARY_MEDIA_SENDFILE='x-accel-redirect')
+    def test_sendfile_leaves_body_to_web_server(self):
+        with override_settings(LIBRARY_MEDIA_ACCEL_LOCATIONS={os.path.join(self.tmp, 'media'): '/internal/'}):
+            self.write_media('books/buku lama.pdf')
+            response = self.client.get('/media/books/buku lama.pdf')
+        self.assertEqual(response['X-Accel-Redirect'], '/internal/books/buku%20lama.pdf')
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(LIBRARY_PRERENDER_PAGES=2)
+class PageManifestTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.book = self.upload_book(self.make_pdf(pages=3))
+        self.url = f'/library/{self.book.pk}/pages/manifest.json'
+
+    def test_manifest_lists_every_page(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        run_worker(once=True)
+        self.book.refresh_from_db()
+
+        manifest = self.client.get(self.url).json()
+        self.assertEqual((manifest['book'], manifest['page_count']), (self.book.pk, 3))
+        self.assertEqual([page['number'] for page in manifest['pages']], [1, 2, 3])
+        first, _, last = manifest['pages']
+        # Halaman yang sudah dirender dilayani sebagai file statis, sisanya lewat endpoint
+        self.assertTrue(first['src'].startswith(f'/media/{self.book.images_folder}/page_001'))
+        self.assertEqual(first['srcset'].count('w, ') + 1, len(rendering.image_options().widths))
+        self.assertEqual(last['src'], f'/library/{self.book.pk}/pages/3/')
+        self.assertIn(f'/library/{self.book.pk}/pages/3/?w=480 480w', last['srcset'])
+        # Ukuran piksel gambar penuh: halaman A4 (595 x 842 pt) dengan PAGE_ZOOM
+        self.assertEqual((first['width'], first['height']), (round(595 * rendering.PAGE_ZOOM),
+                                                             round(842 * rendering.PAGE_ZOOM)))
+        self.assertEqual(last['tiles'], f'/library/{self.book.pk}/pages/3/tiles.dzi')
+
+    def test_etag_changes_with_images_folder(self):
+        run_worker(once=True)
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Book.objects.filter(pk=self.book.pk).update(images_folder='book_images/baru')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['pages'][0]['src'], f'/library/{self.book.pk}/pages/1/')
+
+    def test_preview_preloads_image_and_manifest(self):
+        run_worker(once=True)
+        response = self.client.get(f'/library/{self.book.pk}/preview/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'<{self.url}>; rel=preload; as=fetch', response['Link'])
+        self.assertIn('rel=preload; as=image', response['Link'])
+
+class TileTests(LibraryTestCase):
+    def test_pyramid_geometry(self):
+        options = tiles.TileOptions(size=256, overlap=1, zoom=4.0, fmt='png', quality=None)
+        self.assertEqual(tiles.max_level(600, 300), 10)
+        self.assertEqual(tiles.level_size(600, 300, 10), (600, 300))
+        self.assertEqual(tiles.level_size(600, 300, 9), (300, 150))
+        self.assertEqual(tiles.level_size(600, 300, 0), (1, 1))
+        # Tumpang tindih hanya di sisi dalam, tile tepi dipotong ukuran gambar
+        self.assertEqual(tiles.tile_box(600, 300, 10, 0, 0, options), (0, 0, 257, 257))
+        self.assertEqual(tiles.tile_box(600, 300, 10, 1, 1, options), (255, 255, 513, 300))
+        self.assertEqual(tiles.tile_box(600, 300, 10, 2, 0, options), (511, 0, 600, 257))
+        self.assertIsNone(tiles.tile_box(600, 300, 10, 3, 0, options))
+        self.assertIsNone(tiles.tile_box(600, 300, 11, 0, 0, options))
+
+    def test_descriptor_and_tiles_are_rendered_once(self):
+        from PIL import Image
+
+        book = self.upload_book(self.make_pdf(pages=2))
+        run_worker(once=True)
+        base = f'/library/{book.pk}/pages/2/tiles'
+        response = self.client.get(f'{base}.dzi')
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        width, height = round(595 * 4), round(842 * 4)
+        descriptor = response.content.decode()
+        self.assertIn(f'<Size Width="{width}" Height="{height}"/>', descriptor)
+        self.assertIn('Overlap="1" TileSize="256"', descriptor)
+        self.assertEqual(self.client.get(f'{base}.dzi', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        ext = tiles.tile_extension(tiles.tile_options())
+        top = tiles.max_level(width, height)
+        with mock.patch.object(page_cache.PageCache, '_render_tile', autospec=True,
+                               side_effect=page_cache.PageCache._render_tile) as rendered:
+            for _ in range(2):
+                response = self.client.get(f'{base}_files/{top}/9_13.{ext}')
+                self.assertEqual(response.status_code, 200)
+                tile = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+            self.assertEqual(rendered.call_count, 1)
+        # Kolom 9 dan baris 13 adalah tile terakhir: lebar sisa + overlap kiri
+        self.assertEqual(tile.size, (width - 9 * 256 + 1, height - 13 * 256 + 1))
+
+        for url in (f'{base}_files/{top}/10_0.{ext}', f'{base}_files/{top + 1}/0_0.{ext}',
+                    f'{base}_files/0/0_0.gif', f'/library/{book.pk}/pages/3/tiles.dzi'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+
+class ContentDedupTests(LibraryTestCase):
+    def test_duplicate_upload_reuses_content_and_is_searchable(self):
+        path = self.make_pdf()
+        first = self.upload_book(path, 'Pertama')
+        run_worker(once=True)
+        first.refresh_from_db()
+
+        second = self.upload_book(path, 'Kedua')
+        job = ProcessingJob.objects.get(book=second)
+        self.assertEqual(job.stage_status.get(ProcessingJob.STAGE_INGEST), ProcessingJob.STATUS_DONE)
+        self.assertEqual(second.images_folder, first.images_folder)
+        self.assertEqual(ContentBlob.objects.get().refcount, 2)
+
+        # Teks isi buku duplikat ikut terindeks walau ingest dilewati
+        self.assertIn(second.pk, search_book_ids('perpustakaan'))
+
+        first.delete()
+        blob = ContentBlob.objects.get()
+        self.assertEqual(blob.refcount, 1)
+        self.assertTrue(os.path.isdir(os.path.join(self.tmp, 'media', blob.images_folder)))
+
+    def test_upload_hash_comes_from_book_upload_handler(self):
+        # Hash dihitung sambil menerima upload, file tidak dibaca ulang
+        with mock.patch('library.uploads.file_digest', side_effect=AssertionError('dibaca ulang')):
+            self.upload_book(self.make_pdf())
+        self.assertEqual(ContentBlob.objects.get().refcount, 1)
+
+        request = self.client.get('/library/').wsgi_request
+        self.assertFalse(any(isinstance(handler, uploads.HashingUploadHandler)
+                             for handler in request.upload_handlers))
+
+    def test_upload_requires_csrf_token(self):
+        client = self.client_class(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        with open(self.make_pdf(), 'rb') as pdf:
+            response = client.post('/library/add/', {'file': pdf, 'title': 'Tanpa Token', 'genre': 'fiksi'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Book.objects.exists())
+
+    def test_duplicate_waits_for_content_being_processed(self):
+        path = self.make_pdf(pages=3)
+        first = self.upload_book(path, 'Pertama')
+        second = self.upload_book(path, 'Kedua')
+        first_job = jobs.claim_next_job('worker-1')
+        self.assertEqual(first_job.book, first)
+        first_job.stage = ProcessingJob.STAGE_INGEST
+        first_job.save()
+
+        # Isi yang sama sedang di-ingest worker lain: job kedua menunggu, tanpa render
+        with mock.patch.object(utils, 'render_page', side_effect=AssertionError('dirender ulang')):
+            run_worker(once=True)
+        second_job = ProcessingJob.objects.get(book=second)
+        self.assertEqual((second_job.status, second_job.attempts), (ProcessingJob.STATUS_PENDING, 0))
+        self.assertGreater(second_job.run_after, timezone.now())
+        self.assertEqual(Book.objects.get(pk=second.pk).processing_status, Book.STATUS_PENDING)
+
+        jobs.run_job(first_job)
+        ProcessingJob.objects.filter(pk=second_job.pk).update(run_after=timezone.now())
+        with mock.patch.object(utils, 'render_page', side_effect=AssertionError('dirender ulang')):
+            run_worker(once=True)
+        second_job.refresh_from_db()
+        self.assertEqual(second_job.status, ProcessingJob.STATUS_DONE)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((second.processing_status, second.images_folder, second.pages),
+                         (Book.STATUS_READY, first.images_folder, 3))
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'media', 'book_images')),
+                         [first.images_folder.split('/')[1]])
+
+    def test_last_reference_deletes_blob_and_files_after_commit(self):
+        book = self.upload_book(self.make_pdf(seed=1), 'Sendiri')
+        run_worker(once=True)
+        blob = ContentBlob.objects.get()
+        files = [os.path.join(self.tmp, 'media', name) for name in (blob.file.name, blob.images_folder)]
+        files.append(text_store.text_path(blob.text_file))
+        self.assertTrue(all(os.path.exists(path) for path in files))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+            self.assertFalse(ContentBlob.objects.exists())
+            # File baru dihapus setelah commit
+            self.assertTrue(all(os.path.exists(path) for path in files))
+        self.assertFalse(any(os.path.exists(path) for path in files))
+
+
+class SearchTests(LibraryTestCase):
+    def catalogue(self):
+        books = [
+            Book.objects.create(title='Sejarah Indonesia Modern', author='Ricklefs', genre='sejarah',
+                                uploader=self.user),
+            Book.objects.create(title='Cerita Rakyat', description='Kumpulan dongeng dari Indonesia',
+                                genre='fiksi', uploader=self.user),
+            Book.objects.create(title='Belajar Python', genre='teknologi', uploader=self.user),
+        ]
+        index_book(books[2], text=body_text(['Contoh program tentang sejarah komputer']))
+        return books
+
+    def check_search(self):
+        history, folk, python = self.catalogue()
+        # Awalan kata, semua kata harus cocok
+        self.assertEqual(search_book_ids('sej indo'), [history.pk])
+        # Judul lebih berbobot daripada deskripsi
+        self.assertEqual(search_book_ids('indonesia'), [history.pk, folk.pk])
+        self.assertEqual(search_book_ids('sejarah'), [history.pk, python.pk])
+        self.assertEqual(search_book_ids('"; DROP'), [])
+        self.assertEqual(search_book_ids('*'), [])
+
+        # Metadata diindeks ulang saat disimpan, teks isi tetap
+        python.title = 'Belajar Rust'
+        python.save()
+        self.assertEqual(search_book_ids('rust komputer'), [python.pk])
+        python.delete()
+        self.assertEqual(search_book_ids('komputer'), [])
+
+    def test_fts_index_ranks_by_field_weight(self):
+        self.assertTrue(search.fts5_available())
+        self.check_search()
+        response = self.client.get('/library/', {'q': 'sejarah indonesia'})
+        self.assertEqual([book.title for book in response.context['books']], ['Sejarah Indonesia Modern'])
+
+    def test_posting_index_fallback(self):
+        with mock.patch.object(search, 'fts5_available', return_value=False):
+            self.check_search()
+
+    def test_body_term_frequency_ranks_books(self):
+        filler = ['halaman', 'buku', 'cerita', 'pagi'] * 30
+        rare = Book.objects.create(title='Satu', genre='fiksi', uploader=self.user)
+        frequent = Book.objects.create(title='Dua', genre='fiksi', uploader=self.user)
+        index_book(rare, text=body_text([' '.join(filler + ['candi'])]))
+        index_book(frequent, text=body_text([' '.join(filler[:-20]), 'candi ' * 20]))
+        self.assertEqual(search_book_ids('candi'), [frequent.pk, rare.pk])
+
+    def test_body_text_is_capped(self):
+        pages = iter(['satu dua tiga', 'empat lima', 'enam'])
+        self.assertEqual(body_text(pages, max_words=4), 'satu dua tiga empat')
+        # Halaman sesudah batas tidak dibaca
+        self.assertEqual(next(pages), 'enam')
+
+    def test_processed_book_text_is_searchable(self):
+        book = self.upload_book(self.make_pdf(pages=2), 'Tanpa Kata Isi')
+        self.assertEqual(search_book_ids('kemerdekaan'), [])
+        run_worker(once=True)
+        self.assertEqual(search_book_ids('kemerdekaan'), [book.pk])
+
+
+class KeywordModelTests(LibraryTestCase):
+    def make_books(self, count):
+        return [Book.objects.create(title=f"Buku {n}", genre='fiksi', uploader=self.user)
+                for n in range(count)]
+
+    def test_words_common_to_the_collection_rank_lower(self):
+        books = self.make_books(3)
+        shared = 'perpustakaan ' * 12
+        keywords.extract_keywords(books[1].pk, [shared + 'python program ' * 3])
+        keywords.extract_keywords(books[2].pk, [shared + 'resep masakan ' * 3])
+        found = keywords.extract_keywords(books[0].pk, [shared, 'candi kerajaan ' * 3], max_keywords=2)
+        self.assertEqual(sorted(found), ['candi', 'kerajaan'])
+        self.assertEqual(sorted(keywords.load_model().keywords_for(books[1].pk, 2)), ['program', 'python'])
+
+        # Buku yang diproses ulang mengganti barisnya, bukan menambah
+        keywords.extract_keywords(books[1].pk, [shared + 'python program ' * 3])
+        self.assertEqual(keywords.load_model().n_docs, 3)
+
+    @override_settings(LIBRARY_KEYWORD_JOURNAL_BATCH=3)
+    def test_updates_are_journaled_and_compacted_in_batches(self):
+        books = self.make_books(3)
+        path = keywords.model_path()
+        keywords.record_book(books[0].pk, {'sejarah': 5, 'umum': 2})
+        keywords.record_book(books[1].pk, {'python': 4, 'umum': 3})
+        # File model belum ditulis, perubahan hanya ada di journal
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(keywords.load_model().n_docs, 2)
+
+        # Proses lain (cache kosong) membaca journal yang sama
+        keywords._cache.clear()
+        self.assertEqual(keywords.record_book(books[2].pk, {'python': 1, 'umum': 1}, 1), ['python'])
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(keywords.journal_path(path)))
+        self.assertEqual(keywords.KeywordModel.load(path).n_docs, 3)
+
+    def test_deleted_book_is_removed_from_model(self):
+        first, second = self.make_books(2)
+        keywords.record_book(first.pk, {'sejarah': 5, 'umum': 2})
+        keywords.record_book(second.pk, {'umum': 3})
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(keywords.load_model().book_ids, [second.pk])
+        # Model yang sudah dimuat proses ini juga tidak lagi menghitung buku itu
+        path = keywords.model_path()
+        with keywords._locked(path):
+            model = keywords._current_model(path)
+        self.assertEqual(model.df[model.vocabulary['sejarah']], 0)
+
+    def test_rerank_dry_run_does_not_write_model(self):
+        first, second = self.make_books(2)
+        keywords.record_book(first.pk, {'sejarah': 5, 'umum': 2})
+        keywords.record_book(second.pk, {'umum': 3})
+        Book.objects.filter(pk=second.pk).delete()
+        path = keywords.model_path()
+
+        call_command('rerank_keywords', '--dry-run', stdout=open(os.devnull, 'w'))
+        self.assertFalse(os.path.exists(path))
+
+        call_command('rerank_keywords', stdout=open(os.devnull, 'w'))
+        self.assertEqual(keywords.KeywordModel.load(path).book_ids, [first.pk])
+        first.refresh_from_db()
+        self.assertEqual(first.keywords, 'sejarah, umum')
+
+
+class RelatedBookTests(LibraryTestCase):
+    def add_book(self, title, counts, content=None):
+        book = Book.objects.create(title=title, genre='fiksi', uploader=self.user,
+                                   keywords=', '.join(list(counts)[:2]), content=content)
+        keywords.record_book(book.pk, counts)
+        return book
+
+    def related(self, book):
+        return list(RelatedBook.objects.filter(book=book).values_list('related__title', flat=True))
+
+    def test_update_book_scores_only_books_sharing_terms(self):
+        blob = ContentBlob.objects.create(sha256='a' * 64, size=1, refcount=2)
+        history = {'sejarah': 6, 'kerajaan': 4, 'candi': 2}
+        original = self.add_book('Asli', history, blob)
+        self.add_book('Salinan', history, blob)
+        self.add_book('Mirip', {'sejarah': 3, 'kerajaan': 5, 'perang': 2})
+        unrelated = self.add_book('Lain', {'python': 5, 'program': 4})
+        similarity.rebuild_all()
+        # Buku dengan isi yang sama tidak saling direkomendasikan
+        self.assertEqual(self.related(original), ['Mirip'])
+
+        newcomer = self.add_book('Baru', {'candi': 5, 'kerajaan': 2})
+        with mock.patch.object(similarity, 'book_vectors', wraps=similarity.book_vectors) as vectors:
+            similarity.update_book(newcomer)
+        # Buku tanpa kata yang sama tidak ikut dihitung
+        rows = vectors.call_args.kwargs['rows']
+        self.assertEqual(len(rows), 4)
+        self.assertNotIn(keywords.load_model().rows[unrelated.pk], rows)
+        self.assertEqual(set(self.related(newcomer)), {'Asli', 'Salinan', 'Mirip'})
+        self.assertIn('Baru', self.related(original))
+        self.assertEqual(self.related(unrelated), [])
+
+    def test_detail_page_reads_precomputed_neighbours(self):
+        history = self.add_book('Sejarah', {'sejarah': 6, 'kerajaan': 4})
+        similar = self.add_book('Kerajaan', {'kerajaan': 5, 'sejarah': 2})
+        self.add_book('Python', {'python': 5, 'program': 4})
+        similarity.rebuild_all()
+
+        with mock.patch.object(similarity, 'book_vectors', side_effect=AssertionError('dihitung saat request')):
+            response = self.client.get(f'/library/{history.pk}/')
+        self.assertEqual(response.context['related_books'], [similar])
+        self.assertContains(response, 'Kerajaan')
+
+
+class MetricsTests(LibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    @override_settings(LIBRARY_METRICS_TOKEN='rahasia')
+    def test_stage_spans_are_exported_to_authorized_scrapers(self):
+        with self.assertRaises(ValueError), metrics.span('uji'):
+            raise ValueError
+        with metrics.span('uji'):
+            pass
+
+        self.assertEqual(self.client.get('/library/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/library/metrics/', HTTP_AUTHORIZATION='Bearer salah').status_code, 403)
+        response = self.client.get('/library/metrics/', HTTP_AUTHORIZATION='Bearer rahasia')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('library_stage_duration_seconds_count{stage="uji"} 2\n', body)
+        self.assertIn('library_stage_duration_seconds_bucket{stage="uji",le="+Inf"} 2\n', body)
+        # Durasi view dicatat middleware, termasuk request yang ditolak
+        self.assertIn('library_view_duration_seconds_count{method="GET",status="4xx",view="metrics"} 2\n', body)
+        self.assertIn('library_failures_total{stage="uji"} 1\n', body)
+
+    def test_decorator_times_each_call_separately(self):
+        @metrics.span('rekursif')
+        def nested(depth):
+            if depth:
+                nested(depth - 1)
+
+        # Masuk luar, masuk dalam, keluar dalam, keluar luar
+        with mock.patch.object(metrics.time, 'perf_counter', side_effect=[0.0, 1.0, 2.0, 5.0]), \
+                mock.patch.object(metrics.registry, 'observe') as observed:
+            nested(1)
+        self.assertEqual([call.args[1] for call in observed.call_args_list], [1.0, 5.0])
+
+    def write_metrics(self, name, jobs):
+        registry = metrics.Registry()
+        registry.increment('library_jobs_total', jobs, status='uji')
+        metrics._write_snapshot(os.path.join(self.tmp, 'metrics', name), registry.snapshot())
+
+    def test_dead_process_files_are_merged_once(self):
+        os.makedirs(os.path.join(self.tmp, 'metrics'))
+        dead = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                              capture_output=True, text=True, check=True)
+        host = metrics._host()
+        self.write_metrics(f"{host}_{dead.stdout.strip()}_aaaa.json", 2)
+        self.write_metrics(f"{dead.stdout.strip()}_bbbb.json", 3)
+        # Proses di host lain tidak bisa diperiksa, filenya dibiarkan
+        self.write_metrics(f"host-lain_{dead.stdout.strip()}_cccc.json", 5)
+
+        key = ('library_jobs_total', (('status', 'uji'),))
+        for _ in range(2):
+            self.assertEqual(metrics.collect().counters[key], 10)
+        directory = os.path.join(self.tmp, 'metrics')
+        self.assertEqual(
+            {name for name in os.listdir(directory) if name.endswith('.json')},
+            {metrics.AGGREGATE_FILE, f"host-lain_{dead.stdout.strip()}_cccc.json",
+             os.path.basename(metrics._process_file(directory))},
+        )
+
+
+@override_settings(LIBRARY_PROFILER_ENABLED=True)
+class ProfilerTests(LibraryTestCase):
+    def profiles(self):
+        directory = os.path.join(self.tmp, 'profiles')
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_server_timing_reports_queries(self):
+        response = self.client.get('/library/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries", sql1;dur=')
+        # Teks SQL hanya untuk staff
+        self.assertNotIn('SELECT', timing)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertIn('desc="SELECT', self.client.get('/library/')['Server-Timing'])
+
+    def test_profile_header_is_honoured_for_staff_only(self):
+        self.client.get('/library/', HTTP_X_PROFILE='1')
+        self.assertEqual(self.profiles(), [])
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get('/library/', HTTP_X_PROFILE='1')
+        names = self.profiles()
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names[0].endswith('.prof'))
+
+    @override_settings(LIBRARY_PROFILER_SAMPLE_RATE=1.0, LIBRARY_PROFILER_MAX_FILES=2)
+    def test_sampled_profiles_are_pruned(self):
+        for _ in range(4):
+            self.client.get('/library/')
+        self.assertEqual(len(self.profiles()), 2)
+
+    @override_settings(LIBRARY_PROFILER_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get('/library/'))
+
+
+class StatCounterTests(LibraryTestCase):
+    def test_counters_follow_books_and_users(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = User.objects.create_user('penulis', 'penulis@example.com', 'Rahasia123!')
+        book = Book.objects.create(title='Satu', genre='fiksi', uploader=other)
+        Book.objects.create(title='Dua', genre='komik', uploader=self.user, images_folder='book_images/x')
+        book.genre = 'komik'
+        book.save(update_fields=['genre'])
+        Favorite.objects.create(user=other, book=book)
+        Book.objects.filter(pk=book.pk).update(favorites_count=1)
+        StatCounter.objects.create(key=stats.user_key(other.pk, 'favorites'), value=1)
+
+        self.assertEqual(stats.library_stats(), {'total_books': 2, 'total_users': 1,
+                                                 'processed_books': 1, 'total_genres': 1})
+        self.assertEqual(stats.user_stats(self.user.pk), {'books': 1, 'processed_books': 1, 'favorites': 0})
+        # 'pembaca' dibuat di setUp sebelum on_commit dijalankan
+        self.assertEqual(stats.reconcile(dry_run=True), [('users', 1, 2)])
+
+        book.delete()
+        stats.reconcile()
+        self.assertEqual(stats.reconcile(dry_run=True), [])
+        self.assertEqual(stats.user_stats(other.pk), {'books': 0, 'processed_books': 0, 'favorites': 0})
+
+    def test_counter_failure_rolls_back_book(self):
+        with mock.patch.object(stats, 'record_book_change', side_effect=RuntimeError('counter')):
+            with self.assertRaises(RuntimeError):
+                Book.objects.create(title='Gagal', genre='fiksi', uploader=self.user)
+        self.assertFalse(Book.objects.filter(title='Gagal').exists())
+
+    def test_migrations_fill_counters_from_existing_data(self):
+        from django.apps import apps
+
+        book = Book.objects.create(title='Satu', genre='fiksi', uploader=self.user, images_folder='book_images/x')
+        Favorite.objects.create(user=self.user, book=book)
+        StatCounter.objects.all().delete()
+        importlib.import_module('library.migrations.0008_stat_counters').fill_counters(apps, None)
+        importlib.import_module('library.migrations.0009_book_favorites_count').fill_counters(apps, None)
+        self.assertEqual(stats.reconcile(dry_run=True), [])
+
+
+@override_settings(LIBRARY_JOB_RETRY_DELAY=0)
+class IngestRetryTests(LibraryTestCase):
+    def legacy_book(self):
+        # Buku lama tanpa ContentBlob, diproses lewat jalur per buku
+        books_dir = os.path.join(self.tmp, 'media', 'books')
+        os.makedirs(books_dir)
+        shutil.copy(self.make_pdf(pages=3), os.path.join(books_dir, 'lama.pdf'))
+        return Book.objects.create(title='Lama', genre='fiksi', uploader=self.user, file='books/lama.pdf')
+
+    def test_retry_reuses_cover_from_failed_attempt(self):
+        book = self.legacy_book()
+        from .jobs import enqueue_book_processing
+
+        job = enqueue_book_processing(book)
+        with mock.patch('library.jobs.index_book', side_effect=[RuntimeError('indeks terkunci'), None]):
+            run_worker(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 1)
+
+        book.refresh_from_db()
+        covers = os.listdir(os.path.join(self.tmp, 'media', 'covers'))
+        self.assertEqual(['covers/' + name for name in covers], [book.cover.name])
+        self.assertEqual(job.options['cover_file'], book.cover.name)
+
+    @override_settings(LIBRARY_PRERENDER_PAGES=None, LIBRARY_RENDER_CHECKPOINT_PAGES=4)
+    def test_crashed_render_resumes_from_checkpoint(self):
+        rendered = []
+        save_page_image = utils.save_page_image
+
+        def crash_on_page_7(pix, images_dir, page_num, options=rendering.LEGACY_IMAGE_OPTIONS):
+            if page_num == 7 and not rendered.count(7):
+                rendered.append(7)
+                raise RuntimeError('proses mati')
+            rendered.append(page_num)
+            return save_page_image(pix, images_dir, page_num, options)
+
+        book = self.upload_book(self.make_pdf(pages=10))
+        with mock.patch.object(utils, 'save_page_image', side_effect=crash_on_page_7):
+            # Tanpa jeda retry, job yang gagal langsung diambil lagi oleh worker yang sama
+            run_worker(once=True)
+        job = ProcessingJob.objects.get(book=book)
+        self.assertEqual((job.status, job.attempts), (ProcessingJob.STATUS_DONE, 1))
+        # Checkpoint terakhir setelah halaman 4: hanya halaman 5 dst. yang dirender lagi
+        self.assertEqual(rendered, [1, 2, 3, 4, 5, 6, 7, 5, 6, 7, 8, 9, 10])
+        folder = job.options['images_folder']
+        progress = checkpoint.ConversionProgress(os.path.join(self.tmp, 'media', folder))
+        self.assertEqual(progress.current(), list(range(1, 11)))
+        book.refresh_from_db()
+        self.assertEqual((book.processing_status, book.images_folder, book.pages),
+                         (Book.STATUS_READY, folder, 10))
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'media', 'book_images')), [folder.split('/')[1]])
+
+        # Proses ulang buku yang sudah lengkap tidak merender apa pun
+        with mock.patch.object(utils, 'render_page', side_effect=AssertionError('dirender ulang')):
+            self.client.post(f'/library/{book.pk}/reprocess/')
+            run_worker(once=True)
+        self.assertEqual(ProcessingJob.objects.filter(book=book).latest('pk').status, ProcessingJob.STATUS_DONE)
+        book.refresh_from_db()
+        self.assertEqual((book.processing_status, book.images_folder), (Book.STATUS_READY, folder))
+
+    @override_settings(LIBRARY_PRERENDER_PAGES=None, LIBRARY_RENDER_CHECKPOINT_PAGES=4)
+    def test_resume_after_partially_written_page(self):
+        save_image = rendering.save_image
+        seen_at_crash = []
+
+        def die_while_writing_page_7(image, path, fmt, quality=None):
+            if os.path.basename(path).startswith('.page_007.') and not seen_at_crash:
+                # Proses mati setelah sebagian isi gambar tertulis
+                with open(path, 'wb') as f:
+                    f.write(b'RIFF setengah')
+                seen_at_crash.extend(sorted(os.listdir(os.path.dirname(path))))
+                raise RuntimeError('proses mati')
+            return save_image(image, path, fmt, quality)
+
+        book = self.upload_book(self.make_pdf(pages=10))
+        with mock.patch.object(rendering, 'save_image', side_effect=die_while_writing_page_7):
+            run_worker(once=True)
+        job = ProcessingJob.objects.get(book=book)
+        self.assertEqual((job.status, job.attempts), (ProcessingJob.STATUS_DONE, 1))
+
+        # Saat mati, halaman 7 hanya ada dengan nama sementara (variannya sudah utuh)
+        names_at_crash = [name for name in seen_at_crash if not rendering.is_partial_name(name)]
+        self.assertNotIn(rendering.page_image_name(7, fmt='webp'), names_at_crash)
+        self.assertIn(rendering.page_image_name(7, 480, 'webp'), names_at_crash)
+
+        images_dir = os.path.join(self.tmp, 'media', job.options['images_folder'])
+        self.assertEqual(checkpoint.ConversionProgress(images_dir).current(), list(range(1, 11)))
+        self.assertEqual([name for name in os.listdir(images_dir) if rendering.is_partial_name(name)], [])
+        from PIL import Image
+
+        with Image.open(os.path.join(images_dir, rendering.page_image_name(7, fmt='webp'))) as page:
+            page.verify()
+
+    @override_settings(LIBRARY_PRERENDER_PAGES=None)
+    def test_reprocess_with_new_settings_uses_new_folder(self):
+        book = self.upload_book(self.make_pdf(pages=3))
+        run_worker(once=True)
+        book.refresh_from_db()
+        old_folder = book.images_folder
+
+        with override_settings(LIBRARY_PAGE_WIDTHS=[200]):
+            self.client.post(f'/library/{book.pk}/reprocess/')
+            run_worker(once=True)
+        book.refresh_from_db()
+        # Gambar lama di-cache browser selamanya (immutable), jadi tidak ditimpa
+        self.assertNotEqual(book.images_folder, old_folder)
+        self.assertEqual(book.content.images_folder, book.images_folder)
+        self.assertFalse(os.path.isdir(os.path.join(self.tmp, 'media', old_folder)))
+        names = os.listdir(os.path.join(self.tmp, 'media', book.images_folder))
+        self.assertIn(rendering.page_image_name(3, 200, rendering.image_options().fmt), names)
+
+@override_settings(LIBRARY_UPLOAD_CHUNK_SIZE=4 * 1024)
+class ChunkedUploadTests(LibraryTestCase):
+    def start_session(self, data, **fields):
+        response = self.client.post('/library/uploads/', {
+            'title': 'Buku Besar', 'genre': 'fiksi', 'filename': 'besar.pdf',
+            'size': len(data), **fields,
+        })
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def put_chunk(self, session, index, body, **headers):
+        return self.client.put(f"{session['url']}chunks/{index}/", body,
+                               content_type='application/octet-stream', **headers)
+
+    def chunk(self, session, data, index):
+        size = session['chunk_size']
+        return data[index * size:(index + 1) * size]
+
+    def test_chunks_in_any_order_create_book_with_user_cover(self):
+        with open(self.make_pdf(pages=4, words_per_page=400), 'rb') as pdf:
+            data = pdf.read()
+        session = self.start_session(data, cover=self.make_image())
+        self.assertGreater(session['chunk_count'], 1)
+
+        # Panjang potongan salah dan hash tidak cocok ditolak
+        self.assertEqual(self.put_chunk(session, 0, b'x').status_code, 400)
+        self.assertEqual(self.put_chunk(session, 0, self.chunk(session, data, 0),
+                                        HTTP_X_CHUNK_SHA256='0' * 64).status_code, 400)
+
+        for index in reversed(range(session['chunk_count'])):
+            body = self.chunk(session, data, index)
+            response = self.put_chunk(session, index, body,
+                                      HTTP_X_CHUNK_SHA256=hashlib.sha256(body).hexdigest())
+            self.assertEqual(response.status_code, 200, response.content)
+
+        self.assertTrue(response.json()['book_url'])
+        upload = UploadSession.objects.get()
+        self.assertEqual(upload.status, UploadSession.STATUS_COMPLETE)
+        self.assertEqual(upload.sha256, hashlib.sha256(data).hexdigest())
+        book = upload.book
+        with open(book.file.path, 'rb') as stored:
+            self.assertEqual(stored.read(), data)
+        self.assertTrue(book.cover.name.startswith('covers/cover'))
+        self.assertTrue(os.path.exists(book.cover.path))
+        self.assertEqual(ProcessingJob.objects.get(book=book).options['cover'], False)
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'uploads')), [])
+
+    def test_failed_assembly_restores_part_file(self):
+        with open(self.make_pdf(pages=4, words_per_page=400), 'rb') as pdf:
+            data = pdf.read()
+        session = self.start_session(data)
+        last = session['chunk_count'] - 1
+        for index in range(last):
+            self.put_chunk(session, index, self.chunk(session, data, index))
+
+        # Gagal setelah file sementara dipindah ke storage
+        with mock.patch('library.jobs.enqueue_book_processing', side_effect=RuntimeError('antrean mati')):
+            response = self.put_chunk(session, last, self.chunk(session, data, last))
+        # Klien mengirim ulang potongan terakhir selama sesi kembali terbuka
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['success'], False)
+        self.assertEqual(response.json()['status'], UploadSession.STATUS_OPEN)
+        self.assertEqual(response.json()['received'], list(range(last + 1)))
+        upload = UploadSession.objects.get()
+        self.assertEqual(upload.status, UploadSession.STATUS_OPEN)
+        self.assertFalse(Book.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'media', 'books')), [])
+
+        response = self.put_chunk(session, last, self.chunk(session, data, last))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.json()['book_url'])
+        with open(Book.objects.get().file.path, 'rb') as stored:
+            self.assertEqual(stored.read(), data)
+
+    def test_unrecoverable_assembly_failure_is_server_error(self):
+        data = b'%PDF-' + b'x' * 5000
+        session = self.start_session(data)
+        with mock.patch('library.chunked_uploads._file_digest', side_effect=OSError('disk rusak')), \
+                mock.patch('library.chunked_uploads._restore_part', return_value=False):
+            for index in range(session['chunk_count']):
+                response = self.put_chunk(session, index, self.chunk(session, data, index))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['status'], UploadSession.STATUS_FAILED)
+        self.assertIn('mulai upload baru', response.json()['message'])
+
+    @override_settings(LIBRARY_UPLOAD_MAX_OPEN_SESSIONS=2)
+    def test_open_sessions_per_user_are_limited(self):
+        data = b'%PDF-' + b'x' * 5000
+        first = self.start_session(data)
+        self.start_session(data)
+        response = self.client.post('/library/uploads/', {
+            'title': 'Buku Ketiga', 'genre': 'fiksi', 'filename': 'ketiga.pdf', 'size': len(data),
+        })
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(UploadSession.objects.count(), 2)
+
+        # Sesi yang kedaluwarsa dihapus saat user memulai sesi baru
+        UploadSession.objects.filter(pk=first['id']).update(
+            updated_at=timezone.now() - timedelta(days=2))
+        self.start_session(data)
+        self.assertFalse(UploadSession.objects.filter(pk=first['id']).exists())
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'uploads', f"{first['id']}.part")))
+        self.assertEqual(UploadSession.objects.count(), 2)
+
+    def test_missing_part_file_is_client_error(self):
+        data = b'%PDF-' + b'x' * 5000
+        session = self.start_session(data)
+        os.remove(os.path.join(self.tmp, 'uploads', f"{session['id']}.part"))
+        response = self.put_chunk(session, 0, self.chunk(session, data, 0))
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,212 @@
+"""
+Penyimpanan teks hasil ekstraksi per halaman.
+
+Teks setiap buku disimpan sekali saat ingest dalam file sidecar
+gzip JSON-lines di LIBRARY_TEXT_ROOT:
+    baris pertama : header {"version": 1, "pages": N}
+    N baris       : teks satu halaman (string JSON), urut dari halaman 1
+    baris terakhir: {"fallback": "..."} teks pengganti dari metadata/nama file
+Analisis kata kunci dan indeks pencarian membaca file ini,
+bukan mem-parsing PDF lagi.
+"""
+import gzip
+import json
+import os
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from . import metrics
+
+FORMAT_VERSION = 1
+
+# Batas minimal teks asli sebelum teks pengganti (metadata/nama file) dipakai
+MIN_TEXT_LENGTH = 50
+
+
+def text_root():
+    return getattr(settings, 'LIBRARY_TEXT_ROOT', os.path.join(settings.BASE_DIR, 'library_data', 'text'))
+
+
+def text_path(text_file):
+    return os.path.join(text_root(), text_file)
+
+
+class PageTextWriter:
+    """
+    Tulis teks halaman satu per satu ke file sidecar baru.
+    File ditulis ke nama sementara dan baru di-rename saat close(),
+    jadi pembaca tidak pernah melihat file setengah jadi.
+
+        with PageTextWriter(book.id, page_count) as writer:
+            writer.write_page(text)
+        book.text_file = writer.text_file
+    """
+
+    def __init__(self, book_id, page_count):
+        self.text_file = f"{book_id}_{uuid.uuid4().hex[:8]}.jsonl.gz"
+        self.path = text_path(self.text_file)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._tmp_path = f"{self.path}.tmp"
+        self._handle = gzip.open(self._tmp_path, 'wt', encoding='utf-8', compresslevel=6)
+        self._write_line({'version': FORMAT_VERSION, 'pages': page_count})
+        self.page_count = page_count
+        self.written = 0
+        # Teks pengganti (metadata/nama file) untuk PDF yang hampir tanpa teks
+        self.fallback = ""
+
+    def _write_line(self, value):
+        self._handle.write(json.dumps(value, ensure_ascii=False))
+        self._handle.write("\n")
+
+    def write_page(self, text):
+        self._write_line(text or "")
+        self.written += 1
+
+    def close(self):
+        # Halaman yang tidak ditulis dianggap kosong agar jumlah baris sesuai header
+        while self.written < self.page_count:
+            self.write_page("")
+        self._write_line({'fallback': self.fallback})
+        self._handle.close()
+        os.replace(self._tmp_path, self.path)
+        metrics.increment('library_bytes_written_total', os.path.getsize(self.path), kind='text')
+        return self.text_file
+
+    def abort(self):
+        self._handle.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def iter_pages(text_file):
+    """Generator teks per halaman, hanya satu halaman di memori"""
+    with gzip.open(text_path(text_file), 'rt', encoding='utf-8') as handle:
+        header = json.loads(handle.readline())
+        for _ in range(header['pages']):
+            yield json.loads(handle.readline())
+
+
+def read_fallback(text_file):
+    """Teks pengganti yang disimpan di baris terakhir sidecar"""
+    fallback = ""
+    with gzip.open(text_path(text_file), 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            fallback = line
+    try:
+        return json.loads(fallback).get('fallback', "")
+    except (ValueError, AttributeError):
+        return ""
+
+
+def read_page(text_file, page_num):
+    """Teks satu halaman (mulai 1), string kosong jika tidak ada"""
+    for number, text in enumerate(iter_pages(text_file), start=1):
+        if number == page_num:
+            return text
+    return ""
+
+
+def iter_text(text_file):
+    """
+    Generator teks per halaman untuk analisis. Jika teks asli terlalu
+    sedikit (PDF hasil scan), teks pengganti dari metadata/nama file
+    ditambahkan sebagai halaman terakhir.
+    """
+    chars = 0
+    for page in iter_pages(text_file):
+        chars += len(page.strip())
+        yield page
+    if chars < MIN_TEXT_LENGTH:
+        fallback = read_fallback(text_file)
+        if fallback:
+            yield fallback
+
+
+def delete_text(text_file):
+    if not text_file:
+        return
+    path = text_path(text_file)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def has_text(book):
+    return bool(book.text_file) and os.path.exists(text_path(book.text_file))
+
+
+def attach_text_file(book, text_file):
+    """Simpan sidecar baru ke buku tanpa memicu signal, lalu hapus sidecar lama"""
+    from .models import Book
+
+    old_text_file = book.text_file
+    Book.objects.filter(pk=book.pk).update(text_file=text_file)
+    book.text_file = text_file
+    if old_text_file and old_text_file != text_file:
+        delete_text(old_text_file)
+
+
+def attach_blob_text_file(book, text_file):
+    """
+    Simpan sidecar baru sebagai teks ContentBlob buku, sehingga ikut
+    dipakai semua buku dengan isi sama dan dihapus bersama blob. Jika
+    proses lain lebih dulu menyimpan teks blob, sidecar ini dibuang.
+    """
+    from .models import Book, ContentBlob
+
+    blob = book.content
+    old_text_file = blob.text_file
+    with transaction.atomic():
+        stored = ContentBlob.objects.filter(pk=blob.pk, text_file=old_text_file).update(text_file=text_file)
+        if stored:
+            Book.objects.filter(content=blob).update(text_file=text_file)
+    if stored:
+        blob.text_file = text_file
+        if old_text_file and old_text_file != text_file:
+            delete_text(old_text_file)
+    else:
+        delete_text(text_file)
+        blob.refresh_from_db(fields=['text_file'])
+        text_file = blob.text_file
+    # Sidecar per buku dari versi sebelumnya yang tidak dipakai lagi
+    if book.text_file and book.text_file not in (text_file, old_text_file):
+        delete_text(book.text_file)
+    book.text_file = text_file
+
+
+def ensure_text(book):
+    """
+    Pastikan buku punya sidecar teks. Buku yang diproses sebelum teks
+    disimpan saat ingest diekstrak sekali dari PDF lalu disimpan; untuk
+    buku dengan ContentBlob sidecar-nya milik blob (nama berawalan hash).
+    Returns: nama file sidecar
+    """
+    if not has_text(book):
+        from .utils import store_pdf_text
+
+        if book.content_id:
+            from .content import asset_key
+
+            attach_blob_text_file(book, store_pdf_text(book.file, asset_key(book.content)))
+        else:
+            attach_text_file(book, store_pdf_text(book.file, book.pk))
+    return book.text_file
+
+
+def iter_book_text(book):
+    """
+    Teks buku per halaman untuk analisis kata kunci dan indeks pencarian.
+    Hanya satu halaman yang ada di memori pada satu waktu.
+    """
+    return iter_text(ensure_text(book))
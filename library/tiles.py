@@ -0,0 +1,115 @@
+"""
+Piramida tile DeepZoom untuk memperbesar halaman buku.
+
+Gambar halaman biasa dirender dengan zoom 2 (PAGE_ZOOM) sebagai satu
+bitmap, terlalu besar untuk layar kecil dan masih buram saat diperbesar.
+Untuk halaman yang diperbesar di pembaca, halaman dibagi menjadi level
+DeepZoom: level tertinggi berukuran halaman x LIBRARY_TILE_ZOOM, setiap
+level di bawahnya setengahnya sampai 1x1 piksel, dan tiap level dipotong
+menjadi tile LIBRARY_TILE_SIZE piksel (ditambah LIBRARY_TILE_OVERLAP
+piksel tumpang tindih di sisi dalam). Viewer (OpenSeadragon) hanya
+meminta tile yang terlihat pada level zoom saat itu.
+
+Tile dibuat malas: tidak ada yang dirender saat upload, setiap tile
+dirender dari PDF (hanya bagian halaman itu) saat pertama diminta lalu
+disimpan di page cache (lihat PageCache.get_or_render_tile), ikut
+dibatasi ukurannya dan dihapus paling lama tidak diakses.
+"""
+import math
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .rendering import IMAGE_FORMATS, image_options
+
+# Ukuran tile, tumpang tindih, zoom level tertinggi, format, dan kualitas gambar
+TileOptions = namedtuple('TileOptions', ['size', 'overlap', 'zoom', 'fmt', 'quality'])
+
+DZI_NAMESPACE = 'http://schemas.microsoft.com/deepzoom/2008'
+
+
+def tile_options():
+    """TileOptions dari settings LIBRARY_TILE_*, format mengikuti gambar halaman"""
+    page_options = image_options()
+    return TileOptions(
+        size=getattr(settings, 'LIBRARY_TILE_SIZE', 256),
+        overlap=getattr(settings, 'LIBRARY_TILE_OVERLAP', 1),
+        zoom=getattr(settings, 'LIBRARY_TILE_ZOOM', 4.0),
+        fmt=page_options.fmt,
+        quality=page_options.quality,
+    )
+
+
+def tile_extension(options):
+    return IMAGE_FORMATS[options.fmt][1]
+
+
+def max_level(width, height):
+    """Level tertinggi: level 0 berukuran 1x1, tiap level naik ukurannya dua kali"""
+    return max(0, math.ceil(math.log2(max(width, height, 1))))
+
+
+def level_size(width, height, level):
+    """Ukuran (lebar, tinggi) gambar pada level tertentu"""
+    scale = 2 ** (max_level(width, height) - level)
+    return max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale))
+
+
+def tile_grid(level_width, level_height, size):
+    """Jumlah (kolom, baris) tile pada satu level"""
+    return math.ceil(level_width / size), math.ceil(level_height / size)
+
+
+def tile_box(width, height, level, col, row, options):
+    """
+    Kotak piksel (x0, y0, x1, y1) tile pada gambar level tersebut,
+    termasuk tumpang tindih. None jika level/kolom/baris di luar piramida.
+    """
+    if not 0 <= level <= max_level(width, height):
+        return None
+    level_width, level_height = level_size(width, height, level)
+    cols, rows = tile_grid(level_width, level_height, options.size)
+    if not (0 <= col < cols and 0 <= row < rows):
+        return None
+
+    x0 = col * options.size - (options.overlap if col else 0)
+    y0 = row * options.size - (options.overlap if row else 0)
+    x1 = min(level_width, (col + 1) * options.size + options.overlap)
+    y1 = min(level_height, (row + 1) * options.size + options.overlap)
+    return x0, y0, x1, y1
+
+
+def dzi_descriptor(width, height, options):
+    """Isi file .dzi (XML) untuk gambar width x height"""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="{DZI_NAMESPACE}" Format="{tile_extension(options)}" '
+        f'Overlap="{options.overlap}" TileSize="{options.size}">'
+        f'<Size Width="{width}" Height="{height}"/></Image>\n'
+    )
+
+
+def _read_page_size(book, page_num, zoom):
+    from .rendering import page_size
+    from .utils import open_pdf
+
+    pdf_document = open_pdf(book.file)
+    try:
+        return page_size(pdf_document.load_page(page_num - 1), zoom)
+    finally:
+        pdf_document.close()
+
+
+def page_pyramid_size(book, page_num, options=None):
+    """
+    Ukuran (lebar, tinggi) level tertinggi halaman. Disimpan di cache
+    Django per folder gambar, jadi PDF hanya dibuka sekali per halaman.
+    """
+    options = options or tile_options()
+    key = f"library:tile_size:{book.images_folder}:{page_num}:{options.zoom}"
+    size = cache.get(key)
+    if size is None:
+        size = _read_page_size(book, page_num, options.zoom)
+        cache.set(key, size, getattr(settings, 'LIBRARY_PAGE_MANIFEST_CACHE_TIMEOUT', 60 * 60 * 24))
+    return tuple(size)
@@ -0,0 +1,125 @@
+"""
+Tokenizer dan filter stopword untuk analisis kata kunci.
+
+Aturan kata kandidat sama dengan analisis lama: karakter selain huruf
+a-z dibuang (jadi "e-book" menjadi "ebook"), huruf kecil, lebih dari
+3 karakter, dan bukan stopword. Bedanya, count_words tidak memproses
+setiap kata dengan Python: halaman dipecah per spasi dan dihitung oleh
+Counter (C) beberapa halaman sekaligus, lalu pembersihan, filter
+panjang dan stopword dikerjakan sekali per token unik.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+
+# Stopword bawaan Indonesia/Inggris, selalu dipakai meskipun data NLTK tidak ada
+STOP_WORDS = frozenset({
+    'dan', 'atau', 'yang', 'untuk', 'dengan', 'dari', 'ke', 'di', 'pada',
+    'dalam', 'oleh', 'karena', 'sebagai', 'adalah', 'akan', 'dapat',
+    'telah', 'tidak', 'ada', 'ini', 'itu', 'juga', 'hanya', 'sudah',
+    'masih', 'lebih', 'saja', 'bisa', 'jika', 'bila', 'maka', 'sehingga',
+    'namun', 'tetapi', 'bahwa', 'dimana', 'bagaimana', 'kapan', 'siapa',
+    'mengapa', 'apa', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to',
+    'for', 'of', 'with', 'by', 'a', 'an', 'as', 'is', 'was', 'are', 'were',
+    'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+    'could', 'should', 'may', 'might', 'must', 'can', 'shall', 'page', 'pdf'
+})
+
+MIN_WORD_LENGTH = 4
+
+# Semua karakter selain huruf ASCII dan spasi
+NON_ALPHA_RE = re.compile(r'[^a-zA-Z\s]+')
+# Setelah dibersihkan, kata = deretan huruf; sekaligus menyaring panjang minimal
+WORD_RE = re.compile(r'[a-z]{%d,}' % MIN_WORD_LENGTH)
+
+# Halaman digabung sampai ukuran ini sebelum dipecah dan dihitung sekaligus;
+# cukup besar untuk mengurangi overhead per halaman, cukup kecil agar daftar
+# token sementara tidak membesar seiring ukuran buku
+BATCH_CHARS = 64 << 10
+
+
+@lru_cache(maxsize=1)
+def stop_words():
+    """
+    STOP_WORDS digabung dengan stopword NLTK (bahasa di
+    LIBRARY_STOPWORD_LANGUAGES) jika NLTK dan datanya terpasang.
+    Dihitung sekali per proses.
+    """
+    words = set(STOP_WORDS)
+    languages = getattr(settings, 'LIBRARY_STOPWORD_LANGUAGES', ['english', 'indonesian'])
+    try:
+        from nltk.corpus import stopwords
+        for language in languages:
+            try:
+                words.update(word.lower() for word in stopwords.words(language))
+            except (LookupError, OSError):
+                pass
+    except ImportError:
+        pass
+    return frozenset(words)
+
+
+def clean_text(text):
+    """Buang karakter non-huruf, jadikan huruf kecil, rapikan spasi"""
+    return ' '.join(NON_ALPHA_RE.sub('', text).lower().split())
+
+
+def all_words(text):
+    """Kata dengan panjang minimal, termasuk stopword"""
+    return WORD_RE.findall(NON_ALPHA_RE.sub('', text).lower())
+
+
+def words(text):
+    """Kata kandidat kata kunci dari teks, urut sesuai kemunculan"""
+    if not text:
+        return []
+    stop = stop_words()
+    return [word for word in all_words(text) if word not in stop]
+
+
+def _batches(pages, batch_chars):
+    """Gabungkan halaman menjadi potongan sekitar batch_chars karakter"""
+    batch, size = [], 0
+    for page in pages:
+        if not page:
+            continue
+        batch.append(page)
+        size += len(page)
+        if size >= batch_chars:
+            yield '\n'.join(batch)
+            batch, size = [], 0
+    if batch:
+        yield '\n'.join(batch)
+
+
+def _clean_token(token):
+    """Token hasil split() menjadi kata huruf kecil tanpa karakter non-huruf"""
+    if token.isascii() and token.isalpha():
+        return token.lower()
+    return NON_ALPHA_RE.sub('', token).lower()
+
+
+def count_words(pages, counts=None, batch_chars=BATCH_CHARS):
+    """
+    Hitung kata kandidat dari iterable teks halaman (boleh generator).
+    String tunggal dianggap satu halaman.
+    counts: Counter yang ditambah (opsional)
+    Returns: Counter tanpa stopword
+    """
+    if isinstance(pages, str):
+        pages = [pages]
+    # NON_ALPHA_RE tidak membuang spasi, jadi memecah per spasi lebih dulu
+    # menghasilkan batas kata yang sama dengan membersihkan teks utuh
+    tokens = Counter()
+    for batch in _batches(pages, batch_chars):
+        tokens.update(batch.split())
+
+    counts = Counter() if counts is None else counts
+    stop = stop_words()
+    for token, count in tokens.items():
+        word = _clean_token(token)
+        if len(word) >= MIN_WORD_LENGTH and word not in stop:
+            counts[word] += count
+    return counts
@@ -0,0 +1,80 @@
+"""
+Upload handler yang menghitung SHA-256 file sambil potongan datanya
+diterima, jadi hash isi PDF (library.content) sudah tersedia saat view
+berjalan tanpa membaca ulang file yang sudah disimpan. Dipasang hanya
+di view upload buku lewat decorator hash_uploads (bukan global di
+FILE_UPLOAD_HANDLERS, supaya upload lain seperti foto profil tidak ikut
+di-hash); data diteruskan apa adanya ke handler berikutnya (memori atau
+file sementara).
+"""
+import hashlib
+from functools import wraps
+
+from django.core.files.uploadhandler import FileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class HashingUploadHandler(FileUploadHandler):
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        # field_name -> (hex SHA-256, ukuran) untuk file yang sudah selesai diterima
+        self.digests = {}
+        self._hash = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = (self._hash.hexdigest(), file_size)
+        # File tetap dibuat oleh handler berikutnya
+        return None
+
+
+def hash_uploads(view):
+    """
+    Decorator view: pasang HashingUploadHandler di depan handler upload
+    request. Handler hanya bisa diubah sebelum request.POST dibaca, padahal
+    CsrfViewMiddleware membacanya lebih dulu; jadi middleware dilewati
+    (csrf_exempt) dan pemeriksaan CSRF dijalankan di sini setelah handler
+    dipasang.
+    """
+    protected = csrf_protect(view)
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        request.upload_handlers.insert(0, HashingUploadHandler(request))
+        return protected(request, *args, **kwargs)
+
+    return csrf_exempt(wrapped)
+
+
+def file_digest(file):
+    """SHA-256 dan ukuran file dengan membacanya per potongan"""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def upload_digest(request, field_name):
+    """
+    (hex SHA-256, ukuran) file upload request.FILES[field_name], dari
+    HashingUploadHandler jika terpasang (hash_uploads), selain itu dihitung
+    dari filenya
+    """
+    for handler in request.upload_handlers:
+        if isinstance(handler, HashingUploadHandler) and field_name in handler.digests:
+            return handler.digests[field_name]
+    return file_digest(request.FILES[field_name])
@@ -4,11 +4,20 @@ from . import views
 urlpatterns = [
     path('', views.book_list, name='book_list'),
     path('add/', views.book_create, name='book_create'),
+    path('uploads/', views.upload_session_create, name='upload_session_create'),
+    path('uploads/<uuid:session_id>/', views.upload_session_detail, name='upload_session_detail'),
+    path('uploads/<uuid:session_id>/chunks/<int:index>/', views.upload_chunk, name='upload_chunk'),
     path('<int:pk>/', views.book_detail, name='book_detail'),
     path('<int:pk>/preview/', views.book_preview, name='book_preview'),
+    path('<int:pk>/pages/<int:page>/', views.book_page_image, name='book_page_image'),
+    path('<int:pk>/pages/<int:page>/tiles.dzi', views.book_page_dzi, name='book_page_dzi'),
+    path('<int:pk>/pages/<int:page>/tiles_files/<int:level>/<int:col>_<int:row>.<str:ext>',
+         views.book_page_tile, name='book_page_tile'),
+    path('<int:pk>/pages/manifest.json', views.book_page_manifest, name='book_page_manifest'),
     path('<int:pk>/reprocess/', views.reprocess_book, name='reprocess_book'),
     path('<int:pk>/analyze/', views.analyze_book, name='analyze_book'),
     path('<int:pk>/toggle-favorite/', views.toggle_favorite, name='toggle_favorite'),
     path('edit/<int:pk>/', views.book_update, name='book_update'),
     path('delete/<int:pk>/', views.book_delete, name='book_delete'),
+    path('metrics/', views.prometheus_metrics, name='metrics'),
 ]
@@ -1,66 +1,380 @@
-import fitz  # PyMuPDF
+import logging
 import os
 from django.conf import settings
 import uuid
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
-import nltk
-from collections import Counter
-
-# Download NLTK data jika belum ada
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-
-def convert_pdf_to_images(pdf_path, book_id):
+
+# Dependensi berat (PyMuPDF, NLTK) diimpor di dalam fungsi yang memakainya
+# agar manage.py, test, dan worker tidak membayar biaya impornya di awal.
+# Data NLTK tidak diunduh otomatis (server produksi tanpa akses internet);
+# stopword NLTK ikut dipakai library.tokenizer jika dipasang manual:
+#     python -m nltk.downloader stopwords
+
+from .rendering import (
+    IMAGE_FORMATS, PAGE_ZOOM, image_options, open_document, page_image_name, pixmap_to_image,
+    render_page, render_pages_parallel, resize_to_width, save_image, save_page_image,
+)
+from . import metrics, tokenizer
+from .checkpoint import PAGE_FILE_RE, ConversionProgress, new_images_dir
+from .text_store import MIN_TEXT_LENGTH, PageTextWriter
+
+logger = logging.getLogger(__name__)
+
+# Zoom render cover
+COVER_ZOOM = 1.5
+
+
+def _pdf_source(source):
     """
-    Konversi PDF ke gambar menggunakan PyMuPDF
-    Returns: folder path yang berisi gambar-gambar hasil konversi
+    Normalisasi sumber PDF menjadi path (jika file ada di disk) atau bytes.
+    Hasilnya juga bisa dikirim ke proses render lain.
     """
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+
+    # TemporaryUploadedFile (upload besar) sudah tersimpan di disk
+    if hasattr(source, 'temporary_file_path'):
+        return source.temporary_file_path()
+
+    # FieldFile pada storage lokal
     try:
-        print(f"Debug: Starting PDF conversion for {pdf_path}")
+        path = source.path
+        if path and os.path.exists(path):
+            return path
+    except (AttributeError, NotImplementedError, ValueError):
+        pass
 
-        # Buat folder untuk menyimpan gambar
-        images_folder = f"book_images/{book_id}_{uuid.uuid4().hex[:8]}"
-        images_dir = os.path.join(settings.MEDIA_ROOT, images_folder)
-        os.makedirs(images_dir, exist_ok=True)
+    # Stream lain (InMemoryUploadedFile, storage remote)
+    if getattr(source, 'closed', False):
+        source.open('rb')
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source.read()
 
-        # Buka PDF
-        pdf_document = fitz.open(pdf_path)
 
-        for page_num in range(len(pdf_document)):
-            # Ambil halaman
-            page = pdf_document.load_page(page_num)
+def open_pdf(source):
+    """
+    Buka PDF dari path, bytes, atau file upload (stream)
+    File upload Django yang sudah ada di disk dibuka langsung dari path
+    sementaranya sehingga tidak perlu disalin ke memori.
+    """
+    import fitz  # PyMuPDF
+
+    if isinstance(source, fitz.Document):
+        return source
+    return open_document(_pdf_source(source))
+
+
+def _source_name(source):
+    """Nama file sumber PDF, dipakai untuk fallback teks/keywords"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(source)
+
+    import fitz  # PyMuPDF
+
+    if isinstance(source, fitz.Document):
+        return os.path.basename(source.name or "")
+    return os.path.basename(getattr(source, 'name', None) or "")
+
+
+def _render_workers(workers=None):
+    """Jumlah proses render, default dari settings.LIBRARY_RENDER_WORKERS"""
+    if workers is None:
+        workers = getattr(settings, 'LIBRARY_RENDER_WORKERS', 1)
+    if not workers or workers < 1:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _use_parallel_render(workers, page_count):
+    """Render paralel hanya sepadan untuk dokumen yang cukup banyak halamannya"""
+    min_pages = getattr(settings, 'LIBRARY_RENDER_PARALLEL_MIN_PAGES', 16)
+    return workers > 1 and page_count >= max(min_pages, 2)
+
+
+def _save_cover(image, book_id, options=None):
+    """Simpan Image cover, returns: path relatif terhadap MEDIA_ROOT"""
+    options = options or image_options()
+    covers_folder = "covers"
+    covers_dir = os.path.join(settings.MEDIA_ROOT, covers_folder)
+    os.makedirs(covers_dir, exist_ok=True)
+
+    ext = IMAGE_FORMATS[options.fmt][1]
+    cover_filename = f"cover_{book_id}_{uuid.uuid4().hex[:8]}.{ext}"
+    cover_path = os.path.join(covers_dir, cover_filename)
+    save_image(image, cover_path, options.fmt, options.quality)
+    metrics.increment('library_bytes_written_total', os.path.getsize(cover_path), kind='cover')
+    logger.debug("Cover saved to %s", cover_path)
+
+    return f"{covers_folder}/{cover_filename}"
+
+
+def _record_rendered(images_dir, page_nums, source):
+    """Catat halaman yang dirender dan ukuran file gambarnya"""
+    rendered = set(page_nums)
+    metrics.increment('library_pages_rendered_total', len(rendered), source=source)
+    # Dihitung dari disk karena render paralel terjadi di proses lain.
+    # Halaman yang sudah ada sebelumnya (konversi dilanjutkan) tidak ikut dihitung.
+    written = 0
+    for entry in os.scandir(images_dir):
+        match = PAGE_FILE_RE.match(entry.name)
+        if match and int(match.group(1)) in rendered:
+            written += entry.stat().st_size
+    metrics.increment('library_bytes_written_total', written, kind='page_image')
+
+
+def _open_images_dir(images_folder, book_id):
+    """Folder gambar yang sudah ada (konversi dilanjutkan) atau folder baru"""
+    if not images_folder:
+        return new_images_dir(book_id)
+    images_dir = os.path.join(settings.MEDIA_ROOT, images_folder)
+    os.makedirs(images_dir, exist_ok=True)
+    return images_folder, images_dir
+
+
+def _cover_from_page_image(image, zoom=PAGE_ZOOM):
+    """Turunkan cover (zoom COVER_ZOOM) dari gambar halaman yang sudah dirender"""
+    width = max(1, int(image.width * COVER_ZOOM / zoom + 0.5))
+    return resize_to_width(image, width)
+
+
+def _extract_page_text(page):
+    """
+    Ekstrak teks satu halaman dengan fallback ke text blocks
+    """
+    # Metode 1: Ekstrak teks langsung
+    text = page.get_text()
+    if text.strip():
+        return text
+
+    # Metode 2: Coba ekstrak dari text blocks
+    try:
+        parts = []
+        for block in page.get_text("blocks"):
+            if isinstance(block, tuple) and len(block) >= 5:
+                block_text = block[4]  # Teks ada di index ke-4
+                if block_text.strip():
+                    parts.append(block_text)
+        return " ".join(parts)
+    except Exception:
+        return ""
+
+
+def _fallback_text(pdf_document, source_name):
+    """
+    Teks pengganti untuk PDF yang hampir tidak punya teks:
+    metadata PDF, lalu nama file.
+    """
+    logger.debug("Very little text extracted, trying metadata...")
+
+    # Coba baca metadata PDF dari dokumen yang sudah terbuka
+    try:
+        metadata = pdf_document.metadata
+        if metadata:
+            meta_text = ""
+            for key, value in metadata.items():
+                if value and isinstance(value, str):
+                    meta_text += f"{value} "
+
+            if len(meta_text.strip()) > 20:
+                logger.debug("Using metadata text: %d characters", len(meta_text))
+                return meta_text.strip()
+    except Exception:
+        pass
+
+    # Jika masih tidak ada teks, buat keywords berdasarkan nama file
+    filename_words = re.sub(r'[^a-zA-Z\s]', ' ', source_name).split()
+    fallback_text = " ".join([word for word in filename_words if len(word) > 2])
+
+    if fallback_text:
+        logger.debug("Using filename-based text: %s", fallback_text)
+        return fallback_text + " document book pdf file text content"
+
+    logger.info("No text could be extracted from PDF %s", source_name)
+    return ""
+
+
+def _prerender_limit(prerender_pages, page_count):
+    """
+    Jumlah halaman yang dirender saat upload.
+    Halaman sisanya dirender saat dibaca (lihat library.page_cache).
+    """
+    if prerender_pages is None:
+        prerender_pages = getattr(settings, 'LIBRARY_PRERENDER_PAGES', None)
+    if prerender_pages is None:
+        return page_count
+    return min(max(prerender_pages, 1), page_count)
 
-            # Konversi ke gambar dengan resolusi tinggi
-            mat = fitz.Matrix(2.0, 2.0)  # 2x zoom untuk kualitas lebih baik
-            pix = page.get_pixmap(matrix=mat)
 
-            # Simpan sebagai PNG
-            image_path = os.path.join(images_dir, f"page_{page_num + 1:03d}.png")
-            pix.save(image_path)
-            print(f"Debug: Saved page {page_num + 1} to {image_path}")
+@metrics.span('ingest_pdf')
+def ingest_pdf(source, book_id, make_cover=True, extract_text=True, workers=None,
+               prerender_pages=None, images_folder=None, on_checkpoint=None):
+    """
+    Proses PDF dalam satu kali jalan: dokumen hanya dibuka sekali dan
+    setiap halaman dirender sekali. Cover diturunkan dari render halaman
+    pertama, teks diekstrak dari halaman yang sama saat dirender.
+
+    source: path, bytes, atau file upload/FieldFile (lihat open_pdf)
+    book_id: id buku, atau awalan hash isi PDF (library.content.asset_key),
+        dipakai untuk nama folder gambar, cover, dan sidecar teks
+    workers: jumlah proses render (default settings.LIBRARY_RENDER_WORKERS)
+    prerender_pages: jumlah halaman awal yang dirender. None memakai
+        settings.LIBRARY_PRERENDER_PAGES (semua halaman hanya jika setting
+        itu juga None); untuk merender semua halaman apa pun setting-nya,
+        berikan angka yang tidak lebih kecil dari jumlah halaman PDF
+    images_folder: folder gambar yang sudah ada; hanya halaman yang belum
+        selesai atau dirender dengan pengaturan lain yang dirender
+        (library.checkpoint). Default folder baru.
+    on_checkpoint: callable tanpa argumen yang dipanggil setiap kali
+        progres render disimpan (heartbeat job di library.jobs)
+    Teks per halaman langsung ditulis ke sidecar text_store (key text_file)
+    tanpa digabung di memori; analisis berikutnya membaca sidecar itu
+    halaman demi halaman (text_store.iter_text).
+    Returns: dict dengan key images_folder, pages, cover, text_file
+    """
+    logger.debug("Starting single-pass ingestion for book %s", book_id)
+
+    pdf_source = _pdf_source(source)
+    pdf_document = open_document(pdf_source)
+    source_name = _source_name(source)
+    images_folder, images_dir = _open_images_dir(images_folder, book_id)
+    workers = _render_workers(workers)
+    options = image_options()
+    progress = ConversionProgress(images_dir, options, on_save=on_checkpoint)
+    progress.remove_partial()
+
+    result = {
+        'images_folder': None,
+        'pages': 0,
+        'cover': None,
+        'text_file': None,
+    }
+    text_chars = 0
+    text_writer = None
+
+    try:
+        result['pages'] = page_count = len(pdf_document)
+        render_count = _prerender_limit(prerender_pages, page_count)
+        pending = progress.pending(range(1, render_count + 1))
+        parallel = _use_parallel_render(workers, len(pending))
+        # Manifest ada sejak awal: folder tanpa manifest berarti konversi lama yang selesai
+        progress.save()
+        if extract_text:
+            text_writer = PageTextWriter(book_id, page_count)
+
+        serial_pages = set() if parallel else set(pending)
+        # Tanpa ekstraksi teks hanya halaman yang perlu dirender yang dibuka
+        page_indexes = range(page_count) if extract_text else sorted(n - 1 for n in serial_pages)
+        for page_num in page_indexes:
+            page = pdf_document.load_page(page_num)
 
+            # Pada mode paralel halaman dirender oleh process pool di bawah
+            if page_num + 1 in serial_pages:
+                pix = render_page(page)
+                save_page_image(pix, images_dir, page_num + 1, options)
+                progress.mark([page_num + 1])
+
+                if page_num == 0 and make_cover:
+                    cover = _cover_from_page_image(pixmap_to_image(pix))
+                    result['cover'] = _save_cover(cover, book_id, options)
+
+            if extract_text:
+                text = _extract_page_text(page)
+                text_writer.write_page(text)
+                text_chars += len(text.strip())
+
+        if parallel:
+            logger.debug("Rendering %d pages with %d workers", len(pending), workers)
+            render_pages_parallel(pdf_source, images_dir, render_count, workers,
+                                  options=options, pages=pending, on_saved=progress.mark)
+        progress.save()
+
+        if make_cover and render_count and result['cover'] is None:
+            # Cover tetap diturunkan dari halaman pertama yang sudah dirender
+            from PIL import Image
+
+            first_page_path = os.path.join(images_dir, page_image_name(1, fmt=options.fmt))
+            with Image.open(first_page_path) as first_page:
+                cover = _cover_from_page_image(first_page)
+            result['cover'] = _save_cover(cover, book_id, options)
+
+        result['images_folder'] = images_folder
+        _record_rendered(images_dir, pending, 'ingest')
+
+        if extract_text:
+            if text_chars < MIN_TEXT_LENGTH:
+                text_writer.fallback = _fallback_text(pdf_document, source_name)
+            result['text_file'] = text_writer.close()
+            text_writer = None
+    finally:
+        if text_writer is not None:
+            text_writer.abort()
         pdf_document.close()
-        print(f"Debug: PDF conversion completed. Images folder: {images_folder}")
+
+    logger.info("Ingestion completed for book %s: %d pages (%d pre-rendered, %d rendered now), folder %s",
+                book_id, result['pages'], render_count, len(pending), images_folder)
+    return result
+
+
+@metrics.span('convert_pdf_to_images')
+def convert_pdf_to_images(pdf_path, book_id, workers=None, images_folder=None):
+    """
+    Konversi PDF ke gambar menggunakan PyMuPDF
+    Dengan workers > 1 halaman dirender paralel oleh beberapa proses,
+    hasilnya identik dengan render serial.
+    images_folder: folder hasil konversi sebelumnya yang dilanjutkan;
+        halaman yang sudah selesai dengan pengaturan yang sama dilewati
+    Returns: folder path yang berisi gambar-gambar hasil konversi
+    """
+    try:
+        logger.debug("Starting PDF conversion for %s", pdf_path)
+
+        # Buat folder untuk menyimpan gambar, atau lanjutkan folder yang ada
+        images_folder, images_dir = _open_images_dir(images_folder, book_id)
+        options = image_options()
+        progress = ConversionProgress(images_dir, options)
+        progress.remove_partial()
+        progress.save()
+
+        # Buka PDF
+        pdf_source = _pdf_source(pdf_path)
+        pdf_document = open_document(pdf_source)
+        pending = progress.pending(range(1, len(pdf_document) + 1))
+        workers = _render_workers(workers)
+
+        if _use_parallel_render(workers, len(pending)):
+            # Tiap proses worker membuka dokumennya sendiri
+            page_count = len(pdf_document)
+            pdf_document.close()
+            logger.debug("Rendering %d pages with %d workers", len(pending), workers)
+            render_pages_parallel(pdf_source, images_dir, page_count, workers,
+                                  options=options, pages=pending, on_saved=progress.mark)
+        else:
+            for page_num in pending:
+                # Render halaman dengan resolusi tinggi lalu simpan beserta variannya
+                page = pdf_document.load_page(page_num - 1)
+                pix = render_page(page)
+
+                saved = save_page_image(pix, images_dir, page_num, options)
+                progress.mark([page_num])
+                logger.debug("Saved page %d to %s: %s", page_num, images_folder, saved)
+
+            pdf_document.close()
+
+        progress.save()
+        _record_rendered(images_dir, pending, 'convert')
+        logger.info("PDF conversion completed. Images folder: %s (%d pages rendered)",
+                    images_folder, len(pending))
 
         # Return relative path untuk disimpan di database
         return images_folder
 
     except Exception as e:
-        print(f"Error converting PDF: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error converting PDF: %s", e)
+        metrics.increment('library_failures_total', stage='convert_pdf_to_images')
         return None
 
 def get_book_page_count(pdf_path):
@@ -68,272 +382,172 @@ def get_book_page_count(pdf_path):
     Mendapatkan jumlah halaman dari PDF
     """
     try:
-        pdf_document = fitz.open(pdf_path)
+        pdf_document = open_pdf(pdf_path)
         page_count = len(pdf_document)
         pdf_document.close()
-        print(f"Debug: Page count = {page_count}")
+        logger.debug("Page count = %d", page_count)
         return page_count
     except Exception as e:
-        print(f"Error getting page count: {str(e)}")
+        logger.error("Error getting page count: %s", e)
         return 0
 
+@metrics.span('get_book_cover_from_pdf')
 def get_book_cover_from_pdf(pdf_path, book_id):
     """
     Ekstrak halaman pertama PDF sebagai cover
     """
     try:
-        print(f"Debug: Extracting cover from {pdf_path}")
-
-        # Buat folder untuk cover
-        covers_folder = "covers"
-        covers_dir = os.path.join(settings.MEDIA_ROOT, covers_folder)
-        os.makedirs(covers_dir, exist_ok=True)
+        logger.debug("Extracting cover from %s", pdf_path)
 
         # Buka PDF dan ambil halaman pertama
-        pdf_document = fitz.open(pdf_path)
+        pdf_document = open_pdf(pdf_path)
         first_page = pdf_document.load_page(0)
 
-        # Konversi ke gambar
-        mat = fitz.Matrix(1.5, 1.5)  # 1.5x zoom untuk cover
-        pix = first_page.get_pixmap(matrix=mat)
-
-        # Simpan sebagai cover
-        cover_filename = f"cover_{book_id}_{uuid.uuid4().hex[:8]}.png"
-        cover_path = os.path.join(covers_dir, cover_filename)
-        pix.save(cover_path)
+        # Konversi ke gambar dengan zoom cover
+        pix = render_page(first_page, COVER_ZOOM)
+        cover_path = _save_cover(pixmap_to_image(pix), book_id)
 
         pdf_document.close()
-        print(f"Debug: Cover saved to {cover_path}")
-
-        # Return relative path
-        return f"covers/{cover_filename}"
+        return cover_path
 
     except Exception as e:
-        print(f"Error extracting cover: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error extracting cover: %s", e)
+        metrics.increment('library_failures_total', stage='get_book_cover_from_pdf')
         return None
 
-def extract_text_from_pdf(pdf_path):
+def iter_pdf_text(source):
     """
-    Ekstrak teks dari file PDF dengan berbagai metode fallback
+    Generator teks per halaman langsung dari PDF.
+    Jika teks terlalu sedikit, teks pengganti dari metadata atau nama file
+    ditambahkan sebagai halaman terakhir.
     """
+    pdf_document = open_pdf(source)
     try:
-        print(f"Debug: Extracting text from {pdf_path}")
-        pdf_document = fitz.open(pdf_path)
-        full_text = ""
-        
+        chars = 0
         for page_num in range(len(pdf_document)):
-            page = pdf_document.load_page(page_num)
-
-            # Metode 1: Ekstrak teks langsung
-            text = page.get_text()
-            if text.strip():
-                full_text += text + " "
-                continue
-
-            # Metode 2: Coba ekstrak teks dengan encoding berbeda
-            try:
-                text = page.get_text("text")
-                if text.strip():
-                    full_text += text + " "
-                    continue
-            except:
-                pass
-
-            # Metode 3: Coba ekstrak dari text blocks
-            try:
-                blocks = page.get_text("blocks")
-                for block in blocks:
-                    if isinstance(block, tuple) and len(block) >= 5:
-                        block_text = block[4]  # Teks ada di index ke-4
-                        if block_text.strip():
-                            full_text += block_text + " "
-            except:
-                pass
+            text = _extract_page_text(pdf_document.load_page(page_num))
+            chars += len(text.strip())
+            yield text
 
+        if chars < MIN_TEXT_LENGTH:
+            yield _fallback_text(pdf_document, _source_name(source))
+    finally:
         pdf_document.close()
 
-        extracted_text = full_text.strip()
-        print(f"Debug: Extracted {len(extracted_text)} characters from PDF")
-
-        # Jika teks terlalu sedikit, coba ekstrak dari metadata atau buat teks dummy
-        if len(extracted_text) < 50:
-            print("Debug: Very little text extracted, trying metadata...")
-
-            # Coba baca metadata PDF
-            try:
-                pdf_document = fitz.open(pdf_path)
-                metadata = pdf_document.metadata
-                pdf_document.close()
-
-                if metadata:
-                    meta_text = ""
-                    for key, value in metadata.items():
-                        if value and isinstance(value, str):
-                            meta_text += f"{value} "
-
-                    if len(meta_text.strip()) > 20:
-                        print(f"Debug: Using metadata text: {len(meta_text)} characters")
-                        return meta_text.strip()
-            except:
-                pass
-
-            # Jika masih tidak ada teks, buat keywords berdasarkan nama file
-            filename = os.path.basename(pdf_path)
-            filename_words = re.sub(r'[^a-zA-Z\s]', ' ', filename).split()
-            fallback_text = " ".join([word for word in filename_words if len(word) > 2])
-
-            if fallback_text:
-                print(f"Debug: Using filename-based text: {fallback_text}")
-                return fallback_text + " document book pdf file text content"
-
-            print("Debug: No text could be extracted from PDF")
-            return ""
 
+@metrics.span('extract_text_from_pdf')
+def extract_text_from_pdf(pdf_path):
+    """
+    Ekstrak teks dari file PDF dengan berbagai metode fallback.
+    Seluruh teks dikembalikan sebagai satu string; untuk buku tebal
+    gunakan iter_pdf_text atau text_store.iter_book_text.
+    """
+    try:
+        logger.debug("Extracting text from %s", pdf_path)
+        extracted_text = " ".join(
+            text for text in iter_pdf_text(pdf_path) if text.strip()
+        ).strip()
+        logger.debug("Extracted %d characters from PDF", len(extracted_text))
         return extracted_text
 
     except Exception as e:
-        print(f"Error extracting text from PDF: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error extracting text from PDF: %s", e)
+        metrics.increment('library_failures_total', stage='extract_text_from_pdf')
         return ""
 
+@metrics.span('store_pdf_text')
+def store_pdf_text(source, book_id):
+    """
+    Ekstrak teks per halaman dari PDF lalu simpan ke sidecar text_store.
+    Dipakai untuk buku lama yang diproses sebelum teks disimpan saat ingest.
+    Returns: nama file sidecar
+    """
+    logger.debug("Storing page text of book %s", book_id)
+    pdf_document = open_pdf(source)
+    try:
+        chars = 0
+        with PageTextWriter(book_id, len(pdf_document)) as text_writer:
+            for page_num in range(len(pdf_document)):
+                text = _extract_page_text(pdf_document.load_page(page_num))
+                text_writer.write_page(text)
+                chars += len(text.strip())
+
+            if chars < MIN_TEXT_LENGTH:
+                text_writer.fallback = _fallback_text(pdf_document, _source_name(source))
+    finally:
+        pdf_document.close()
+
+    return text_writer.text_file
+
+
 def clean_text(text):
     """
     Bersihkan dan preprocess teks
+    (hapus karakter non-alfabet dan angka, lowercase, rapikan spasi)
     """
-    # Hapus karakter non-alfabet dan angka
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
-    
-    # Convert ke lowercase
-    text = text.lower()
-    
-    # Hapus extra whitespace
-    text = ' '.join(text.split())
-    
-    return text
+    return tokenizer.clean_text(text)
 
+@metrics.span('analyze_book_text')
 def analyze_book_text(pdf_path, max_keywords=10):
     """
     Analisis teks buku untuk mendapatkan kata-kata relevan
     dengan fallback untuk PDF yang sulit diekstrak
     """
+    from .keywords import count_terms
+
+    logger.debug("Starting text analysis for %s", pdf_path)
+
+    # Teks dihitung halaman demi halaman, tidak pernah digabung di memori
+    counter = count_terms(iter_pdf_text(pdf_path))
+    if counter.chars < 30 or not counter.counts:
+        return analyze_text(counter.sample, max_keywords, source_name=_source_name(pdf_path))
+
+    keywords = [word for word, _ in counter.counts.most_common(max_keywords)]
+    logger.debug("Found %d keywords: %s", len(keywords), keywords)
+    return keywords
+
+def analyze_text(raw_text, max_keywords=10, source_name=""):
+    """
+    Cari kata-kata relevan dari teks yang sudah diekstrak
+    (misalnya hasil ingest_pdf) tanpa membuka PDF lagi
+    """
     try:
-        print(f"Debug: Starting text analysis for {pdf_path}")
-        
-        # Ekstrak teks dari PDF
-        raw_text = extract_text_from_pdf(pdf_path)
         if not raw_text:
-            print("Debug: No text extracted from PDF")
+            logger.debug("No text extracted from PDF")
             return []
         
-        print(f"Debug: Extracted {len(raw_text)} characters of text")
+        logger.debug("Extracted %d characters of text", len(raw_text))
         
         # Turunkan threshold untuk teks yang sedikit
         if len(raw_text.strip()) < 30:
-            print("Debug: Very little text, creating basic keywords from filename")
+            logger.debug("Very little text, creating basic keywords from filename")
             # Buat keywords dari nama file dan info buku
-            filename = os.path.basename(pdf_path)
-            filename_words = re.sub(r'[^a-zA-Z\s]', ' ', filename).split()
+            filename_words = re.sub(r'[^a-zA-Z\s]', ' ', source_name).split()
             basic_keywords = [word.lower() for word in filename_words if len(word) > 3]
             basic_keywords.extend(['document', 'book', 'content', 'text', 'reading'])
             return basic_keywords[:max_keywords]
 
-        # Bersihkan teks
-        clean_text_content = clean_text(raw_text)
-        if not clean_text_content:
-            print("Debug: No text after cleaning")
-            return []
+        # Hitung frekuensi kata kandidat. Tokenizer membersihkan, memecah, dan
+        # menyaring stopword sekali per kata unik (lihat library.tokenizer).
+        word_freq = tokenizer.count_words(raw_text)
+
+        if not word_freq:
+            logger.debug("No valid words found after filtering")
+            # Fallback: ambil kata unik yang panjang dari teks mentah
+            fallback_words = list(dict.fromkeys(
+                word for word in tokenizer.all_words(raw_text) if len(word) > 4
+            ))
+            if fallback_words:
+                return fallback_words[:max_keywords]
+            return ['document', 'content', 'book', 'text', 'reading']
+
+        # Ambil kata-kata paling sering muncul
+        keywords = [word for word, _ in word_freq.most_common(max_keywords)]
 
-        print(f"Debug: Clean text length: {len(clean_text_content)}")
-
-        # Analisis dengan word frequency
-        try:
-            # Gunakan split sederhana jika NLTK gagal
-            try:
-                from nltk.tokenize import word_tokenize
-                words = word_tokenize(clean_text_content.lower())
-            except:
-                print("Debug: NLTK failed, using simple split")
-                words = clean_text_content.lower().split()
-
-            # Filter kata-kata
-            stop_words = {
-                'dan', 'atau', 'yang', 'untuk', 'dengan', 'dari', 'ke', 'di', 'pada',
-                'dalam', 'oleh', 'karena', 'sebagai', 'adalah', 'akan', 'dapat',
-                'telah', 'tidak', 'ada', 'ini', 'itu', 'juga', 'hanya', 'sudah',
-                'masih', 'lebih', 'saja', 'bisa', 'jika', 'bila', 'maka', 'sehingga',
-                'namun', 'tetapi', 'bahwa', 'dimana', 'bagaimana', 'kapan', 'siapa',
-                'mengapa', 'apa', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to',
-                'for', 'of', 'with', 'by', 'a', 'an', 'as', 'is', 'was', 'are', 'were',
-                'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
-                'could', 'should', 'may', 'might', 'must', 'can', 'shall', 'page', 'pdf'
-            }
-
-            # Filter kata yang valid
-            filtered_words = []
-            for word in words:
-                clean_word = re.sub(r'[^a-zA-Z]', '', word)  # Hapus karakter non-alfabet
-                if (len(clean_word) > 3 and
-                    clean_word.isalpha() and
-                    clean_word.lower() not in stop_words):
-                    filtered_words.append(clean_word.lower())
-
-            if not filtered_words:
-                print("Debug: No valid words found after filtering")
-                # Fallback: ambil kata unik dari teks mentah
-                raw_words = raw_text.split()
-                fallback_words = []
-                for word in raw_words:
-                    clean_word = re.sub(r'[^a-zA-Z]', '', word)
-                    if len(clean_word) > 4 and clean_word.isalpha():
-                        fallback_words.append(clean_word.lower())
-
-                if fallback_words:
-                    unique_words = list(set(fallback_words))
-                    return unique_words[:max_keywords]
-                else:
-                    return ['document', 'content', 'book', 'text', 'reading']
-
-            # Hitung frekuensi
-            word_freq = Counter(filtered_words)
-
-            # Ambil kata-kata paling sering muncul
-            common_words = word_freq.most_common(max_keywords * 3)
-
-            # Filter kata dengan frekuensi yang wajar
-            keywords = []
-            for word, freq in common_words:
-                # Turunkan threshold minimal
-                if len(word) >= 4:  # Minimal panjang 4 karakter
-                    keywords.append(word)
-                if len(keywords) >= max_keywords:
-                    break
-
-            # Jika masih tidak ada keywords, ambil kata unik yang panjang
-            if not keywords:
-                unique_words = list(set([
-                    word for word in filtered_words
-                    if len(word) > 4
-                ]))
-                keywords = unique_words[:max_keywords]
-
-            print(f"Debug: Found {len(keywords)} keywords: {keywords}")
-            return keywords[:max_keywords] if keywords else ['document', 'content', 'text']
-
-        except Exception as e:
-            print(f"Debug: Error in word frequency analysis: {str(e)}")
-
-            unique_words = list(set([
-                word.lower() for word in words
-                if len(word) > 5 and word.isalpha()
-            ]))
-
-            return unique_words[:max_keywords] if unique_words else []
+        logger.debug("Found %d keywords: %s", len(keywords), keywords)
+        return keywords
 
     except Exception as e:
-        print(f"Error in text analysis: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in text analysis: %s", e)
+        metrics.increment('library_failures_total', stage='analyze_text')
         return []
\ No newline at end of file
@@ -1,47 +1,79 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Book, Favorite
+from .models import Book, Favorite, ProcessingJob, UploadSession
 from .forms import BookForm
-from django.db.models import Q
+from django.db.models import Case, When
 from django.contrib import messages
 from django.core.paginator import Paginator
-from .utils import convert_pdf_to_images, get_book_page_count, get_book_cover_from_pdf
+from .jobs import enqueue_book_processing
+import hmac
+import logging
 import os
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .catalog_cache import cached_book_page, cached_keyset_page
+from .page_cache import get_page_cache
+from .pagination import keyset_page
+from .search import search_book_ids
+from .similarity import related_books
+from .text_store import delete_text, iter_book_text
+from .manifest import IMAGE_SIZES, manifest_version, page_image_urls, page_manifest, prerendered_page_path
+from .rendering import image_options
+from .tiles import dzi_descriptor, page_pyramid_size, tile_extension, tile_options
 from django.views.decorators.http import require_http_methods
+from .uploads import hash_uploads, upload_digest
+from . import chunked_uploads, content, favorites, media, metrics
+
+logger = logging.getLogger(__name__)
 
 def book_list(request):
     query = request.GET.get('q')
     genre = request.GET.get('genre')
     favorite = request.GET.get('favorite')
-
-    books = Book.objects.all().order_by('-created_at')  # Tambahkan ordering
-
-    if query:
-        books = books.filter(
-            Q(title__icontains=query) |
-            Q(author__icontains=query) |
-            Q(description__icontains=query) |
-            Q(year__icontains=query)
-        )
-
-    if genre:
-        books = books.filter(genre=genre)
-
-    if favorite == '1':
-        # Filter hanya buku yang difavoritkan oleh user saat ini
-        books = books.filter(favorite__user=request.user)
-
-    # Tambahkan pagination
-    paginator = Paginator(books, 5)  # 5 buku per halaman
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cursor = request.GET.get('cursor')
+
+    def filtered_books():
+        books = Book.objects.all().order_by('-created_at', '-pk')  # Tambahkan ordering
+
+        if query:
+            # Cari lewat indeks full-text, urutkan berdasarkan relevansi
+            book_ids = search_book_ids(query)
+            relevance = Case(*[When(pk=pk, then=rank) for rank, pk in enumerate(book_ids)])
+            books = books.filter(pk__in=book_ids).order_by(relevance) if book_ids else books.none()
+
+        if genre:
+            books = books.filter(genre=genre)
+
+        if favorite == '1':
+            # Filter hanya buku yang difavoritkan oleh user saat ini
+            books = books.filter(favorite__user=request.user)
+        return books
+
+    # Tambahkan pagination, 5 buku per halaman
+    # Tanpa pencarian daftar diurutkan waktu, halaman dicari dengan cursor (keyset)
+    # sehingga halaman jauh sama murahnya dengan halaman pertama. Hasil pencarian
+    # dibatasi LIBRARY_SEARCH_MAX_RESULTS dan diurutkan relevansi, tetap bernomor.
+    keyset = not query and getattr(settings, 'LIBRARY_BOOK_LIST_PAGINATION', 'keyset') == 'keyset'
+    if favorite == '1':
+        # Daftar favorit berbeda untuk tiap user, tidak di-cache
+        if keyset:
+            page_obj = keyset_page(filtered_books(), cursor, 5)
+        else:
+            page_obj = Paginator(filtered_books(), 5).get_page(page_number)
+    elif keyset:
+        page_obj = cached_keyset_page(genre, cursor, filtered_books, per_page=5)
+    else:
+        page_obj = cached_book_page(query, genre, page_number, filtered_books, per_page=5)
 
-    # Get list favorit user untuk template
+    # Status favorit user hanya untuk buku di halaman ini (tidak ikut di-cache)
     user_favorites = []
     if request.user.is_authenticated:
-        user_favorites = list(request.user.favorite_set.values_list('book_id', flat=True))
+        user_favorites = list(request.user.favorite_set.filter(
+            book_id__in=[book.pk for book in page_obj]
+        ).values_list('book_id', flat=True))
 
     return render(request, 'library/book_list.html', {
         'books': page_obj,
@@ -51,57 +83,120 @@ def book_list(request):
     })
 
 @login_required
+@hash_uploads
 def book_create(request):
     if request.method == 'POST':
         form = BookForm(request.POST, request.FILES)
         if form.is_valid():
             book = form.save(commit=False)
             book.uploader = request.user
-            book.save()
-
-            # Proses konversi PDF ke gambar jika ada file PDF
             if book.file and book.file.name.endswith('.pdf'):
-                try:
-                    # Konversi PDF ke gambar
-                    pdf_path = book.file.path
-                    images_folder = convert_pdf_to_images(pdf_path, book.id)
-
-                    if images_folder:
-                        book.images_folder = images_folder
-
-                    # Dapatkan jumlah halaman
-                    page_count = get_book_page_count(pdf_path)
-                    if page_count > 0:
-                        book.pages = page_count
-
-                    # Generate cover dari halaman pertama PDF
-                    if not book.cover:
-                        cover_path = get_book_cover_from_pdf(pdf_path, book.id)
-                        if cover_path:
-                            book.cover = cover_path
-
-                    # Analisis otomatis untuk mendapatkan kata-kata relevan
-                    try:
-                        from .utils import analyze_book_text
-                        keywords = analyze_book_text(pdf_path, max_keywords=5)
-                        if keywords:
-                            book.keywords = ', '.join(keywords)
-                    except Exception as e:
-                        pass
-
-                    book.save()
-
-                except Exception as e:
-                    pass
+                # PDF dengan isi yang sama disimpan dan diproses sekali (library.content)
+                ready = content.save_uploaded_book(book, request.FILES['file'],
+                                                   upload_digest(request, 'file'))
+                # Pemrosesan PDF dikerjakan worker di background (manage.py process_books);
+                # untuk isi yang sudah pernah diproses hanya kata kunci dan buku serupa
+                enqueue_book_processing(book, cover=not book.cover,
+                                        done_stages=[ProcessingJob.STAGE_INGEST] if ready else ())
+            else:
+                book.save()
 
             # Redirect dengan parameter notifikasi
             return redirect(f'/library/?uploaded={book.title}')
     else:
         form = BookForm()
-    return render(request, 'library/book_form.html', {'form': form, 'title': 'Upload Buku'})
+    return render(request, 'library/book_form.html', {
+        'form': form,
+        'title': 'Upload Buku',
+        # File sebesar ini atau lebih dikirim per potongan (library.chunked_uploads)
+        'chunked_upload_url': reverse('upload_session_create'),
+        'chunked_upload_min_size': getattr(settings, 'LIBRARY_UPLOAD_CHUNKED_MIN_SIZE', 16 * 1024 * 1024),
+    })
+
+
+def _upload_session_data(session, book=None):
+    book = book or session.book
+    return {
+        'id': str(session.pk),
+        'status': session.status,
+        'size': session.size,
+        'chunk_size': session.chunk_size,
+        'chunk_count': session.chunk_count,
+        'received': chunked_uploads.received_chunks(session),
+        # Potongan dikirim ke <url>chunks/<index>/
+        'url': reverse('upload_session_detail', args=[session.pk]),
+        'book_url': reverse('book_detail', args=[book.pk]) if book else None,
+    }
+
+
+@login_required
+@require_http_methods(["POST"])
+def upload_session_create(request):
+    """Mulai upload PDF per potongan, body: data buku (termasuk cover) + filename + size"""
+    from .forms import ChunkedUploadForm
+
+    form = ChunkedUploadForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    try:
+        session = chunked_uploads.create_session(request.user, form.cleaned_data['filename'],
+                                                 form.cleaned_data['size'], form.book_metadata(),
+                                                 cover=form.cleaned_data.get('cover'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=429)
+    return JsonResponse({'success': True, **_upload_session_data(session)}, status=201)
+
+
+@login_required
+@require_http_methods(["GET", "DELETE"])
+def upload_session_detail(request, session_id):
+    """Status sesi upload (potongan yang sudah diterima), atau batalkan dengan DELETE"""
+    session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+    if request.method == 'DELETE':
+        if session.status == UploadSession.STATUS_COMPLETE:
+            return JsonResponse({'success': False, 'message': 'Upload sudah selesai.'}, status=409)
+        chunked_uploads.abort_session(session)
+        return JsonResponse({'success': True})
+    return JsonResponse({'success': True, **_upload_session_data(session)})
 
 
 @login_required
+@require_http_methods(["PUT"])
+def upload_chunk(request, session_id, index):
+    """
+    Terima satu potongan file (body mentah). Setelah potongan terakhir,
+    buku dibuat dan masuk antrean pemrosesan.
+    """
+    session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+    if session.status != UploadSession.STATUS_OPEN:
+        return JsonResponse({'success': session.status == UploadSession.STATUS_COMPLETE,
+                             **_upload_session_data(session)}, status=409)
+
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        chunked_uploads.write_chunk(session, index, request, length,
+                                    request.headers.get('X-Chunk-SHA256'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    try:
+        book = chunked_uploads.complete_if_received(session)
+    except Exception:
+        # Sudah dicatat di log. Sesi yang kembali terbuka bisa diulang dengan
+        # mengirim ulang potongan terakhir; sesi gagal harus dimulai dari awal.
+        session.refresh_from_db()
+        retry = session.status == UploadSession.STATUS_OPEN
+        message = ("Penyusunan file gagal, kirim ulang potongan terakhir." if retry
+                   else "Penyusunan file gagal, mulai upload baru.")
+        return JsonResponse({'success': False, 'message': message, **_upload_session_data(session)},
+                            status=409 if retry else 500)
+    if book is not None:
+        session.refresh_from_db()
+    return JsonResponse({'success': True, **_upload_session_data(session, book)})
+
+
+@login_required
+@hash_uploads
 def book_update(request, pk):
     book = get_object_or_404(Book, pk=pk)
     # cek user atau staff
@@ -113,64 +208,32 @@ def book_update(request, pk):
         from .forms import BookEditForm
         form = BookEditForm(request.POST, request.FILES, instance=book)
         if form.is_valid():
-            # Simpan data lama untuk perbandingan
-            old_file = book.file
-
-            # Simpan form
-            updated_book = form.save()
+            file_changed = 'file' in request.FILES
+            legacy_folder = book.images_folder if book.content_id is None else None
+            legacy_text_file = book.text_file if book.content_id is None else None
 
-            # Cek apakah file PDF berubah
-            if 'file' in request.FILES and request.FILES['file'] != old_file:
-                # File berubah, perlu diproses ulang
-                # Hapus folder gambar lama jika ada
-                if updated_book.images_folder:
+            updated_book = form.save(commit=False)
+            if not file_changed:
+                updated_book.save()
+            else:
+                # File berubah, data hasil pemrosesan file lama tidak berlaku lagi
+                if 'cover' not in request.FILES:
+                    updated_book.cover = None
+                ready = content.save_uploaded_book(updated_book, request.FILES['file'],
+                                                   upload_digest(request, 'file'))
+
+                # Buku lama tanpa ContentBlob: hapus folder gambar dan teks miliknya sendiri
+                if legacy_folder:
                     import shutil
-                    import os
-                    from django.conf import settings
 
-                    old_folder_path = os.path.join(settings.MEDIA_ROOT, updated_book.images_folder)
+                    old_folder_path = os.path.join(settings.MEDIA_ROOT, legacy_folder)
                     if os.path.exists(old_folder_path):
                         shutil.rmtree(old_folder_path)
+                delete_text(legacy_text_file)
 
-                # Reset data terkait pemrosesan
-                updated_book.images_folder = None
-                updated_book.pages = None
-                updated_book.cover = None
-                updated_book.keywords = None
-                updated_book.save()
-
-                # Proses file PDF baru menggunakan fungsi yang tersedia
-                try:
-                    pdf_path = updated_book.file.path
-
-                    # Konversi PDF ke gambar
-                    images_folder = convert_pdf_to_images(pdf_path, updated_book.id)
-                    if images_folder:
-                        updated_book.images_folder = images_folder
-
-                    # Dapatkan jumlah halaman
-                    page_count = get_book_page_count(pdf_path)
-                    if page_count > 0:
-                        updated_book.pages = page_count
-
-                    # Generate cover dari halaman pertama PDF
-                    cover_path = get_book_cover_from_pdf(pdf_path, updated_book.id)
-                    if cover_path:
-                        updated_book.cover = cover_path
-
-                    # Analisis otomatis untuk mendapatkan kata-kata relevan
-                    try:
-                        from .utils import analyze_book_text
-                        keywords = analyze_book_text(pdf_path, max_keywords=5)
-                        if keywords:
-                            updated_book.keywords = ', '.join(keywords)
-                    except Exception as e:
-                        pass
-
-                    updated_book.save()
-
-                except Exception as e:
-                    pass
+                # Proses file PDF baru di background
+                enqueue_book_processing(updated_book,
+                                        done_stages=[ProcessingJob.STAGE_INGEST] if ready else ())
 
             # Redirect dengan parameter notifikasi
             return redirect(f'/library/?edited={updated_book.title}')
@@ -225,14 +288,99 @@ def book_detail(request, pk):
 
     return render(request, 'library/book_detail.html', {
         'book': book,
-        'is_favorited': is_favorited
+        'is_favorited': is_favorited,
+        # Sudah dihitung di background, cukup baca daftar milik buku ini
+        'related_books': related_books(book),
     })
 
+def _readable_page(pk, page):
+    """Buku yang halamannya bisa dirender, Raises: Http404"""
+    book = get_object_or_404(Book, pk=pk)
+    if not book.images_folder or not book.file or page < 1 or (book.pages and page > book.pages):
+        raise Http404("Halaman tidak ditemukan")
+    return book
+
+def book_page_image(request, pk, page):
+    """
+    Gambar satu halaman buku, dirender dan di-cache jika belum ada.
+    Parameter ?w= memilih varian lebar dari LIBRARY_PAGE_WIDTHS.
+    """
+    book = _readable_page(pk, page)
+
+    width = request.GET.get('w')
+    width = int(width) if width and width.isdigit() else None
+    if width not in image_options().widths:
+        width = None
+
+    # Varian yang tidak ada berarti gambar penuh sudah lebih kecil dari lebar itu
+    image_path = prerendered_page_path(book, page, width) or prerendered_page_path(book, page)
+    if image_path:
+        full_image_path = os.path.join(settings.MEDIA_ROOT, image_path)
+    else:
+        try:
+            full_image_path = get_page_cache().get_or_render(book, page, width)
+        except Exception as e:
+            logger.exception("Error rendering page %d of book %s: %s", page, pk, e)
+            raise Http404("Halaman tidak dapat dirender")
+
+    # URL halaman tetap sama walau buku diproses ulang, jadi tidak immutable;
+    # ETag membuat validasi ulang cukup dijawab 304
+    return media.file_response(request, full_image_path)
+
+
+def book_page_dzi(request, pk, page):
+    """
+    Deskriptor DeepZoom (.dzi) satu halaman untuk viewer zoom di
+    book_preview. Tile-nya dilayani book_page_tile di <nama>_files/.
+    """
+    book = _readable_page(pk, page)
+    options = tile_options()
+    etag = f'"{manifest_version(book)}-{page}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            width, height = page_pyramid_size(book, page, options)
+        except Exception as e:
+            logger.exception("Error reading page %d of book %s: %s", page, pk, e)
+            raise Http404("Halaman tidak dapat dibaca")
+        response = HttpResponse(dzi_descriptor(width, height, options), content_type='application/xml')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+def book_page_tile(request, pk, page, level, col, row, ext):
+    """Satu tile DeepZoom halaman, dirender dan di-cache saat pertama diminta"""
+    book = _readable_page(pk, page)
+    options = tile_options()
+    if ext != tile_extension(options):
+        raise Http404("Tile tidak ditemukan")
+
+    try:
+        tile_path = get_page_cache().get_or_render_tile(book, page, level, col, row, options)
+    except Exception as e:
+        logger.exception("Error rendering tile %d/%d_%d of page %d of book %s: %s",
+                         level, col, row, page, pk, e)
+        raise Http404("Tile tidak dapat dirender")
+    if tile_path is None:
+        raise Http404("Tile tidak ditemukan")
+    return media.file_response(request, tile_path)
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_media(request, path):
+    """File di MEDIA_ROOT dengan cek akses, header cache, Range, dan sendfile"""
+    return media.serve(request, path)
+
+
 def book_preview(request, pk):
     book = get_object_or_404(Book, pk=pk)
 
     # Pastikan buku memiliki images folder
     if not book.images_folder:
+        if book.is_processing:
+            messages.info(request, "Buku ini masih diproses. Silakan coba beberapa saat lagi.")
+            return redirect('book_detail', pk=pk)
         messages.error(request, "Buku ini belum dikonversi ke gambar.")
         return redirect('book_detail', pk=pk)
 
@@ -249,60 +397,79 @@ def book_preview(request, pk):
     elif book.pages and page_num > book.pages:
         page_num = book.pages
 
-    # Buat path ke gambar halaman
-    image_filename = f"page_{page_num:03d}.png"
-    image_path = f"{book.images_folder}/{image_filename}"
-
-    # Check apakah file gambar ada
-    full_image_path = os.path.join(settings.MEDIA_ROOT, image_path)
-    if not os.path.exists(full_image_path):
-        messages.error(request, f"Halaman {page_num} tidak ditemukan.")
-        return redirect('book_detail', pk=pk)
+    image_url, image_srcset = page_image_urls(book, page_num)
+    manifest_url = reverse('book_page_manifest', args=[book.pk])
 
     context = {
         'book': book,
         'current_page': page_num,
         'total_pages': book.pages or 1,
-        'image_url': f"{settings.MEDIA_URL}{image_path}",
+        'image_url': image_url,
+        'image_srcset': image_srcset,
+        'image_sizes': IMAGE_SIZES,
         'has_previous': page_num > 1,
         'has_next': page_num < (book.pages or 1),
         'previous_page': page_num - 1 if page_num > 1 else None,
         'next_page': page_num + 1 if page_num < (book.pages or 1) else None,
+        # Halaman berikutnya dibuka di browser dari manifest, tanpa request HTML
+        'manifest_url': manifest_url,
+        # Viewer zoom (tile DeepZoom) untuk halaman yang sedang dibuka
+        'tiles_url': reverse('book_page_dzi', args=[book.pk, page_num]),
+        'prefetch_pages': getattr(settings, 'LIBRARY_PREVIEW_PREFETCH_PAGES', 2),
     }
 
-    return render(request, 'library/book_preview.html', context)
+    response = render(request, 'library/book_preview.html', context)
+    # Browser mulai mengunduh gambar halaman dan manifest sebelum HTML selesai diproses
+    image_hint = f'<{image_url}>; rel=preload; as=image'
+    if image_srcset:
+        image_hint += f'; imagesrcset="{image_srcset}"; imagesizes="{IMAGE_SIZES}"'
+    response['Link'] = f'{image_hint}, <{manifest_url}>; rel=preload; as=fetch; crossorigin'
+    return response
+
+
+def book_page_manifest(request, pk):
+    """
+    JSON berisi URL dan ukuran gambar semua halaman buku untuk pembaca
+    di book_preview. Versi manifest dipakai sebagai ETag.
+    """
+    book = get_object_or_404(Book, pk=pk)
+    if not book.images_folder:
+        raise Http404("Buku belum dikonversi ke gambar")
+
+    version = manifest_version(book)
+    etag = f'"{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(page_manifest(book, version))
+    response['ETag'] = etag
+    # Versi berubah saat buku diproses ulang, cukup divalidasi ulang sesekali
+    patch_cache_control(response, public=True, max_age=60)
+    return response
 
 @login_required
 @require_http_methods(["POST"])
 def toggle_favorite(request, pk):
     """Toggle favorite status untuk buku via AJAX"""
-    book = get_object_or_404(Book, pk=pk)
-
-    try:
-        # Coba cari existing favorite
-        favorite = Favorite.objects.get(user=request.user, book=book)
-        # Jika ada, hapus (unfavorite)
-        favorite.delete()
-        is_favorited = False
-        message = "Buku dihapus dari favorit"
-    except Favorite.DoesNotExist:
-        # Jika tidak ada, tambah (favorite)
-        Favorite.objects.create(user=request.user, book=book)
-        is_favorited = True
+    # Satu transaksi tanpa SELECT lebih dulu, aman untuk klik ganda (lihat library.favorites)
+    is_favorited, favorites_count = favorites.toggle_favorite(request.user.pk, pk)
+    if is_favorited:
         message = "Buku ditambahkan ke favorit"
+    else:
+        message = "Buku dihapus dari favorit"
 
     # Return JSON response untuk AJAX
     return JsonResponse({
         'success': True,
         'is_favorited': is_favorited,
         'message': message,
-        'favorites_count': request.user.favorite_set.count()
+        'favorites_count': favorites_count
     })
 
 @login_required
 def reprocess_book(request, pk):
     """
-    Konversi ulang buku yang belum memiliki gambar
+    Konversi ulang buku. Hanya halaman yang belum ada atau dirender dengan
+    pengaturan lama yang dirender (library.checkpoint).
     """
     book = get_object_or_404(Book, pk=pk)
 
@@ -311,47 +478,14 @@ def reprocess_book(request, pk):
         messages.error(request, "Kamu tidak memiliki izin untuk memproses ulang buku ini.")
         return redirect('book_detail', pk=pk)
 
-    # Proses konversi PDF ke gambar jika ada file PDF
+    # Masukkan ke antrean pemrosesan jika ada file PDF
     if book.file and book.file.name.endswith('.pdf'):
-        try:
-            # Konversi PDF ke gambar
-            pdf_path = book.file.path
-            images_folder = convert_pdf_to_images(pdf_path, book.id)
-
-            if images_folder:
-                book.images_folder = images_folder
-
-            # Dapatkan jumlah halaman
-            page_count = get_book_page_count(pdf_path)
-            if page_count > 0:
-                book.pages = page_count
-
-            # Generate cover dari halaman pertama PDF jika belum ada cover
-            if not book.cover:
-                cover_path = get_book_cover_from_pdf(pdf_path, book.id)
-                if cover_path:
-                    book.cover = cover_path
-
-            # Analisis otomatis jika belum ada keywords
-            if not book.keywords:
-                try:
-                    from .utils import analyze_book_text
-                    keywords = analyze_book_text(pdf_path, max_keywords=5)  # Batasi jadi 5 kata
-                    if keywords:
-                        book.keywords = ', '.join(keywords)
-                        print(f"Debug: Auto-analysis completed during reprocess. Keywords: {book.keywords}")
-                except Exception as e:
-                    print(f"Debug: Auto-analysis failed during reprocess: {str(e)}")
-
-            book.save()
-
-            success_msg = f'Buku berhasil diproses ulang ({page_count} halaman)'
-            if book.keywords:
-                success_msg += ' dengan kata kunci relevan'
-            messages.success(request, success_msg)
-
-        except Exception as e:
-            messages.error(request, f'Proses ulang buku gagal: {str(e)}')
+        if book.is_processing:
+            messages.info(request, 'Buku ini sedang dalam antrean pemrosesan.')
+        else:
+            # Cover dan kata kunci yang sudah ada tidak diproses ulang
+            enqueue_book_processing(book, cover=not book.cover, keywords=not book.keywords)
+            messages.success(request, 'Buku dimasukkan ke antrean untuk diproses ulang.')
     else:
         messages.error(request, 'File buku bukan PDF atau tidak ditemukan.')
 
@@ -380,11 +514,12 @@ def analyze_book(request, pk):
 
     try:
         # Import fungsi analisis
-        from .utils import analyze_book_text
+        from .keywords import extract_keywords
 
-        # Analisis teks dari PDF
-        pdf_path = book.file.path
-        keywords = analyze_book_text(pdf_path, max_keywords=5)  # Batasi jadi 5 kata
+        # Analisis teks yang disimpan saat ingest, PDF tidak di-parsing lagi.
+        # Kata kunci diranking dengan TF-IDF terhadap seluruh koleksi.
+        pages = iter_book_text(book)
+        keywords = extract_keywords(book.pk, pages, max_keywords=5, source_name=book.file.name)  # Batasi jadi 5 kata
 
         if keywords:
             # Simpan keywords ke database
@@ -411,10 +546,25 @@ def analyze_book(request, pk):
 
     except Exception as e:
         error_msg = f'Analisis gagal: {str(e)}'
-        print(f"Debug: Analysis error = {str(e)}")
+        logger.exception("Analysis error for book %s: %s", pk, e)
 
         if request.headers.get('Content-Type') == 'application/json':
             return JsonResponse({'success': False, 'message': error_msg})
         messages.error(request, error_msg)
 
     return redirect('book_detail', pk=pk)
+
+
+def prometheus_metrics(request):
+    """
+    Metrik pemrosesan dan view dalam format teks Prometheus.
+    Hanya untuk staff, atau scraper dengan header
+    Authorization: Bearer <LIBRARY_METRICS_TOKEN>.
+    """
+    token = getattr(settings, 'LIBRARY_METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(token) and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode())
+    if not (token_ok or request.user.is_staff):
+        return HttpResponseForbidden("Akses metrik ditolak")
+
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
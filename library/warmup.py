@@ -0,0 +1,54 @@
+"""
+Pemanasan proses untuk server yang memuat aplikasi sekali lalu fork
+worker (misalnya `gunicorn --preload`).
+
+Dependensi berat diimpor lazy di dalam fungsi agar manage.py dan test
+tetap cepat. Di server yang fork, lebih baik semuanya dimuat sekali di
+proses induk sebelum fork: halaman memori modul dibagi ke semua worker
+lewat copy-on-write, dan request pertama tiap worker tidak lambat.
+Aktifkan dengan LIBRARY_PRELOAD = True (dipanggil dari Elibrary/wsgi.py).
+"""
+import importlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Dependensi pihak ketiga yang dipakai library
+HEAVY_MODULES = [
+    'fitz',
+    'PIL.Image',
+    'numpy',
+    'scipy.sparse',
+]
+
+# Modul aplikasi yang mengimpor dependensi di atas
+APP_MODULES = [
+    'library.rendering',
+    'library.utils',
+    'library.keywords',
+    'library.similarity',
+    'library.page_cache',
+    'library.views',
+]
+
+
+def preload():
+    """
+    Impor semua modul berat sekarang.
+    Sengaja tidak membuka koneksi database: koneksi yang dibuat sebelum
+    fork akan dipakai bersama oleh semua worker.
+    Returns: list nama modul yang berhasil dimuat
+    """
+    started = time.perf_counter()
+    loaded = []
+    for name in HEAVY_MODULES + APP_MODULES:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError as e:
+            # Dependensi opsional boleh tidak terpasang
+            logger.debug("Preload skipped %s: %s", name, e)
+
+    logger.info("Preloaded %d modules in %.2fs", len(loaded), time.perf_counter() - started)
+    return loaded